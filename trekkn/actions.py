@@ -1,55 +1,80 @@
-from trekkn.contracts.loggable import write_steps_to_multiple_networks
-from trekkn.models import DailyActivity, TrekknUser, UserEventLog
+from django.db import transaction
+
+from trekkn.models import DailyActivity, DailyRollup, TrekknUser, UserEventLog
+from trekkn.outbox import enqueue_step_logs
 
 
 def log_steps_and_reward_user(user: TrekknUser, steps: int):
     try:
-        # log daily activity
-        activity = DailyActivity.objects.create(
-            user=user,
-            step_count=steps,
-            # conversion_rate=0.5,
-            source="steps",
-        )
-        # log event
-        UserEventLog.objects.create(
-            user=user,
-            event_type="steps",
-            description=f"Logged {steps} steps, query activity at {activity.id}",
-        )
-        write_steps_to_multiple_networks(
-            user_address=user.evm_addr,
-            step_count=steps,
-        )
+        with transaction.atomic():
+            # log daily activity
+            activity = DailyActivity.objects.create(
+                user=user,
+                step_count=steps,
+                # conversion_rate=0.5,
+                source="steps",
+            )
+            # log event
+            UserEventLog.objects.create(
+                user=user,
+                event_type="steps",
+                description=f"Logged {steps} steps, query activity at {activity.id}",
+            )
+            # on-chain logging is picked up by `manage.py drain_step_outbox`
+            user.ensure_wallet()
+            enqueue_step_logs(activity, user_address=user.evm_addr)
         return activity
 
     except Exception as e:
         raise e
 
 
-def get_referred(referrer: TrekknUser, referred: TrekknUser):
-    try:
-        # get referrer and show him love
-        referrer_activity = DailyActivity.objects.create(
-            user=referrer,
-            source="referral",
-        )
-        UserEventLog.objects.create(
-            user=referrer,
-            event_type="referral",
-            description=f"Referred: {referred.username}. Query at {referrer_activity.id}",
+def get_referred(referrer: TrekknUser, referred: TrekknUser, **referred_fields):
+    """Reward both users of a referral in a fixed number of queries.
+
+    The two referral activities and event logs are bulk inserted and each user gets one
+    UPDATE with its reward; `referred_fields` (e.g. invited_by) are set in the referred
+    user's. A referral has no steps, so step totals, streaks and missions don't change.
+    The users' balance and aura are not reloaded.
+    """
+    with transaction.atomic(savepoint=False):
+        activities = [
+            DailyActivity(user=referrer, source="referral"),
+            DailyActivity(user=referred, source="referral"),
+        ]
+        for activity in activities:
+            # bulk_create skips DailyActivity.save, which computes these
+            activity.amount_rewarded = activity.calculate_rewards()
+            activity.aura_gained = activity.calculate_aura()
+        DailyActivity.objects.bulk_create(activities)
+        referrer_activity, referred_activity = activities
+
+        UserEventLog.objects.bulk_create(
+            [
+                # get referrer and show him love
+                UserEventLog(
+                    user=referrer,
+                    event_type="referral",
+                    description=f"Referred: {referred.username}. Query at {referrer_activity.id}",
+                ),
+                # get referred and show him love
+                UserEventLog(
+                    user=referred,
+                    event_type="referral",
+                    description=f"I was referred by {referrer.username}, query at {referred_activity.id}",
+                ),
+            ]
         )
-        # get referred and show him love
-        referred_activity = DailyActivity.objects.create(
-            user=referred,
-            source="referral",
+        DailyRollup.add_activities(activities)
+        referrer.reward(
+            balance=int(referrer_activity.amount_rewarded),
+            aura=referrer_activity.aura_gained,
+            refresh=False,
         )
-        UserEventLog.objects.create(
-            user=referred,
-            event_type="referral",
-            description=f"I was referred by {referrer.username}, query at {referred_activity.id}",
+        referred.reward(
+            balance=int(referred_activity.amount_rewarded),
+            aura=referred_activity.aura_gained,
+            refresh=False,
+            **referred_fields,
         )
-
-        return True
-    except Exception as e:
-        raise e
+    return True
@@ -1,10 +1,34 @@
 from django.contrib import admin
-from .models import TrekknUser, DailyActivity, Mission, UserMission, UserEventLog
+from .models import (
+    TrekknUser,
+    DailyActivity,
+    Mission,
+    UserMission,
+    UserEventLog,
+    StepLogOutbox,
+    ChainNonce,
+    NetworkHealth,
+    UserStepTotal,
+    DailyRollup,
+    LeaderboardWindow,
+    LeaderboardScore,
+    SeasonSnapshot,
+    WalletCounter,
+)
 
 admin.site.register(TrekknUser)
 admin.site.register(DailyActivity)
 admin.site.register(Mission)
 admin.site.register(UserMission)
 admin.site.register(UserEventLog)
+admin.site.register(StepLogOutbox)
+admin.site.register(ChainNonce)
+admin.site.register(NetworkHealth)
+admin.site.register(UserStepTotal)
+admin.site.register(DailyRollup)
+admin.site.register(LeaderboardWindow)
+admin.site.register(LeaderboardScore)
+admin.site.register(SeasonSnapshot)
+admin.site.register(WalletCounter)
 
 # Register your models here.
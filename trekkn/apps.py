@@ -7,3 +7,6 @@ class TrekknConfig(AppConfig):
 
     def ready(self):
         import trekkn.signals  # ensures signals.py runs
+        from trekkn.contracts.registry import load_artifacts
+
+        load_artifacts()  # read the WalkLog ABI/bytecode once per process
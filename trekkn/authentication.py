@@ -0,0 +1,101 @@
+"""
+JWT authentication that keeps the authenticated user in the cache for a short time.
+
+`JWTAuthentication` loads the whole user row, wallet keys included, on every request.
+`CachedJWTAuthentication` reads only `AUTH_USER_FIELDS` and keeps them in the default
+cache for `AUTH_USER_CACHE_TTL` seconds, so most requests don't query the user at all.
+Other columns are deferred: reading one loads it from the database, so views that need
+the full profile load it themselves. Saving or deleting a user forgets the entry.
+
+An entry only serves the token it was loaded for, so a new token, e.g. after signing in
+again, always reads the user afresh. Queryset updates that skip save() are not seen by
+the same token until the entry expires: deactivating a user with `.update()` takes up
+to `AUTH_USER_CACHE_TTL` seconds, unless `forget_cached_user` is called.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from trekkn.models import TrekknUser
+
+
+# what the views read from request.user; none of it changes through queryset updates
+# that skip save(), except the wallet addresses, see `TrekknUser.ensure_wallet`
+AUTH_USER_FIELDS = (
+    "id",
+    "email",
+    "username",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+    "wallet_index",
+    "evm_addr",
+    "sol_addr",
+)
+# bump when AUTH_USER_FIELDS changes, so entries cached by older code aren't read
+AUTH_USER_CACHE_VERSION = 2
+
+
+def _cache_key(user_id):
+    return f"trekkn:auth-user:v{AUTH_USER_CACHE_VERSION}:{user_id}"
+
+
+def _fields():
+    if api_settings.CHECK_REVOKE_TOKEN:
+        return AUTH_USER_FIELDS + ("password",)
+    return AUTH_USER_FIELDS
+
+
+def forget_cached_user(user_id):
+    """Make the next request of `user_id` load the user from the database again."""
+    cache.delete(_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+
+        key = _cache_key(user_id)
+        # kept in the entry rather than the key, so forgetting the user is one delete
+        issued_at = validated_token.get("iat")
+        cached = cache.get(key)
+        if cached is not None and cached[0] == issued_at:
+            values = cached[1]
+        else:
+            values = (
+                TrekknUser.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+                .values(*_fields())
+                .first()
+            )
+            if values is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            cache.set(key, (issued_at, values), timeout=settings.AUTH_USER_CACHE_TTL)
+        # the other columns are deferred, as with .only(); from_db wants model order
+        names = [
+            f.attname for f in TrekknUser._meta.concrete_fields if f.attname in values
+        ]
+        user = TrekknUser.from_db(DEFAULT_DB_ALIAS, names, [values[n] for n in names])
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
@@ -0,0 +1,121 @@
+"""
+Per-network circuit breakers and write latency tracking, kept per process.
+
+A network that fails `CHAIN_BREAKER_FAILURES` times in a row is skipped for
+`CHAIN_BREAKER_COOLDOWN` seconds instead of making every write wait for its HTTP
+timeout. After the cooldown the next write is let through as a probe: success closes
+the breaker, failure opens it for another cooldown.
+"""
+
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# recent writes kept per network for the error rate and latency percentiles
+WINDOW = 200
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold, cooldown):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.samples = deque(maxlen=WINDOW)  # (latency in seconds, succeeded)
+        self.lock = threading.Lock()
+
+    def is_open(self):
+        """True while writes to this network should be skipped."""
+        with self.lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+            return self.state == OPEN
+
+    def retry_in(self):
+        """Seconds until an open breaker lets a probe through."""
+        with self.lock:
+            if self.state != OPEN:
+                return 0
+            return max(0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def record(self, latency, succeeded):
+        with self.lock:
+            self.samples.append((latency, succeeded))
+            if succeeded:
+                self.consecutive_failures = 0
+                self.state = CLOSED
+                return
+            self.consecutive_failures += 1
+            if (
+                self.state == HALF_OPEN
+                or self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self.lock:
+            latencies = sorted(latency for latency, _ in self.samples)
+            failures = sum(1 for _, succeeded in self.samples if not succeeded)
+            p50 = _percentile(latencies, 0.50)
+            p95 = _percentile(latencies, 0.95)
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "samples": len(self.samples),
+                "error_rate": failures / len(self.samples) if self.samples else 0.0,
+                "p50_ms": None if p50 is None else round(p50 * 1000, 1),
+                "p95_ms": None if p95 is None else round(p95 * 1000, 1),
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name) -> CircuitBreaker:
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(
+                name,
+                CircuitBreaker(
+                    name,
+                    settings.CHAIN_BREAKER_FAILURES,
+                    settings.CHAIN_BREAKER_COOLDOWN,
+                ),
+            )
+    return breaker
+
+
+def snapshots():
+    """Breaker state and latency stats of every network written to by this process."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+
+def clear_breakers():
+    """Forget every breaker and its samples, e.g. between benchmark runs."""
+    with _breakers_lock:
+        _breakers.clear()
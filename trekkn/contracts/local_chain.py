@@ -0,0 +1,53 @@
+"""
+Deploy WalkLog to an in-process eth-tester (py-evm) chain, for tests and benchmarks.
+
+Needs the optional `eth-tester[py-evm]` package, which is not part of requirements.txt.
+"""
+
+from web3 import Web3
+
+from trekkn.contracts.loggable import CREATOR_ADDRESS, CREATOR_KEY, NETWORK_TIMEOUT
+from trekkn.contracts.registry import load_artifacts, register_client
+
+
+def deploy_local_walklog(name="LOCAL", batch=True):
+    """Start a fresh local chain, fund the creator and deploy WalkLog from it.
+
+    Returns `(web3, net)`, where `net` is a network entry that the loggable writers
+    and the outbox worker resolve to this chain.
+    """
+    web3 = Web3(Web3.EthereumTesterProvider())
+    tester = web3.provider.ethereum_tester
+    tester.add_account(CREATOR_KEY)
+    web3.eth.send_transaction(
+        {
+            "from": web3.eth.accounts[0],
+            "to": CREATOR_ADDRESS,
+            "value": Web3.to_wei(100, "ether"),
+        }
+    )
+
+    abi, bytecode = load_artifacts()
+    deploy_txn = (
+        web3.eth.contract(abi=abi, bytecode=bytecode)
+        .constructor()
+        .build_transaction(
+            {
+                "from": CREATOR_ADDRESS,
+                "nonce": web3.eth.get_transaction_count(CREATOR_ADDRESS),
+            }
+        )
+    )
+    signed = web3.eth.account.sign_transaction(deploy_txn, private_key=CREATOR_KEY)
+    receipt = web3.eth.wait_for_transaction_receipt(
+        web3.eth.send_raw_transaction(signed.raw_transaction)
+    )
+
+    net = {
+        "name": name,
+        "url": f"eth-tester://{name.lower()}",
+        "contract": receipt.contractAddress,
+        "batch": batch,
+    }
+    register_client(net, NETWORK_TIMEOUT, web3)
+    return web3, net
@@ -11,61 +11,169 @@
 #  soneium,
 #  assetchain,
 # solana
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+
 from eth_account import Account
 
 from web3 import Web3
 from web3.contract import Contract
 from eth_account.datastructures import SignedTransaction
 
+from trekkn.contracts.breaker import CircuitOpenError, get_breaker
+from trekkn.contracts.registry import get_client, load_artifacts
+
 
 CREATOR_ADDRESS = "0xdF0725C2f40380A04FBF10695d0de531a00443e8"
 CREATOR_KEY = "852d82afe4e7724ea8c9f19a6eac20d317b08bd1e802cd8d6c633f7aba1e50dc"
 
 
-NETWORKS_LIST_ = [
-    # "SOMNIA":
-    {
-        "url": "https://dream-rpc.somnia.network/",
-        "contract": "0x661A88CEF5Bb8f58822C4f334C482d1Bf0DcD1e7",
-    },
-    # "MONAD":
-    {
-        "url": "https://testnet-rpc.monad.xyz/",
-        "contract": "0x0D1f40B591FbB15CDFD5bd9e03734acc114de49e",
-    },
-    # "MEGAETH":
-    {
-        "url": "https://carrot.megaeth.com/rpc/",
-        "contract": "0xe496edfc5384ba76d457a75a53b9819ee9a62e3c",
-    },
-    # "FLOW":
-    {
-        "url": "https://testnet.evm.nodes.onflow.org/",
-        "contract": "0xE496edfc5384Ba76d457a75a53B9819Ee9a62e3C",
-    },
-    # # "ASSETCHAIN":
-    # {
-    #     "url": "https://enugu-rpc.assetchain.org/",
-    #     "contract": "0xE496edfc5384Ba76d457a75a53B9819Ee9a62e3C",
-    # },
-    #
-    #
-    # "IOTA_EVM":
-    # {
-    #     "url": "https://json-rpc.evm.testnet.iotaledger.net/",
-    #     "contract": "0xE496edfc5384Ba76d457a75a53B9819Ee9a62e3C",
-    # },
-    # "XRPL_EVM":
-    {
-        "url": "https://rpc.testnet.xrplevm.org/",
-        "contract": "0x7965b0cff0ebe04051f221f07429d38d147c0c5c",
-    },
-]
+def get_networks():
+    """The EVM networks step logs are written to, minus the ones disabled in settings.
+
+    Configured by `CHAIN_NETWORKS` and `CHAIN_NETWORKS_DISABLED` in settings.py.
+    """
+    disabled = set(settings.CHAIN_NETWORKS_DISABLED)
+    return [net for net in settings.CHAIN_NETWORKS if net.get("name") not in disabled]
+
+
+# must match MAX_BATCH in steps.vy
+MAX_BATCH = 200
+
+
+def get_network(name):
+    """Return the enabled network registered under `name`, or None."""
+    for net in get_networks():
+        if net.get("name") == name:
+            return net
+    return None
+
+
+# default upper bound, in seconds, for each RPC call and for one network's write
+NETWORK_TIMEOUT = 10
+
+
+def _to_address(user_address):
+    if user_address:
+        return Web3.to_checksum_address(user_address)
+    return Web3.to_checksum_address(CREATOR_ADDRESS)
+
+
+def _send_transaction(client, contract_function, gas_key, nonce=None):
+    """Build, sign and send a WalkLog call from the creator account.
+
+    Gas price and gas limit come from the client's caches, so building the
+    transaction itself makes no RPC call; `gas_key` names the call shape whose
+    estimate can be reused. Every attempt feeds the network's circuit breaker, and
+    nothing is sent while the breaker is open.
+    """
+    breaker = get_breaker(client.name)
+    if breaker.is_open():
+        raise CircuitOpenError(f"Circuit open for network {client.name}")
+    started = time.monotonic()
+    try:
+        tx_hash = _build_and_send(client, contract_function, gas_key, nonce)
+    except Exception:
+        breaker.record(time.monotonic() - started, succeeded=False)
+        raise
+    breaker.record(time.monotonic() - started, succeeded=True)
+    return tx_hash
+
+
+def _build_and_send(client, contract_function, gas_key, nonce):
+    web3 = client.web3
+    if nonce is None:
+        nonce = web3.eth.get_transaction_count(CREATOR_ADDRESS)
+    # Build transaction
+    txn = contract_function.build_transaction(
+        {
+            "from": CREATOR_ADDRESS,
+            "nonce": nonce,
+            "chainId": client.chain_id,
+            "gasPrice": client.gas_price,
+            "gas": client.estimate_gas(
+                gas_key,
+                lambda: contract_function.estimate_gas({"from": CREATOR_ADDRESS}),
+            ),
+        }
+    )
+    # Sign transaction
+    stxn = web3.eth.account.sign_transaction(txn, private_key=CREATOR_KEY)
+    # Send transaction
+    send_stxn = web3.eth.send_raw_transaction(stxn.raw_transaction)
+    return Web3.to_hex(send_stxn)
+
+
+def write_steps_to_network(
+    net,
+    user_address,
+    step_count,
+    timeout=NETWORK_TIMEOUT,
+    nonce=None,
+):
+    """
+    Write step data to the WalkLog contract on a single EVM network.
+    Args:
+
+        net (dict): An entry of `settings.CHAIN_NETWORKS`.
+        user_address (str): The user's EVM address to log steps for.
+        step_count (int): The number of steps to log.
+        timeout (float): HTTP timeout for each RPC call.
+        nonce (int): Nonce reserved by the caller; when omitted it is read from the chain.
+    Returns the transaction hash. Errors are raised so the caller can retry.
+    """
+    # Cached connection, contract and chain id for this network
+    client = get_client(net, timeout)
+    walk_log_contract: Contract = client.contract
+    return _send_transaction(
+        client,
+        walk_log_contract.functions.logWalk(_to_address(user_address), step_count),
+        "logWalk",
+        nonce=nonce,
+    )
+
+
+def write_batch_to_network(
+    net,
+    entries,
+    timeout=NETWORK_TIMEOUT,
+    nonce=None,
+):
+    """
+    Write many walks to the WalkLog contract in a single `logWalks` transaction.
+    Args:
+
+        net (dict): An entry of `settings.CHAIN_NETWORKS` whose contract has `logWalks`.
+        entries (list): `(user_address, step_count)` pairs, at most `MAX_BATCH`.
+        timeout (float): HTTP timeout for each RPC call.
+        nonce (int): Nonce reserved by the caller; when omitted it is read from the chain.
+    Returns the transaction hash. Errors are raised so the caller can retry.
+    """
+    if len(entries) > MAX_BATCH:
+        raise ValueError(f"At most {MAX_BATCH} walks fit in one logWalks call")
+    client = get_client(net, timeout)
+    walk_log_contract: Contract = client.contract
+    return _send_transaction(
+        client,
+        walk_log_contract.functions.logWalks(
+            [_to_address(user_address) for user_address, _ in entries],
+            [step_count for _, step_count in entries],
+        ),
+        # gas grows with the batch length, not with the values
+        f"logWalks:{len(entries)}",
+        nonce=nonce,
+    )
 
 
 def write_steps_to_multiple_networks(
     user_address,
     step_count,
+    concurrent=False,
+    timeout=NETWORK_TIMEOUT,
+    max_workers=None,
+    networks=None,
 ):
     """
     Write step data to the WalkLog contract on multiple EVM networks.
@@ -73,51 +181,55 @@ def write_steps_to_multiple_networks(
 
         user_address (str): The user's EVM address to log steps for.
         step_count (int): The number of steps to log.
-    Each network is handled independently; errors are printed and do not stop the loop.
+        concurrent (bool): Send to every network in parallel from a bounded thread pool,
+            so the wall time is the slowest network rather than the sum of all of them.
+        timeout (float): Per-network timeout; a network still running after it is
+            reported as timed out.
+        max_workers (int): Thread pool size, defaults to one thread per network.
+        networks (list): Networks to write to, defaults to `get_networks()`.
+    Each network is handled independently; errors are printed and do not stop the others.
+    Returns a dict mapping each network name to its transaction hash, or None on failure.
     """
-    ABI_PATH = "trekkn/contracts/steps.abi"
-    BYTECODE_PATH = "trekkn/contracts/steps.bin"
-    if user_address:
-        user_address = Web3.to_checksum_address(user_address)
-    else:
-        user_address = Web3.to_checksum_address(CREATOR_ADDRESS)
+    networks = get_networks() if networks is None else networks
+    results = {net.get("name"): None for net in networks}
     try:
-        ABI = open(ABI_PATH).read()
-        BYTECODE = open(BYTECODE_PATH).read()
+        load_artifacts()
     except Exception as e:
         print(f"Error loading ABI or bytecode: {e}")
-        return
+        return results
+
+    def send(net):
+        return write_steps_to_network(net, user_address, step_count, timeout=timeout)
+
+    if not concurrent:
+        for net in networks:
+            url = net.get("url")
+            contract_address = net.get("contract")
+            print(f"\n--- Sending to network: {url} contract: {contract_address} ---")
+            try:
+                tx_hash = send(net)
+                results[net.get("name")] = tx_hash
+                print(f"Success! network {net["url"]} Transaction hash: {tx_hash}")
+            except Exception as e:
+                print(f"Error on network {url}: {e}")
+        print("\nAll networks processed.")
+        return results
 
-    for net in NETWORKS_LIST_:
+    # don't use the pool as a context manager: its exit would wait for stragglers
+    pool = ThreadPoolExecutor(max_workers=max_workers or len(networks) or 1)
+    futures = {pool.submit(send, net): net for net in networks}
+    done, not_done = wait(futures, timeout=timeout)
+    pool.shutdown(wait=False, cancel_futures=True)
+    for future, net in futures.items():
         url = net.get("url")
-        contract_address = net.get("contract")
-        print(f"\n--- Sending to network: {url} contract: {contract_address} ---")
+        if future in not_done:
+            print(f"Error on network {url}: timed out after {timeout}s")
+            continue
         try:
-            # Connect to network
-            web3 = Web3(Web3.HTTPProvider(url))
-            walk_log_contract: Contract = web3.eth.contract(
-                address=Web3.to_checksum_address(contract_address),
-                abi=ABI,
-                bytecode=BYTECODE,
-            )
-            # Build transaction
-            txn = walk_log_contract.functions.logWalk(
-                user_address,
-                step_count,
-            ).build_transaction(
-                {
-                    "from": CREATOR_ADDRESS,
-                    "nonce": web3.eth.get_transaction_count(CREATOR_ADDRESS),
-                    "chainId": web3.eth.chain_id,
-                    "gasPrice": web3.eth.gas_price,
-                }
-            )
-            # Sign transaction
-            stxn = web3.eth.account.sign_transaction(txn, private_key=CREATOR_KEY)
-            # Send transaction
-            send_stxn = web3.eth.send_raw_transaction(stxn.raw_transaction)
-            tx_hash = send_stxn.hex()
-            print(f"Success! network {net["url"]} Transaction hash: 0x{tx_hash}")
+            tx_hash = future.result()
+            results[net.get("name")] = tx_hash
+            print(f"Success! network {url} Transaction hash: {tx_hash}")
         except Exception as e:
             print(f"Error on network {url}: {e}")
     print("\nAll networks processed.")
+    return results
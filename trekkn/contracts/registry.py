@@ -0,0 +1,207 @@
+"""
+Per-process cache of everything a chain write needs that does not change between writes.
+
+The WalkLog artifacts are read once, and each network gets one `NetworkClient` holding a
+pooled HTTP session, the parsed contract, the memoized chain id and short-lived caches of
+the gas price and gas estimates.
+"""
+
+import math
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+import requests
+from web3 import Web3
+from web3.contract import Contract
+
+
+CONTRACTS_DIR = Path(__file__).resolve().parent
+ABI_PATH = CONTRACTS_DIR / "steps.abi"
+BYTECODE_PATH = CONTRACTS_DIR / "steps.bin"
+
+# gas price is served from cache for GAS_PRICE_TTL seconds; until GAS_PRICE_MAX_STALE
+# the old value is still used while a background thread fetches a new one
+GAS_PRICE_TTL = 5
+GAS_PRICE_MAX_STALE = 60
+# WalkLog calls cost the same gas every time, so estimates can live much longer
+GAS_ESTIMATE_TTL = 10 * 60
+GAS_ESTIMATE_HEADROOM = 1.2
+
+
+@lru_cache(maxsize=1)
+def load_artifacts():
+    """Read the compiled WalkLog ABI and bytecode, once per process."""
+    return ABI_PATH.read_text(), BYTECODE_PATH.read_text()
+
+
+class CachedValue:
+    """A value fetched over RPC, fresh for `ttl` seconds.
+
+    Between `ttl` and `max_stale` the old value is returned straight away and a single
+    background thread refreshes it. Hits, stale hits and misses are counted in `stats`
+    under `name`. Ages are measured with `clock`.
+    """
+
+    def __init__(self, fetch, ttl, max_stale, name, stats, clock=time.monotonic):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.name = name
+        self.stats = stats
+        self.clock = clock
+        self.value = None
+        self.fetched_at = None
+        self.refreshing = False
+        self.lock = threading.Lock()
+
+    def get(self):
+        with self.lock:
+            age = None if self.fetched_at is None else self.clock() - self.fetched_at
+            if age is not None and age < self.ttl:
+                self.stats[f"{self.name}_hit"] += 1
+                return self.value
+            if age is not None and age < self.max_stale:
+                self.stats[f"{self.name}_stale"] += 1
+                if not self.refreshing:
+                    self.refreshing = True
+                    threading.Thread(target=self._background_refresh, daemon=True).start()
+                return self.value
+            self.stats[f"{self.name}_miss"] += 1
+        return self._refresh()
+
+    def _refresh(self):
+        try:
+            value = self.fetch()
+            with self.lock:
+                self.value = value
+                self.fetched_at = self.clock()
+            return value
+        finally:
+            self.refreshing = False
+
+    def _background_refresh(self):
+        try:
+            self._refresh()
+        except Exception as e:
+            # keep serving the stale value; a miss will surface the error to a caller
+            print(f"Error refreshing {self.name}: {e}")
+
+
+class NetworkClient:
+    """A Web3 connection and WalkLog contract bound to one network."""
+
+    def __init__(self, net, timeout, web3=None, clock=time.monotonic):
+        abi, bytecode = load_artifacts()
+        self.name = net.get("name")
+        self.url = net.get("url")
+        # keep-alive connections are reused across writes and worker threads
+        self.session = requests.Session()
+        self.session.mount(
+            self.url,
+            requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=10),
+        )
+        self.web3 = web3 or Web3(
+            Web3.HTTPProvider(
+                self.url,
+                request_kwargs={"timeout": timeout},
+                session=self.session,
+                # the outbox worker owns retries, don't multiply the timeout here
+                exception_retry_configuration=None,
+                # web3's own chain id validation asks again on every write
+                cache_allowed_requests=True,
+                cacheable_requests={"eth_chainId"},
+            )
+        )
+        self.contract: Contract = self.web3.eth.contract(
+            address=Web3.to_checksum_address(net.get("contract")),
+            abi=abi,
+            bytecode=bytecode,
+        )
+        self._chain_id = None
+        self.clock = clock
+        self.stats = Counter()
+        self._gas_price = CachedValue(
+            lambda: self.web3.eth.gas_price,
+            GAS_PRICE_TTL,
+            GAS_PRICE_MAX_STALE,
+            "gas_price",
+            self.stats,
+            clock=clock,
+        )
+        self._gas_estimates = {}
+
+    @property
+    def chain_id(self):
+        """The chain id never changes for a given RPC endpoint, so ask only once."""
+        if self._chain_id is None:
+            self._chain_id = self.web3.eth.chain_id
+        return self._chain_id
+
+    @property
+    def gas_price(self):
+        return self._gas_price.get()
+
+    def estimate_gas(self, key, estimate):
+        """Gas limit for the call shape `key`, with headroom over `estimate()`."""
+        cached = self._gas_estimates.get(key)
+        if cached is None:
+            cached = self._gas_estimates.setdefault(
+                key,
+                CachedValue(
+                    lambda: math.ceil(estimate() * GAS_ESTIMATE_HEADROOM),
+                    GAS_ESTIMATE_TTL,
+                    GAS_ESTIMATE_TTL,
+                    "gas_estimate",
+                    self.stats,
+                    clock=self.clock,
+                ),
+            )
+        return cached.get()
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(net, timeout) -> NetworkClient:
+    """Return the cached client for `net`, creating it on first use."""
+    key = (net.get("name"), net.get("url"), net.get("contract"), timeout)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = NetworkClient(net, timeout)
+    return client
+
+
+def register_client(net, timeout, web3, clock=time.monotonic) -> NetworkClient:
+    """Serve `net` from an existing Web3 instance, e.g. a local eth-tester chain."""
+    client = NetworkClient(net, timeout, web3=web3, clock=clock)
+    with _clients_lock:
+        _clients[(net.get("name"), net.get("url"), net.get("contract"), timeout)] = client
+    return client
+
+
+def cache_stats():
+    """Cache hit/stale/miss counters per network, to confirm the RPC calls saved."""
+    with _clients_lock:
+        clients = list(_clients.values())
+    stats = {}
+    for client in clients:
+        stats.setdefault(client.name, Counter()).update(client.stats)
+    return {name: dict(counter) for name, counter in stats.items()}
+
+
+def clear_clients():
+    """Drop every cached client, e.g. after the network list changes."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
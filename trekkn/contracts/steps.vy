@@ -1,6 +1,10 @@
 # @version ^0.4.1
 
 #  vyper -f abi file-name.vy > file-name.abi
+#  vyper -f bytecode file-name.vy > file-name.bin
+
+# most walks logged by one logWalks call
+MAX_BATCH: constant(uint256) = 200
 
 creator: address 
 
@@ -18,3 +22,9 @@ def logWalk(_user: address, _steps: uint256):
     assert msg.sender == self.creator, "only the creator can call this method"
     log WalkLog(user=_user, steps=_steps, time=block.timestamp)
 
+@external
+def logWalks(_users: DynArray[address, MAX_BATCH], _steps: DynArray[uint256, MAX_BATCH]):
+    assert msg.sender == self.creator, "only the creator can call this method"
+    assert len(_users) == len(_steps), "users and steps must have the same length"
+    for i: uint256 in range(len(_users), bound=MAX_BATCH):
+        log WalkLog(user=_users[i], steps=_steps[i], time=block.timestamp)
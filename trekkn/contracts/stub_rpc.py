@@ -0,0 +1,99 @@
+"""
+Minimal in-process JSON-RPC server that answers the calls made by `loggable.py`.
+
+Used by the benchmark commands to measure the chain-write path offline; every
+response is delayed by `latency` seconds to stand in for a remote testnet.
+"""
+
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from eth_utils import keccak
+
+
+class StubRPCServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, chain_id=1337, host="127.0.0.1", port=0):
+        super().__init__((host, port), _StubRPCHandler)
+        self.latency = latency
+        self.chain_id = chain_id
+        self.calls = Counter()  # JSON-RPC method -> number of calls
+        self.nonce = 0
+        self.sent = {}  # tx hash -> block number it was "mined" in
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def answer(self, method, params):
+        with self.lock:
+            self.calls[method] += 1
+            if method == "eth_chainId":
+                return hex(self.chain_id)
+            if method == "eth_getTransactionCount":
+                return hex(self.nonce)
+            if method == "eth_gasPrice":
+                return hex(1_000_000_000)
+            if method == "eth_estimateGas":
+                return hex(30_000)
+            if method == "eth_sendRawTransaction":
+                self.nonce += 1
+                tx_hash = "0x" + keccak(hexstr=params[0]).hex()
+                self.sent[tx_hash] = self.nonce
+                return tx_hash
+            if method == "eth_getTransactionReceipt":
+                block = self.sent.get(params[0])
+                if block is None:
+                    return None
+                return {
+                    "transactionHash": params[0],
+                    "blockNumber": hex(block),
+                    "status": "0x1",
+                }
+        raise ValueError(f"Method {method} not supported by the stub")
+
+
+class _StubRPCHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.server.latency)
+        if isinstance(body, list):
+            payload = [self._respond(call) for call in body]
+        else:
+            payload = self._respond(body)
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _respond(self, call):
+        try:
+            result = self.server.answer(call["method"], call.get("params", []))
+            return {"jsonrpc": "2.0", "id": call["id"], "result": result}
+        except Exception as e:
+            return {
+                "jsonrpc": "2.0",
+                "id": call["id"],
+                "error": {"code": -32601, "message": str(e)},
+            }
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output readable
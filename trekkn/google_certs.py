@@ -0,0 +1,192 @@
+"""
+Google's ID token signing certificates, cached in each process.
+
+The certificates are fetched through one pooled HTTP session and kept for the
+Cache-Control max-age Google sends with them. A background thread fetches the next set
+shortly before they expire, so verifying a sign-in token is local CPU work instead of
+an HTTP round trip on the request path.
+
+`settings.GOOGLE_CERT_SOURCE` picks where certificates come from; tests and benchmarks
+plug in a `StaticCertSource` with their own keys to mint and verify tokens offline.
+"""
+
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+from google.auth import crypt, exceptions, jwt
+from requests.adapters import HTTPAdapter
+
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+# used when the response has no max-age
+DEFAULT_MAX_AGE = 60 * 60
+# refresh this many seconds before the certificates expire
+REFRESH_MARGIN = 5 * 60
+# a token signed with an unknown key forces a refetch at most this often
+UNKNOWN_KEY_REFETCH = 60
+
+
+def _max_age(cache_control):
+    match = re.search(r"max-age=(\d+)", cache_control or "")
+    return int(match.group(1)) if match else DEFAULT_MAX_AGE
+
+
+def _public_key(cert):
+    """The PKCS#1 public key of a PEM certificate, or the certificate itself.
+
+    The pure Python verifier takes ~6 ms to parse a certificate and ~0.1 ms to parse
+    the bare key, on every verification.
+    """
+    pubkey = getattr(crypt.RSAVerifier.from_string(cert), "_pubkey", None)
+    save_pkcs1 = getattr(pubkey, "save_pkcs1", None)  # only python-rsa keys have it
+    return save_pkcs1().decode() if save_pkcs1 else cert
+
+
+class CertSource(ABC):
+    @abstractmethod
+    def fetch(self):
+        """`({key id: PEM certificate or public key}, seconds they may be kept)`."""
+
+
+class HTTPCertSource(CertSource):
+    """Google's certificate endpoint, through a session that keeps its connection."""
+
+    def __init__(self, url=GOOGLE_CERTS_URL, timeout=10):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=2, max_retries=2))
+
+    def fetch(self):
+        response = self.session.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json(), _max_age(response.headers.get("Cache-Control"))
+
+
+class StaticCertSource(CertSource):
+    """Fixed certificates, e.g. the public keys of locally minted test tokens."""
+
+    certs = {}
+    max_age = DEFAULT_MAX_AGE
+
+    def __init__(self, certs=None, max_age=None):
+        if certs is not None:
+            self.certs = certs
+        if max_age is not None:
+            self.max_age = max_age
+        self.fetches = 0
+
+    def fetch(self):
+        self.fetches += 1
+        return dict(self.certs), self.max_age
+
+
+class CertCache:
+    """The certificates of a source, reloaded before they expire."""
+
+    def __init__(self, source, refresh_margin=REFRESH_MARGIN, clock=time.monotonic):
+        self.source = source
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.certs = None
+        self.expires_at = 0.0
+        self.fetched_at = None
+        self.thread = None  # the running background refresh, if any
+
+    def get(self):
+        """The current certificates; only fetches inline when there are none valid."""
+        now = self.clock()
+        if self.certs is None or now >= self.expires_at:
+            with self.lock:
+                if self.certs is None or self.clock() >= self.expires_at:
+                    self._load()
+        elif now >= self.expires_at - self.refresh_margin:
+            self._refresh_in_background()
+        return self.certs
+
+    def refetch(self, min_interval=UNKNOWN_KEY_REFETCH):
+        """Fetch now unless the last fetch is under `min_interval` seconds old."""
+        with self.lock:
+            if self.fetched_at is None or self.clock() - self.fetched_at >= min_interval:
+                self._load()
+        return self.certs
+
+    def _load(self):
+        certs, max_age = self.source.fetch()
+        fetched_at = self.clock()
+        # swapped in one assignment each, readers never see a half-built dict
+        self.certs = {key_id: _public_key(cert) for key_id, cert in certs.items()}
+        self.expires_at = fetched_at + max_age
+        self.fetched_at = fetched_at
+
+    def _refresh_in_background(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self._refresh, daemon=True)
+        self.thread.start()
+
+    def _refresh(self):
+        try:
+            with self.lock:
+                self._load()
+        except Exception as e:
+            # keep the current certificates, the next read tries again
+            print(f"Error refreshing Google certificates: {e}")
+        finally:
+            with self.lock:
+                self.thread = None
+
+
+_cert_cache = None
+_cert_cache_lock = threading.Lock()
+
+
+def get_cert_cache() -> CertCache:
+    """The process-wide cache of `settings.GOOGLE_CERT_SOURCE`."""
+    global _cert_cache
+    if _cert_cache is None:
+        with _cert_cache_lock:
+            if _cert_cache is None:
+                _cert_cache = CertCache(import_string(settings.GOOGLE_CERT_SOURCE)())
+    return _cert_cache
+
+
+def reset_cert_cache():
+    """Forget the process-wide cache, e.g. after changing the source setting."""
+    global _cert_cache
+    with _cert_cache_lock:
+        _cert_cache = None
+
+
+def verify_google_id_token(token, audience=None, clock_skew_in_seconds=0):
+    """`google.oauth2.id_token.verify_oauth2_token` against the cached certificates.
+
+    Returns the token's claims; raises ValueError or GoogleAuthError like it.
+    """
+    audience = audience or settings.GOOGLE_CLIENT_ID
+    cache = get_cert_cache()
+    certs = cache.get()
+    key_id = jwt._unverified_decode(token)[0].get("kid")
+    if key_id not in certs:
+        # Google may have rotated its keys before our copy expired
+        certs = cache.refetch()
+
+    idinfo = jwt.decode(
+        token,
+        certs=certs,
+        audience=audience,
+        clock_skew_in_seconds=clock_skew_in_seconds,
+    )
+    if idinfo["iss"] not in GOOGLE_ISSUERS:
+        raise exceptions.GoogleAuthError(
+            f"Wrong issuer. 'iss' should be one of the following: {GOOGLE_ISSUERS}"
+        )
+    return idinfo
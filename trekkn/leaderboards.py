@@ -0,0 +1,404 @@
+"""
+Step leaderboards over rolling windows of whole days, kept sorted as activities are
+written instead of aggregated per request.
+
+Every steps activity is recorded in each window it falls in. When a window rolls
+forward to a new day, the steps of the days that left it are subtracted, read from the
+daily rollups. Users are ordered by score, then id, so every user has one position.
+
+`get_leaderboard()` returns the store picked by `settings.LEADERBOARD_BACKEND`.
+"""
+
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from trekkn.models import (
+    DailyRollup,
+    LeaderboardScore,
+    LeaderboardWindow,
+    TrekknUser,
+)
+
+
+# window -> days it covers, today included
+WINDOWS = {"day": 1, "week": 7, "month": 30, "year": 364}
+
+
+def window_start(window, today):
+    """First day inside `window` on `today`."""
+    return today - timedelta(days=WINDOWS[window] - 1)
+
+
+def _step_rollups(start, end):
+    """Steps rollups on days `start <= date < end`."""
+    return DailyRollup.objects.filter(source="steps", date__gte=start, date__lt=end)
+
+
+def window_scores(window, today):
+    """`{user_id: steps}` inside `window` on `today`, summed from the daily rollups."""
+    rows = (
+        _step_rollups(window_start(window, today), today + timedelta(days=1))
+        .values("user_id")
+        .annotate(steps=Sum("step_count"))
+        .order_by()
+    )
+    return {row["user_id"]: row["steps"] for row in rows if row["steps"] > 0}
+
+
+def ranked_users(entries):
+    """Users of leaderboard `entries` in order, with `rank` and `period_steps` set."""
+    users = TrekknUser.objects.in_bulk([user_id for _, user_id, _ in entries])
+    ranked = []
+    for position, user_id, score in entries:
+        user = users.get(user_id)
+        if user is not None:
+            user.rank, user.period_steps = position, score
+            ranked.append(user)
+    return ranked
+
+
+class Leaderboard(ABC):
+    """Sorted step rankings per window.
+
+    Subclasses store the rankings; entries are `(position, user_id, score)`.
+    """
+
+    def record(self, user_id, day, steps, today=None):
+        """Add `steps` logged on `day` (negative to take back) to the windows holding it."""
+        today = today or timezone.localdate()
+        for window in WINDOWS:
+            as_of, rebuilt = self.roll(window, today)
+            # a window just rebuilt from the rollups already counts the activity
+            if not rebuilt and window_start(window, as_of) <= day <= as_of:
+                self.add(window, user_id, steps)
+
+    @abstractmethod
+    def roll(self, window, today):
+        """Move `window` forward to `today` if needed.
+
+        Returns the day it is at and whether it was rebuilt from the rollups.
+        """
+
+    @abstractmethod
+    def add(self, window, user_id, steps):
+        """Add `steps` to the user's score in `window`."""
+
+    @abstractmethod
+    def top(self, window, limit=100, offset=0, today=None):
+        """Entries ranked `offset + 1` to `offset + limit`."""
+
+    @abstractmethod
+    def rank(self, window, user_id, today=None):
+        """`(position, score)` of the user, or None without steps in the window."""
+
+    @abstractmethod
+    def around(self, window, user_id, count=5, today=None):
+        """The user's entry with up to `count` entries above and below it."""
+
+    @abstractmethod
+    def rebuild(self, window, today=None):
+        """Recompute `window` from the daily rollups."""
+
+
+class _Ranking:
+    """One window of `MemoryLeaderboard`: scores and a list sorted by (-score, id)."""
+
+    def __init__(self, scores, as_of):
+        self.as_of = as_of
+        self.scores = dict(scores)
+        self.order = sorted((-score, user_id) for user_id, score in self.scores.items())
+
+    def add(self, user_id, steps):
+        score = self.scores.pop(user_id, 0)
+        if score:
+            del self.order[bisect_left(self.order, (-score, user_id))]
+        score += steps
+        if score > 0:
+            self.scores[user_id] = score
+            insort(self.order, (-score, user_id))
+
+    def position(self, user_id):
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return bisect_left(self.order, (-score, user_id)) + 1
+
+    def entries(self, start, stop):
+        return [
+            (position + 1, user_id, -negative)
+            for position, (negative, user_id) in enumerate(
+                self.order[start:stop], start=start
+            )
+        ]
+
+
+class MemoryLeaderboard(Leaderboard):
+    """Rankings held in this process, loaded from the rollups on first use.
+
+    Writes from other processes are not seen, so this suits a single process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rankings = {}
+
+    def _roll(self, window, today):
+        ranking = self.rankings.get(window)
+        if ranking is None or (today - ranking.as_of).days >= WINDOWS[window]:
+            self.rankings[window] = _Ranking(window_scores(window, today), today)
+            return self.rankings[window], True
+        if ranking.as_of < today:
+            expired = (
+                _step_rollups(
+                    window_start(window, ranking.as_of), window_start(window, today)
+                )
+                .values("user_id")
+                .annotate(steps=Sum("step_count"))
+                .order_by()
+            )
+            for row in expired:
+                ranking.add(row["user_id"], -row["steps"])
+            ranking.as_of = today
+        return ranking, False
+
+    def _ranking(self, window, today):
+        return self._roll(window, today)[0]
+
+    def record(self, user_id, day, steps, today=None):
+        # the activity may still be rolled back
+        transaction.on_commit(
+            lambda: super(MemoryLeaderboard, self).record(user_id, day, steps, today)
+        )
+
+    def roll(self, window, today):
+        with self.lock:
+            ranking, rebuilt = self._roll(window, today)
+            return ranking.as_of, rebuilt
+
+    def add(self, window, user_id, steps):
+        with self.lock:
+            self.rankings[window].add(user_id, steps)
+
+    def top(self, window, limit=100, offset=0, today=None):
+        with self.lock:
+            ranking = self._ranking(window, today or timezone.localdate())
+            return ranking.entries(offset, offset + limit)
+
+    def rank(self, window, user_id, today=None):
+        with self.lock:
+            ranking = self._ranking(window, today or timezone.localdate())
+            position = ranking.position(user_id)
+            return None if position is None else (position, ranking.scores[user_id])
+
+    def around(self, window, user_id, count=5, today=None):
+        with self.lock:
+            ranking = self._ranking(window, today or timezone.localdate())
+            position = ranking.position(user_id)
+            if position is None:
+                return []
+            return ranking.entries(max(0, position - 1 - count), position + count)
+
+    def rebuild(self, window, today=None):
+        today = today or timezone.localdate()
+        with self.lock:
+            self.rankings[window] = _Ranking(window_scores(window, today), today)
+
+
+class DatabaseLeaderboard(Leaderboard):
+    """Rankings in the `LeaderboardScore` table, shared by every process.
+
+    A position is the number of rows ahead of the user on the (window, -score, user)
+    index, plus one. Counting them walks that many index entries, so `rank` and
+    `around` cost O(position): cheap near the top, slower for users far down a large
+    window. `top` only reads the rows it returns.
+    """
+
+    def __init__(self):
+        self.as_of = {}  # window -> day it was last seen rolled to, saves a query
+
+    def roll(self, window, today):
+        if self.as_of.get(window) == today:
+            return today, False
+        rebuilt = False
+        with transaction.atomic():
+            state, created = LeaderboardWindow.objects.select_for_update().get_or_create(
+                name=window, defaults={"as_of": today}
+            )
+            if created or (today - state.as_of).days >= WINDOWS[window]:
+                self._rebuild(window, today)
+                rebuilt = True
+            elif state.as_of < today:
+                self._expire(window, state.as_of, today)
+            if state.as_of < today:
+                state.as_of = today
+                state.save(update_fields=["as_of"])
+        as_of = state.as_of
+        # only trust the roll once it is committed
+        transaction.on_commit(lambda: self.as_of.__setitem__(window, as_of))
+        return as_of, rebuilt
+
+    def _expire(self, window, as_of, today):
+        """Subtract the days between the old and new window start, in one UPDATE."""
+        expired = _step_rollups(window_start(window, as_of), window_start(window, today))
+        steps = (
+            expired.filter(user_id=OuterRef("user_id"))
+            .values("user_id")
+            .annotate(steps=Sum("step_count"))
+            .values("steps")
+        )
+        scores = LeaderboardScore.objects.filter(window=window)
+        scores.filter(user_id__in=expired.values("user_id")).update(
+            score=models.F("score")
+            - Coalesce(Subquery(steps), 0, output_field=models.BigIntegerField())
+        )
+        scores.filter(score__lte=0).delete()
+
+    def _rebuild(self, window, today):
+        LeaderboardScore.objects.filter(window=window).delete()
+        LeaderboardScore.objects.bulk_create(
+            [
+                LeaderboardScore(window=window, user_id=user_id, score=score)
+                for user_id, score in window_scores(window, today).items()
+            ],
+            batch_size=1000,
+        )
+
+    def record(self, user_id, day, steps, today=None):
+        if not steps:
+            return
+        today = today or timezone.localdate()
+        windows = []
+        for window in WINDOWS:
+            # recorded before the activity's rollup is written, see DailyRollup, so a
+            # rebuild on the way doesn't count it yet
+            as_of, _ = self.roll(window, today)
+            if window_start(window, as_of) <= day <= as_of:
+                windows.append(window)
+        self._add(windows, user_id, steps)
+
+    def add(self, window, user_id, steps):
+        self._add([window], user_id, steps)
+
+    def _add(self, windows, user_id, steps):
+        scores = LeaderboardScore.objects.filter(user_id=user_id, window__in=windows)
+        with transaction.atomic():
+            # lock the rows there are, so the windows without one are known for sure
+            existing = set(scores.select_for_update().values_list("window", flat=True))
+            # one UPDATE for every window once the user has rows in all of them
+            scores.filter(window__in=existing).update(score=models.F("score") + steps)
+            if steps <= 0:
+                return
+            for window in windows:
+                if window in existing:
+                    continue
+                try:
+                    with transaction.atomic():
+                        LeaderboardScore.objects.create(
+                            window=window, user_id=user_id, score=steps
+                        )
+                except IntegrityError:
+                    # another writer created it since the lookup; it's committed now
+                    scores.filter(window=window).update(
+                        score=models.F("score") + steps
+                    )
+
+    def _ranked(self, window):
+        return LeaderboardScore.objects.filter(window=window, score__gt=0)
+
+    def _ahead_of(self, score, user_id):
+        return models.Q(score__gt=score) | models.Q(score=score, user_id__lt=user_id)
+
+    def top(self, window, limit=100, offset=0, today=None):
+        self.roll(window, today or timezone.localdate())
+        rows = self._ranked(window).order_by("-score", "user_id")[offset : offset + limit]
+        return [
+            (position, user_id, score)
+            for position, (user_id, score) in enumerate(
+                rows.values_list("user_id", "score"), start=offset + 1
+            )
+        ]
+
+    def rank(self, window, user_id, today=None):
+        self.roll(window, today or timezone.localdate())
+        score = (
+            self._ranked(window)
+            .filter(user_id=user_id)
+            .values_list("score", flat=True)
+            .first()
+        )
+        if score is None:
+            return None
+        ahead = self._ranked(window).filter(self._ahead_of(score, user_id)).count()
+        return ahead + 1, score
+
+    def around(self, window, user_id, count=5, today=None):
+        found = self.rank(window, user_id, today)
+        if found is None:
+            return []
+        position, score = found
+        ranked = self._ranked(window)
+        above = list(
+            ranked.filter(self._ahead_of(score, user_id))
+            .order_by("score", "-user_id")
+            .values_list("user_id", "score")[:count]
+        )
+        below = list(
+            ranked.exclude(self._ahead_of(score, user_id))
+            .exclude(user_id=user_id)
+            .order_by("-score", "user_id")
+            .values_list("user_id", "score")[:count]
+        )
+        return (
+            [
+                (position - i, other, other_score)
+                for i, (other, other_score) in reversed(list(enumerate(above, start=1)))
+            ]
+            + [(position, user_id, score)]
+            + [
+                (position + i, other, other_score)
+                for i, (other, other_score) in enumerate(below, start=1)
+            ]
+        )
+
+    def rebuild(self, window, today=None):
+        today = today or timezone.localdate()
+        with transaction.atomic():
+            LeaderboardWindow.objects.update_or_create(
+                name=window, defaults={"as_of": today}
+            )
+            self._rebuild(window, today)
+            transaction.on_commit(lambda: self.as_of.__setitem__(window, today))
+
+
+BACKENDS = {"db": DatabaseLeaderboard, "memory": MemoryLeaderboard}
+
+_leaderboard = None
+_leaderboard_lock = threading.Lock()
+
+
+def get_leaderboard() -> Leaderboard:
+    """The process-wide leaderboard of `settings.LEADERBOARD_BACKEND`."""
+    global _leaderboard
+    if _leaderboard is None:
+        with _leaderboard_lock:
+            if _leaderboard is None:
+                name = settings.LEADERBOARD_BACKEND
+                backend = BACKENDS.get(name) or import_string(name)
+                _leaderboard = backend()
+    return _leaderboard
+
+
+def reset_leaderboard():
+    """Forget the process-wide leaderboard, e.g. after changing the backend setting."""
+    global _leaderboard
+    with _leaderboard_lock:
+        _leaderboard = None
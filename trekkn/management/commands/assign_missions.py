@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from trekkn.missions import (
+    CHUNK_SIZE,
+    assign_mission_to_users,
+    assign_pending_missions,
+    sparse,
+)
+from trekkn.models import Mission
+
+
+class Command(BaseCommand):
+    help = "Give every user the missions not yet assigned to all of them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Assign the pending missions once and exit instead of polling forever",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Assign every mission once and exit, e.g. after leaving sparse mode",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help="Users given a mission per INSERT",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=10.0,
+            help="Seconds to sleep when no mission is pending",
+        )
+
+    def handle(self, *args, **options):
+        if sparse():
+            raise CommandError("Nothing to assign with USER_MISSION_STORAGE=sparse")
+        if options["all"]:
+            for mission in Mission.objects.order_by("pk"):
+                users = assign_mission_to_users(mission, options["chunk_size"])
+                self.stdout.write(self.style.SUCCESS(f"{mission.name}: {users} users"))
+            return
+
+        while True:
+            started = time.perf_counter()
+            missions = assign_pending_missions(chunk_size=options["chunk_size"])
+            if missions:
+                names = ", ".join(mission.name for mission in missions)
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Assigned {names} to every user "
+                        f"in {time.perf_counter() - started:.1f} s"
+                    )
+                )
+            if options["once"]:
+                break
+            time.sleep(options["poll_interval"])
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from trekkn.step_totals import CHUNK_SIZE, rebuild_step_totals
+
+
+class Command(BaseCommand):
+    help = "Rebuild every user's lifetime and per-source step totals from their activities"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help="Users locked and rebuilt per transaction",
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_step_totals(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt step totals of {rebuilt} users"))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from trekkn.contracts.loggable import (
+    CREATOR_ADDRESS,
+    write_batch_to_network,
+    write_steps_to_network,
+)
+
+
+class Command(BaseCommand):
+    help = "Report gas per logged walk for logWalk and logWalks on a local eth-tester chain"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[1, 10, 50, 100, 200],
+            help="Batch sizes to measure",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            from trekkn.contracts.local_chain import deploy_local_walklog
+
+            web3, net = deploy_local_walklog()
+        except ImportError as e:
+            raise CommandError(
+                f"{e}. Install the local chain with: pip install 'eth-tester[py-evm]'"
+            )
+
+        tx_hash = write_steps_to_network(net, CREATOR_ADDRESS, 1000)
+        single = web3.eth.get_transaction_receipt(tx_hash).gasUsed
+        self.stdout.write(f"logWalk:          {single} gas per walk")
+
+        for size in options["sizes"]:
+            tx_hash = write_batch_to_network(
+                net, [(CREATOR_ADDRESS, 1000 + i) for i in range(size)]
+            )
+            gas = web3.eth.get_transaction_receipt(tx_hash).gasUsed
+            self.stdout.write(
+                f"logWalks x{size:<4}   {gas / size:.0f} gas per walk "
+                f"({gas} total, {single / (gas / size):.1f}x vs logWalk)"
+            )
@@ -0,0 +1,208 @@
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from trekkn.contracts.breaker import clear_breakers, get_breaker
+from trekkn.contracts.loggable import CREATOR_ADDRESS, write_steps_to_multiple_networks
+from trekkn.contracts.registry import cache_stats
+from trekkn.contracts.stub_rpc import StubRPCServer
+from trekkn.models import DailyActivity, StepLogOutbox, TrekknUser
+from trekkn.outbox import drain_outbox, enqueue_step_logs
+
+SCENARIOS = ["sequential", "concurrent", "outbox", "outbox-batched"]
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the chain-write path offline, against in-process stub RPC servers "
+        "or local eth-tester chains with injected latency"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backend",
+            choices=["stub", "eth-tester"],
+            default="stub",
+            help="stub: JSON-RPC servers on localhost; eth-tester: WalkLog deployed on py-evm",
+        )
+        parser.add_argument("--networks", type=int, default=5)
+        parser.add_argument(
+            "--latency-ms",
+            type=float,
+            default=50.0,
+            help="Delay added to every RPC call",
+        )
+        parser.add_argument("--walks", type=int, default=20, help="Walks per scenario")
+        parser.add_argument(
+            "--walks-per-tx",
+            type=int,
+            default=100,
+            help="logWalks batch size for the outbox-batched scenario",
+        )
+        parser.add_argument(
+            "--scenarios",
+            nargs="+",
+            choices=SCENARIOS,
+            default=SCENARIOS,
+        )
+
+    def handle(self, *args, **options):
+        latency = options["latency_ms"] / 1000
+        if options["backend"] == "stub":
+            networks, calls, stop = self.start_stub(options["networks"], latency)
+        else:
+            networks, calls, stop = self.start_eth_tester(options["networks"], latency)
+
+        self.stdout.write(
+            f"{options['backend']} backend, {len(networks)} networks, "
+            f"{options['latency_ms']:.0f} ms per RPC call, {options['walks']} walks\n"
+        )
+        self.stdout.write(
+            f"{'scenario':<16}{'wall s':>8}{'walks/s':>9}{'tx p50 ms':>11}"
+            f"{'tx p95 ms':>11}{'walk p95 ms':>13}{'RPC/walk':>10}"
+        )
+        try:
+            with override_settings(CHAIN_NETWORKS=networks):
+                # warm the client, gas and chain id caches so every scenario starts equal
+                write_steps_to_multiple_networks(CREATOR_ADDRESS, 1, concurrent=True)
+                for scenario in options["scenarios"]:
+                    self.run_scenario(scenario, networks, calls, options)
+        finally:
+            stop()
+
+        totals = Counter()
+        for name, stats in cache_stats().items():
+            if name in {net["name"] for net in networks}:
+                totals.update(stats)
+        self.stdout.write(f"\nRPC caches: {dict(sorted(totals.items()))}")
+
+    def start_stub(self, count, latency):
+        servers = [
+            StubRPCServer(latency=latency, chain_id=1337 + i).start() for i in range(count)
+        ]
+        networks = [
+            {"name": f"STUB_{i}", "url": server.url, "contract": CREATOR_ADDRESS}
+            for i, server in enumerate(servers)
+        ]
+
+        def calls():
+            return sum(sum(server.calls.values()) for server in servers)
+
+        def stop():
+            for server in servers:
+                server.stop()
+
+        return networks, calls, stop
+
+    def start_eth_tester(self, count, latency):
+        try:
+            from trekkn.contracts.local_chain import deploy_local_walklog
+        except ImportError as e:
+            raise CommandError(
+                f"{e}. Install the local chain with: pip install 'eth-tester[py-evm]'"
+            )
+
+        counter = Counter()
+        networks = []
+        for i in range(count):
+            web3, net = deploy_local_walklog(name=f"LOCAL_{i}", batch=False)
+            provider = web3.provider
+            make_request = provider.make_request
+
+            def timed_request(method, params, make_request=make_request):
+                counter["calls"] += 1
+                time.sleep(latency)  # stands in for the round trip to a testnet
+                return make_request(method, params)
+
+            provider.make_request = timed_request
+            # web3 memoizes the middleware chain around the original make_request
+            provider._request_func_cache = (None, None)
+            networks.append(net)
+        return networks, lambda: counter["calls"], lambda: None
+
+    def run_scenario(self, scenario, networks, calls, options):
+        walks = options["walks"]
+        clear_breakers()
+        calls_before = calls()
+        walk_latencies = []
+
+        if scenario in ("sequential", "concurrent"):
+            started = time.perf_counter()
+            for i in range(walks):
+                walk_started = time.perf_counter()
+                write_steps_to_multiple_networks(
+                    CREATOR_ADDRESS,
+                    1000 + i,
+                    concurrent=scenario == "concurrent",
+                    networks=networks,
+                )
+                walk_latencies.append(time.perf_counter() - walk_started)
+            elapsed = time.perf_counter() - started
+        else:
+            batched = scenario == "outbox-batched"
+            batch_networks = [dict(net, batch=batched) for net in networks]
+            with override_settings(CHAIN_NETWORKS=batch_networks):
+                elapsed = self.run_outbox(walks, options["walks_per_tx"])
+
+        tx_latencies = [
+            latency
+            for net in networks
+            for latency, _ in get_breaker(net["name"]).samples
+        ]
+        rpc_per_walk = (calls() - calls_before) / walks / len(networks)
+        # the outbox scenarios don't block a request, so there is no per-walk latency
+        walk_p95 = (
+            f"{_percentile(walk_latencies, 0.95) * 1000:.1f}" if walk_latencies else "-"
+        )
+        self.stdout.write(
+            f"{scenario:<16}{elapsed:>8.2f}{walks / elapsed:>9.1f}"
+            f"{_percentile(tx_latencies, 0.50) * 1000:>11.1f}"
+            f"{_percentile(tx_latencies, 0.95) * 1000:>11.1f}"
+            f"{walk_p95:>13}"
+            f"{rpc_per_walk:>10.2f}"
+        )
+
+    def run_outbox(self, walks, walks_per_tx):
+        """Queue `walks` activities and time the worker draining them.
+
+        Runs in a transaction that is rolled back, so nothing is left in the database.
+        """
+        elapsed = None
+        try:
+            with transaction.atomic():
+                user = TrekknUser.objects.create(
+                    email="bench-chain-writes@example.com",
+                    username="bench",
+                )
+                for i in range(walks):
+                    activity = DailyActivity.objects.create(
+                        user=user, step_count=1000 + i, source="steps"
+                    )
+                    enqueue_step_logs(activity, user_address=CREATOR_ADDRESS)
+
+                started = time.perf_counter()
+                while drain_outbox(walks_per_tx=walks_per_tx, batch_window=timedelta(0)):
+                    pass
+                elapsed = time.perf_counter() - started
+                unsent = StepLogOutbox.objects.exclude(status=StepLogOutbox.SENT).count()
+                if unsent:
+                    self.stdout.write(self.style.WARNING(f"{unsent} rows not sent"))
+                raise _Rollback
+        except _Rollback:
+            pass
+        return elapsed
@@ -0,0 +1,236 @@
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from trekkn.models import DailyActivity, TrekknUser, UserEventLog
+
+
+class _Rollback(Exception):
+    pass
+
+
+# models whose hot path indexes are dropped for the "before" run
+INDEXED_MODELS = [DailyActivity, UserEventLog, TrekknUser]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway dataset and print the query plans and timings of the hot "
+        "queries without and with the indexes declared on the models"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=5_000)
+        parser.add_argument("--activities", type=int, default=1_000_000)
+        parser.add_argument("--events", type=int, default=500_000)
+        parser.add_argument(
+            "--days", type=int, default=60, help="History the rows are spread over"
+        )
+        parser.add_argument(
+            "--lookups", type=int, default=200, help="Users queried per per-user query"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="Runs per query, best kept"
+        )
+        parser.add_argument(
+            "--no-plans", action="store_true", help="Only print the timings"
+        )
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        try:
+            # everything, the dropped indexes included, is rolled back
+            with transaction.atomic():
+                self.run(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def run(self, options):
+        started = time.perf_counter()
+        user_ids = self.seed(
+            options["users"], options["activities"], options["events"], options["days"]
+        )
+        self.stdout.write(
+            f"Seeded {len(user_ids)} users, {options['activities']} activities and "
+            f"{options['events']} events on {connection.vendor} "
+            f"in {time.perf_counter() - started:.1f} s"
+        )
+        lookups = random.sample(user_ids, min(options["lookups"], len(user_ids)))
+        queries = self.queries(lookups, options["days"])
+
+        # the schema editor refuses to open inside a transaction on SQLite, but adding
+        # and dropping indexes only needs its (here empty) deferred statements
+        editor = connection.schema_editor(atomic=False)
+        editor.deferred_sql = []
+        indexes = [
+            (model, index) for model in INDEXED_MODELS for index in model._meta.indexes
+        ]
+
+        for model, index in indexes:
+            editor.remove_index(model, index)
+        before = self.measure("before", queries, options)
+
+        for model, index in indexes:
+            editor.add_index(model, index)
+        after = self.measure("after", queries, options)
+
+        self.stdout.write(
+            f"\n{'query':<22}{'before ms':>11}{'after ms':>11}{'speedup':>9}"
+        )
+        for label, _, _ in queries:
+            self.stdout.write(
+                f"{label:<22}{before[label] * 1000:>11.1f}{after[label] * 1000:>11.1f}"
+                f"{before[label] / max(after[label], 1e-9):>8.1f}x"
+            )
+
+    def queries(self, lookups, days):
+        """`(label, queryset to explain, statements to time)` of each hot query.
+
+        Per-user queries are timed for every user in `lookups`. Statements are compiled
+        up front so the timings are the database's, not the ORM's.
+        """
+        now = timezone.now()
+        cutoff = now - timedelta(hours=23)
+        week = now - timedelta(weeks=1)
+        history = now - timedelta(days=days // 2)
+
+        def per_user(build):
+            statements = [build(user_id).query.sql_with_params() for user_id in lookups]
+            return build(lookups[0]), statements
+
+        def once(queryset):
+            return queryset, [queryset.query.sql_with_params()]
+
+        return [
+            # DailyActivityListCreateView.post
+            (
+                "23h check",
+                *per_user(
+                    lambda user_id: DailyActivity.objects.filter(
+                        user_id=user_id, timestamp__gte=cutoff
+                    ).values("pk")[:1]
+                ),
+            ),
+            # DailyActivityListCreateView.get
+            (
+                "latest activities",
+                *per_user(
+                    lambda user_id: DailyActivity.objects.filter(user_id=user_id)
+                    .order_by("-timestamp")
+                    .values_list("pk", "step_count", "timestamp")[:50]
+                ),
+            ),
+            # a user's step days, as streaks and rollups read them
+            (
+                "user step history",
+                *per_user(
+                    lambda user_id: DailyActivity.objects.filter(
+                        user_id=user_id, source="steps", timestamp__gte=history
+                    ).values_list("timestamp", "step_count")
+                ),
+            ),
+            (
+                "weekly steps",
+                *once(
+                    DailyActivity.objects.filter(source="steps", timestamp__gte=week)
+                    .values("user_id")
+                    .annotate(steps=Sum("step_count"))
+                    .order_by()
+                ),
+            ),
+            (
+                "latest events",
+                *per_user(
+                    lambda user_id: UserEventLog.objects.filter(user_id=user_id)
+                    .order_by("-timestamp")
+                    .values_list("pk", "event_type", "timestamp")[:50]
+                ),
+            ),
+            # the level leaderboard
+            (
+                "top levels",
+                *once(TrekknUser.objects.order_by("-level").values_list("pk")[:100]),
+            ),
+        ]
+
+    def measure(self, name, queries, options):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")  # fresh statistics for the planner
+        self.stdout.write(f"\n== {name} ==")
+        timings = {}
+        for label, queryset, statements in queries:
+            if not options["no_plans"]:
+                self.stdout.write(f"\n{label}:")
+                self.stdout.write(queryset.explain())
+            best = None
+            with connection.cursor() as cursor:
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    for sql, params in statements:
+                        cursor.execute(sql, params)
+                        cursor.fetchall()
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+            timings[label] = best
+        return timings
+
+    def seed(self, users, activities, events, days):
+        """Bulk insert users, activities and events, skipping the per-row save logic."""
+        user_ids = [uuid.uuid4() for _ in range(users)]
+        TrekknUser.objects.bulk_create(
+            [
+                TrekknUser(
+                    id=user_id,
+                    email=f"bench-{user_id.hex}@example.com",
+                    username=f"bench-{i}",
+                    displayname=f"Bench {i}",
+                    level=random.randint(1, 50),
+                )
+                for i, user_id in enumerate(user_ids)
+            ],
+            batch_size=5000,
+        )
+
+        now = timezone.now()
+
+        def when():
+            return now - timedelta(seconds=random.randint(0, days * 86400))
+
+        sources = ["steps"] * 8 + ["referral", "bonus"]
+        batch = []
+        for i in range(activities):
+            source = random.choice(sources)
+            batch.append(
+                DailyActivity(
+                    user_id=random.choice(user_ids),
+                    step_count=random.randint(0, 15_000) if source == "steps" else 0,
+                    timestamp=when(),
+                    source=source,
+                )
+            )
+            if len(batch) == 50_000 or i == activities - 1:
+                DailyActivity.objects.bulk_create(batch, batch_size=5000)
+                batch = []
+
+        event_types = ["steps", "referral", "mission"]
+        for i in range(events):
+            batch.append(
+                UserEventLog(
+                    user_id=random.choice(user_ids),
+                    event_type=random.choice(event_types),
+                    description="bench",
+                    timestamp=when(),
+                )
+            )
+            if len(batch) == 50_000 or i == events - 1:
+                UserEventLog.objects.bulk_create(batch, batch_size=5000)
+                batch = []
+        return user_ids
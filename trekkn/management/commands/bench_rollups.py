@@ -0,0 +1,154 @@
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from trekkn.models import DailyActivity, TrekknUser
+from trekkn.rollups import rebuild_rollups
+from trekkn.streaks import latest_islands
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway dataset and compare leaderboard and streak queries on the raw "
+        "activities with the same queries on the daily rollups"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=5_000)
+        parser.add_argument("--activities", type=int, default=3_000_000)
+        parser.add_argument(
+            "--days", type=int, default=60, help="History the activities are spread over"
+        )
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per query, best kept")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        try:
+            # everything is rolled back, the database is left as it was
+            with transaction.atomic():
+                self.run(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def timed(self, label, query, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = query()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        self.stdout.write(f"  {label:<10}{best * 1000:>10.1f} ms")
+        return result
+
+    def run(self, options):
+        started = time.perf_counter()
+        user_ids = self.seed(options["users"], options["activities"], options["days"])
+        self.stdout.write(
+            f"Seeded {options['activities']} activities for {len(user_ids)} users "
+            f"in {time.perf_counter() - started:.1f} s"
+        )
+
+        started = time.perf_counter()
+        rollups = rebuild_rollups()
+        self.stdout.write(
+            f"Built {rollups} rollups in {time.perf_counter() - started:.1f} s\n"
+        )
+
+        repeat = options["repeat"]
+        start = timezone.now() - timedelta(weeks=1)
+        start_day = timezone.localdate(start) + timedelta(days=1)
+
+        self.stdout.write("Weekly step leaderboard, top 100")
+        self.timed(
+            "raw",
+            lambda: list(
+                self.leaderboard(
+                    "daily_activities__step_count",
+                    models.Q(daily_activities__timestamp__gte=start)
+                    & models.Q(daily_activities__source="steps"),
+                )
+            ),
+            repeat,
+        )
+        self.timed(
+            "rollup",
+            lambda: list(
+                self.leaderboard(
+                    "daily_rollups__step_count",
+                    models.Q(daily_rollups__date__gte=start_day)
+                    & models.Q(daily_rollups__source="steps"),
+                )
+            ),
+            repeat,
+        )
+
+        self.stdout.write("Streaks of every user (gaps and islands)")
+        raw_days = (
+            DailyActivity.objects.filter(source="steps")
+            .annotate(day=TruncDate("timestamp"))
+            .values("user_id", "day")
+            .distinct()
+            .order_by()
+        )
+        raw = self.timed("raw", lambda: latest_islands(raw_days), repeat)
+        rolled = self.timed("rollup", latest_islands, repeat)
+        if raw != rolled:
+            self.stdout.write(self.style.ERROR("Rollup streaks differ from raw streaks"))
+
+    def leaderboard(self, field, condition):
+        return (
+            TrekknUser.objects.annotate(period_steps=Sum(field, filter=condition))
+            .exclude(period_steps=None)
+            .order_by("-period_steps")
+            .values_list("pk", "period_steps")[:100]
+        )
+
+    def seed(self, users, activities, days):
+        """Bulk insert users and activities, skipping the per-row save logic."""
+        user_ids = [uuid.uuid4() for _ in range(users)]
+        TrekknUser.objects.bulk_create(
+            [
+                TrekknUser(
+                    id=user_id,
+                    email=f"bench-{user_id.hex}@example.com",
+                    username=f"bench-{i}",
+                    displayname=f"Bench {i}",
+                )
+                for i, user_id in enumerate(user_ids)
+            ],
+            batch_size=5000,
+        )
+
+        now = timezone.now()
+        sources = ["steps"] * 8 + ["referral", "bonus"]
+        batch = []
+        for i in range(activities):
+            steps = random.randint(0, 15_000)
+            source = random.choice(sources)
+            batch.append(
+                DailyActivity(
+                    user_id=random.choice(user_ids),
+                    step_count=steps if source != "referral" else 0,
+                    timestamp=now - timedelta(seconds=random.randint(0, days * 86400)),
+                    amount_rewarded=steps * 0.05 if source == "steps" else 0.0,
+                    aura_gained=(steps // 1000) * 10 if source == "steps" else 0,
+                    source=source,
+                )
+            )
+            if len(batch) == 50_000 or i == activities - 1:
+                DailyActivity.objects.bulk_create(batch, batch_size=5000)
+                batch = []
+        return user_ids
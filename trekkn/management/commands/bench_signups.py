@@ -0,0 +1,114 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from eth_account import Account
+from eth_account.hdaccount import generate_mnemonic
+from solders.keypair import Keypair
+
+from trekkn.models import TrekknUser
+from trekkn.wallets import master_seed, reserve_wallet_indexes
+
+MODES = ["random", "hd"]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark signup throughput with wallets generated per user (random) and "
+        "derived from the master seed when first needed (hd)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=500, help="Signups per mode")
+        parser.add_argument(
+            "--bulk", type=int, default=5_000, help="Users per bulk_create run"
+        )
+        parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+
+    def handle(self, *args, **options):
+        # a throwaway seed unless one is configured; nothing is kept either way
+        mnemonic = settings.WALLET_MNEMONIC or generate_mnemonic(12, "english")
+        self.stdout.write(
+            f"{'mode':<8}{'signups/s':>11}{'ms/signup':>11}{'bulk users/s':>14}"
+            f"{'first use ms':>14}"
+        )
+        for mode in options["modes"]:
+            with override_settings(WALLET_MODE=mode, WALLET_MNEMONIC=mnemonic):
+                if mode == "hd":
+                    master_seed()  # derived once per process, not per signup
+                self.run_mode(mode, options)
+
+    def run_mode(self, mode, options):
+        try:
+            # everything is rolled back, the database is left as it was
+            with transaction.atomic():
+                signups, users = self.time_signups(options["users"])
+                bulk = self.time_bulk(mode, options["bulk"])
+
+                # what an HD user pays later, once, when the addresses are first read
+                started = time.perf_counter()
+                for user in users:
+                    user.ensure_wallet()
+                first_use = (time.perf_counter() - started) / len(users)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        first_use = f"{first_use * 1000:.2f}" if mode == "hd" else "-"
+        self.stdout.write(
+            f"{mode:<8}{signups:>11.1f}{1000 / signups:>11.2f}{bulk:>14.0f}"
+            f"{first_use:>14}"
+        )
+
+    def time_signups(self, count):
+        """Create users the way sign-in does, one `create_user` each."""
+        users = []
+        started = time.perf_counter()
+        for i in range(count):
+            users.append(
+                TrekknUser.objects.create_user(
+                    email=f"bench-signup-{uuid.uuid4().hex}@example.com",
+                    username=f"bench-{i}",
+                    displayname=f"Bench {i}",
+                    device_id=uuid.uuid4().hex,
+                )
+            )
+        return count / (time.perf_counter() - started), users
+
+    def time_bulk(self, mode, count):
+        """Import `count` users in one `bulk_create`, which skips `save`.
+
+        Random wallets still have to be generated per user; HD users only need one
+        reservation for the whole range.
+        """
+        started = time.perf_counter()
+        users = [
+            TrekknUser(
+                email=f"bench-bulk-{uuid.uuid4().hex}@example.com",
+                username=f"bench-bulk-{i}",
+                displayname=f"Bench {i}",
+                invite_code=uuid.uuid4().hex[:10],
+            )
+            for i in range(count)
+        ]
+        if mode == "hd":
+            first = reserve_wallet_indexes(count)
+            for offset, user in enumerate(users):
+                user.wallet_index = first + offset
+        else:
+            for user in users:
+                # what save() does for each user
+                account = Account.create()
+                keypair = Keypair()
+                user.evm_key, user.evm_addr = account.key.hex(), account.address
+                user.sol_key = keypair.secret().hex()
+                user.sol_addr = str(keypair.pubkey())
+        TrekknUser.objects.bulk_create(users, batch_size=1000)
+        return count / (time.perf_counter() - started)
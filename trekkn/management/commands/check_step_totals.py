@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from trekkn.step_totals import CHUNK_SIZE, find_mismatches, rebuild_step_totals
+
+
+class Command(BaseCommand):
+    help = "Compare the maintained step totals with the activity history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Rebuild the totals of the users that don't match",
+        )
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        mismatches = find_mismatches(chunk_size=options["chunk_size"])
+        for mismatch in mismatches:
+            self.stdout.write(
+                f"{mismatch['user_id']}: total {mismatch['stored_total']} "
+                f"(expected {mismatch['expected_total']}), "
+                f"per source {mismatch['stored']} (expected {mismatch['expected']})"
+            )
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("Step totals match the activities"))
+            return
+
+        if options["fix"]:
+            rebuilt = rebuild_step_totals(
+                user_ids=[mismatch["user_id"] for mismatch in mismatches],
+                chunk_size=options["chunk_size"],
+            )
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt step totals of {rebuilt} users"))
+        else:
+            raise CommandError(f"{len(mismatches)} users have wrong step totals")
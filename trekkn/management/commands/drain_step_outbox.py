@@ -0,0 +1,90 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from trekkn.models import StepLogOutbox
+from trekkn.outbox import (
+    BATCH_SIZE,
+    BATCH_WINDOW,
+    MAX_ATTEMPTS,
+    drain_outbox,
+    save_network_health,
+)
+
+
+class Command(BaseCommand):
+    help = "Write queued step logs to the EVM networks, with retries and backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the due rows once and exit instead of polling forever",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Rows claimed from the outbox per loop",
+        )
+        parser.add_argument(
+            "--walks-per-tx",
+            type=int,
+            default=BATCH_SIZE,
+            help="Walks packed into one logWalks call on networks with batching",
+        )
+        parser.add_argument(
+            "--batch-window",
+            type=float,
+            default=BATCH_WINDOW.total_seconds(),
+            help="Seconds a partial batch may wait for more walks",
+        )
+        parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS)
+        parser.add_argument(
+            "--sequential",
+            action="store_true",
+            help="Send to one network at a time instead of all networks in parallel",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Seconds to sleep when the outbox has nothing due",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            rows = drain_outbox(
+                batch_size=options["batch_size"],
+                max_attempts=options["max_attempts"],
+                concurrent=not options["sequential"],
+                walks_per_tx=options["walks_per_tx"],
+                batch_window=timedelta(seconds=options["batch_window"]),
+            )
+            # also when nothing was sent, e.g. every network is behind an open breaker
+            save_network_health()
+            for row in rows:
+                if row.status == StepLogOutbox.SENT:
+                    self.stdout.write(
+                        self.style.SUCCESS(f"{row.network}: sent {row.tx_hash}")
+                    )
+                elif row.status == StepLogOutbox.DEAD:
+                    self.stdout.write(
+                        self.style.ERROR(
+                            f"{row.network}: dead after {row.attempts} attempts: {row.last_error}"
+                        )
+                    )
+                else:
+                    self.stdout.write(
+                        self.style.WARNING(
+                            f"{row.network}: attempt {row.attempts} failed, retry at {row.next_attempt_at}"
+                        )
+                    )
+
+            # a full batch means there is probably more work waiting
+            if len(rows) == options["batch_size"]:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["poll_interval"])
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from trekkn.missions import CHUNK_SIZE, prune_incomplete_missions, sparse
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the UserMission rows of missions not completed, once "
+        "USER_MISSION_STORAGE=sparse no longer needs them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if not sparse():
+            raise CommandError("Set USER_MISSION_STORAGE=sparse first")
+        deleted = prune_incomplete_missions(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} incomplete rows"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from trekkn.leaderboards import WINDOWS, get_leaderboard
+
+
+class Command(BaseCommand):
+    help = "Recompute the step leaderboards from the daily rollups"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "windows",
+            nargs="*",
+            choices=list(WINDOWS),
+            help="Windows to rebuild, all by default",
+        )
+
+    def handle(self, *args, **options):
+        board = get_leaderboard()
+        for window in options["windows"] or WINDOWS:
+            board.rebuild(window)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt the {window} leaderboard"))
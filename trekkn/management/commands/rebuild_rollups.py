@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from trekkn.rollups import CHUNK_SIZE, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user daily rollups from the raw activities"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help="Users locked and rebuilt per transaction",
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} daily rollups"))
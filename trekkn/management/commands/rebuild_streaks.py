@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from trekkn.streaks import rebuild_streaks
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's streak and last active day from their steps activities"
+
+    def handle(self, *args, **options):
+        changed = rebuild_streaks()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the streak of {changed} users"))
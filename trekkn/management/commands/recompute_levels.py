@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from trekkn.models import TrekknUser
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's level from their aura, e.g. after the level curve changes"
+
+    def handle(self, *args, **options):
+        level = TrekknUser.level_expression()
+        # one set-based UPDATE; users already on the right level are left alone
+        updated = TrekknUser.objects.exclude(level=level).update(level=level)
+        self.stdout.write(self.style.SUCCESS(f"Updated the level of {updated} users"))
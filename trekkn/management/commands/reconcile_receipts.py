@@ -0,0 +1,63 @@
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from trekkn.receipts import RECEIPT_TIMEOUT, RECEIPTS_PER_REQUEST, reconcile_receipts
+
+
+class Command(BaseCommand):
+    help = "Poll receipts of sent step logs and mark them confirmed, failed or resubmit"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Reconcile once and exit instead of polling forever",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=RECEIPTS_PER_REQUEST,
+            help="Transaction hashes per JSON-RPC batch request",
+        )
+        parser.add_argument(
+            "--max-requests",
+            type=int,
+            default=10,
+            help="Batch requests per network per round",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=1.0,
+            help="Requests per second per network within a round",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=15.0,
+            help="Seconds between rounds",
+        )
+        parser.add_argument(
+            "--receipt-timeout",
+            type=float,
+            default=RECEIPT_TIMEOUT.total_seconds(),
+            help="Seconds without a receipt before a transaction is resubmitted",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            changed = reconcile_receipts(
+                limit=options["limit"],
+                max_requests=options["max_requests"],
+                requests_per_second=options["rate"],
+                receipt_timeout=timedelta(seconds=options["receipt_timeout"]),
+            )
+            counts = Counter((row.network, row.status) for row in changed)
+            for (network, status), count in sorted(counts.items()):
+                self.stdout.write(f"{network}: {count} {status}")
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
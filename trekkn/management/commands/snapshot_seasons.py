@@ -0,0 +1,37 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from trekkn.seasons import SEASONS, snapshot_closed_seasons
+
+
+class Command(BaseCommand):
+    help = "Materialize the standings of closed calendar seasons into SeasonSnapshot"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "kinds",
+            nargs="*",
+            choices=SEASONS,
+            help="Season kinds to snapshot, all by default",
+        )
+        parser.add_argument(
+            "--since",
+            type=date.fromisoformat,
+            help="Also snapshot closed seasons back to this date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            help="Rewrite seasons that already have a snapshot",
+        )
+
+    def handle(self, *args, **options):
+        for kind in options["kinds"] or SEASONS:
+            written = snapshot_closed_seasons(
+                kind, since=options["since"], replace=options["replace"]
+            )
+            for season, rows in written.items():
+                if rows:
+                    self.stdout.write(f"{kind} {season}: {rows} standings")
+        self.stdout.write(self.style.SUCCESS("Closed seasons are snapshotted"))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 09:35
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trekkn', '0013_steplogoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChainNonce',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('network', models.CharField(max_length=50)),
+                ('address', models.CharField(max_length=42)),
+                ('next_nonce', models.BigIntegerField(default=0)),
+                ('needs_resync', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('network', 'address')},
+            },
+        ),
+    ]
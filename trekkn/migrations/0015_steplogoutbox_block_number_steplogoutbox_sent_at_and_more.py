@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trekkn', '0014_chainnonce'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='steplogoutbox',
+            name='block_number',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='steplogoutbox',
+            name='sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='steplogoutbox',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('dead', 'Dead'), ('confirmed', 'Confirmed'), ('failed', 'Failed'), ('resubmit', 'Resubmit')], default='pending', max_length=20),
+        ),
+    ]
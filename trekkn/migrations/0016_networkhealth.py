@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 09:42
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trekkn', '0015_steplogoutbox_block_number_steplogoutbox_sent_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NetworkHealth',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('network', models.CharField(max_length=50, unique=True)),
+                ('state', models.CharField(default='closed', max_length=20)),
+                ('consecutive_failures', models.IntegerField(default=0)),
+                ('samples', models.IntegerField(default=0)),
+                ('error_rate', models.FloatField(default=0.0)),
+                ('p50_ms', models.FloatField(blank=True, null=True)),
+                ('p95_ms', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
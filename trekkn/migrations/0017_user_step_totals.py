@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 09:47
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trekkn', '0016_networkhealth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trekknuser',
+            name='total_steps',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='UserStepTotal',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('source', models.CharField(max_length=50)),
+                ('steps', models.BigIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='step_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'source')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 09:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trekkn', '0017_user_step_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trekknuser',
+            name='last_active',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
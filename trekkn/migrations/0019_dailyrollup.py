@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 09:52
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trekkn', '0018_trekknuser_last_active'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('source', models.CharField(max_length=50)),
+                ('step_count', models.BigIntegerField(default=0)),
+                ('amount_rewarded', models.FloatField(default=0.0)),
+                ('aura_gained', models.IntegerField(default=0)),
+                ('activities', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['source', 'date'], name='rollup_source_date_idx')],
+                'unique_together': {('user', 'date', 'source')},
+            },
+        ),
+    ]
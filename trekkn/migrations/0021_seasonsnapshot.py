@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:12
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trekkn', '0020_leaderboards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeasonSnapshot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(max_length=10)),
+                ('season', models.CharField(max_length=10)),
+                ('start', models.DateField()),
+                ('end', models.DateField()),
+                ('rank', models.PositiveIntegerField()),
+                ('steps', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='season_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'season', 'rank'], name='season_rank_idx')],
+                'unique_together': {('kind', 'season', 'user')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('trekkn', '0021_seasonsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailyactivity',
+            index=models.Index(fields=['user', 'source', 'timestamp'], name='activity_user_source_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyactivity',
+            index=models.Index(fields=['user', '-timestamp'], name='activity_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyactivity',
+            index=models.Index(condition=models.Q(('source', 'steps')), fields=['timestamp', 'user'], name='activity_steps_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trekknuser',
+            index=models.Index(fields=['-level'], name='user_level_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usereventlog',
+            index=models.Index(fields=['user', '-timestamp'], name='eventlog_user_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:19
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trekkn', '0022_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletCounter',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('next_index', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='trekknuser',
+            name='wallet_index',
+            field=models.PositiveIntegerField(blank=True, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trekkn', '0023_hd_wallets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mission',
+            name='assigned_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
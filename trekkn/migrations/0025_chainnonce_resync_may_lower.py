@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trekkn', '0024_mission_assigned_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chainnonce',
+            name='resync_may_lower',
+            field=models.BooleanField(default=False),
+        ),
+    ]
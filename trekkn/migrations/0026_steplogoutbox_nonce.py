@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trekkn', '0025_chainnonce_resync_may_lower'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='steplogoutbox',
+            name='nonce',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
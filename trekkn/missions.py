@@ -0,0 +1,163 @@
+"""
+Giving missions to users, stored one of two ways (`USER_MISSION_STORAGE`).
+
+"dense" keeps a `UserMission` row for every user and mission. New missions and users
+are fanned out in bulk: users are read by primary key in chunks of ids, so memory stays
+bounded however many users there are, and each chunk is one `bulk_create` that skips
+the pairs already assigned. Every function here can be re-run safely.
+
+"sparse" only stores the missions a user completed; `user_missions` fills in the rest
+from the mission catalog, so nothing is fanned out.
+
+The catalog is small and rarely changes, so each process keeps it in memory, tagged
+with a version token from the shared cache. Saving or deleting a mission replaces the
+token, and every process reloads the catalog the next time it reads it.
+"""
+
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from trekkn.models import Mission, TrekknUser, UserMission
+
+
+CHUNK_SIZE = 5000
+CATALOG_VERSION_KEY = "trekkn:mission-catalog-version"
+
+_catalog = (None, ())  # (version token, missions)
+_catalog_lock = threading.Lock()
+
+
+def sparse() -> bool:
+    return settings.USER_MISSION_STORAGE == "sparse"
+
+
+def _catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # first reader, or the token was evicted: a new token makes everyone reload
+        cache.add(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def mission_catalog():
+    """Every mission, easiest first, as a tuple shared by the whole process.
+
+    Costs one shared cache read while the catalog is unchanged. Don't modify the
+    missions returned.
+    """
+    global _catalog
+    version = _catalog_version()
+    cached_version, missions = _catalog
+    if version is not None and version == cached_version:
+        return missions
+    with _catalog_lock:
+        missions = tuple(Mission.objects.order_by("requirement_steps", "name"))
+        _catalog = (version, missions)
+    return missions
+
+
+def _new_catalog_version():
+    global _catalog
+    cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    _catalog = (None, ())
+
+
+def invalidate_mission_catalog():
+    """Make every process reload the catalog, now and again once the change commits.
+
+    The second token covers a process that reloaded before the commit and so still
+    read the old rows.
+    """
+    _new_catalog_version()
+    transaction.on_commit(_new_catalog_version)
+
+
+def user_missions(user):
+    """`UserMission` rows for every mission of the catalog, in catalog order.
+
+    Missions the user has no row for (all but completed ones with sparse storage) come
+    back as unsaved rows without an id.
+    """
+    rows = {row.mission_id: row for row in UserMission.objects.filter(user=user)}
+    merged = []
+    for mission in mission_catalog():
+        row = rows.get(mission.pk) or UserMission(id=None, user=user)
+        row.mission = mission
+        merged.append(row)
+    return merged
+
+
+def _user_id_chunks(chunk_size):
+    """Lists of user ids in primary key order, `chunk_size` at a time."""
+    users = TrekknUser.objects.order_by("pk").values_list("pk", flat=True)
+    last = None
+    while True:
+        chunk = list((users if last is None else users.filter(pk__gt=last))[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def assign_missions_to_user(user_id):
+    """Give a user every mission, in one INSERT."""
+    UserMission.objects.bulk_create(
+        [
+            UserMission(user_id=user_id, mission_id=mission.pk)
+            for mission in mission_catalog()
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def assign_mission_to_users(mission, chunk_size=CHUNK_SIZE) -> int:
+    """Give `mission` to every user and mark it assigned. Returns the users read."""
+    users = 0
+    for chunk in _user_id_chunks(chunk_size):
+        UserMission.objects.bulk_create(
+            [UserMission(user_id=user_id, mission_id=mission.pk) for user_id in chunk],
+            ignore_conflicts=True,
+        )
+        users += len(chunk)
+    mission.assigned_at = timezone.now()
+    Mission.objects.filter(pk=mission.pk).update(assigned_at=mission.assigned_at)
+    return users
+
+
+def assign_pending_missions(chunk_size=CHUNK_SIZE):
+    """Fan out every mission not yet given to all users; returns the missions done.
+
+    Run by `manage.py assign_missions` when `MISSION_FANOUT` is "worker". Users who
+    sign up meanwhile get the mission from `create_user_missions` already.
+    """
+    if sparse():
+        return []
+    done = []
+    for mission in Mission.objects.filter(assigned_at__isnull=True).order_by("pk"):
+        assign_mission_to_users(mission, chunk_size=chunk_size)
+        done.append(mission)
+    return done
+
+
+def fan_out_inline() -> bool:
+    return settings.MISSION_FANOUT == "inline" and not sparse()
+
+
+def prune_incomplete_missions(chunk_size=CHUNK_SIZE) -> int:
+    """Delete the rows of missions not completed, after switching to sparse storage.
+
+    Returns the rows deleted.
+    """
+    incomplete = UserMission.objects.filter(is_completed=False).order_by()
+    deleted = 0
+    while True:
+        chunk = list(incomplete.values_list("pk", flat=True)[:chunk_size])
+        if not chunk:
+            return deleted
+        deleted += UserMission.objects.filter(pk__in=chunk).delete()[0]
@@ -3,7 +3,9 @@ import uuid
 from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 import hashlib
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.functions import Greatest
 from eth_account import Account
 from solders.keypair import Keypair
 
@@ -34,6 +36,8 @@ class TrekknUser(AbstractUser):
     aura = models.IntegerField(default=100)  # aura points
     level = models.IntegerField(default=1)  # user level
     streak = models.IntegerField(default=0)  # current streak
+    total_steps = models.BigIntegerField(default=0)  # lifetime steps, all sources
+    last_active = models.DateField(blank=True, null=True)  # last day with steps logged
 
     #
     evm_key = models.CharField(
@@ -56,6 +60,8 @@ class TrekknUser(AbstractUser):
         null=True,
         # editable=False,
     )
+    # HD wallets (WALLET_MODE=hd): keys are derived from this index, see wallets.py
+    wallet_index = models.PositiveIntegerField(unique=True, blank=True, null=True)
 
     # store unique code instead of full URL
     invite_code = models.CharField(max_length=50, unique=True, blank=True, null=True)
@@ -71,6 +77,10 @@ class TrekknUser(AbstractUser):
                 name="unique_device_id",
             )
         ]
+        indexes = [
+            # level leaderboard, read in index order instead of sorting every user
+            models.Index(fields=["-level"], name="user_level_idx"),
+        ]
 
     @property
     def invite_url(self):
@@ -102,17 +112,29 @@ class TrekknUser(AbstractUser):
         """Aura needed to reach the next level."""
         return self.BASE_AURA + (self.level * self.LEVEL_MULTIPLIER)
 
+    @classmethod
+    def level_for_aura(cls, aura: int) -> int:
+        """Level reached with `aura`: one level per LEVEL_MULTIPLIER above BASE_AURA."""
+        return max(1, (aura - cls.BASE_AURA) // cls.LEVEL_MULTIPLIER + 1)
+
+    @classmethod
+    def level_expression(cls, aura=None):
+        """`level_for_aura` as a database expression over `aura` (default: the column).
+
+        SQL integer division truncates instead of flooring, which only differs for
+        aura below BASE_AURA, where both give level 1.
+        """
+        aura = models.F("aura") if aura is None else aura
+        return Greatest(
+            models.Value(1),
+            (aura - models.Value(cls.BASE_AURA)) / models.Value(cls.LEVEL_MULTIPLIER)
+            + models.Value(1),
+            output_field=models.IntegerField(),
+        )
+
     def update_level(self):
         """Increase/decrease level depending on aura total."""
-        required = self.aura_to_next_level()
-        while self.aura >= required:
-            self.level += 1
-            required = self.aura_to_next_level()
-        while (
-            self.aura < (self.BASE_AURA + ((self.level - 1) * self.LEVEL_MULTIPLIER))
-            and self.level > 1
-        ):
-            self.level -= 1
+        self.level = self.level_for_aura(self.aura)
 
     def add_aura(self, amount: int):
         """Add aura and adjust level and streak accordingly."""
@@ -121,6 +143,63 @@ class TrekknUser(AbstractUser):
         # self.streak = self.calculate_streak()
         # self.save()
 
+    def reward(self, balance: int = 0, aura: int = 0, refresh=True, **fields):
+        """Add balance and aura in one UPDATE that only touches those columns and level.
+
+        Concurrent activities, referrals and mission completions for the same user each
+        add to the current row, so no update is lost. Other `fields` are set in the same
+        UPDATE; `refresh=False` skips reloading the new balance, aura and level.
+        """
+        new_aura = models.F("aura") + aura
+        TrekknUser.objects.filter(pk=self.pk).update(
+            balance=models.F("balance") + balance,
+            aura=new_aura,
+            level=self.level_expression(new_aura),
+            **fields,
+        )
+        for name, value in fields.items():
+            setattr(self, name, value)
+        if refresh:
+            self.refresh_from_db(fields=["balance", "aura", "level"])
+
+    def record_active_day(self, day):
+        """Extend the streak if `day` follows the last active day, else restart it at 1.
+
+        Days already counted, or older than the last active day, leave it unchanged.
+        """
+        updated = (
+            TrekknUser.objects.filter(pk=self.pk)
+            .filter(models.Q(last_active__isnull=True) | models.Q(last_active__lt=day))
+            .update(
+                streak=models.Case(
+                    models.When(
+                        last_active=day - timedelta(days=1),
+                        then=models.F("streak") + 1,
+                    ),
+                    default=models.Value(1),
+                ),
+                last_active=day,
+            )
+        )
+        if updated:
+            self.refresh_from_db(fields=["streak", "last_active"])
+
+    def current_streak(self, today=None) -> int:
+        """The stored streak, or 0 once a whole day has passed without steps.
+
+        With no activity yet today the streak still counts until the day ends, so a
+        Mon-Tue-Wed streak shows 3 on Thursday.
+        """
+        today = today or timezone.localdate()
+        if self.last_active and self.last_active >= today - timedelta(days=1):
+            return self.streak
+        return 0
+
+    def add_steps(self, step_count: int, source: str):
+        """Add to the lifetime and per-source step totals and reload the new total."""
+        UserStepTotal.add(self.pk, source, step_count)
+        self.refresh_from_db(fields=["total_steps"])
+
     # def calculate_streak(self):
     #     """Calculate the current streak of consecutive days with 'steps' activity."""
     #     activities = self.daily_activities.filter(source="steps").order_by("-timestamp")
@@ -153,14 +232,41 @@ class TrekknUser(AbstractUser):
         base_string = f"{self.email}-{timezone.now().timestamp()}"
         return hashlib.sha256(base_string.encode()).hexdigest()[:10]
 
+    def ensure_wallet(self):
+        """Derive and store the addresses of an HD wallet that has none yet."""
+        if self.wallet_index is None or (self.evm_addr and self.sol_addr):
+            return
+        from trekkn.authentication import forget_cached_user  # avoid circular import
+        from trekkn.wallets import wallet_addresses  # avoid circular import
+
+        self.evm_addr, self.sol_addr = wallet_addresses(self.wallet_index)
+        TrekknUser.objects.filter(pk=self.pk).update(
+            evm_addr=self.evm_addr, sol_addr=self.sol_addr
+        )
+        forget_cached_user(self.pk)  # it caches the addresses
+
+    def wallet_keys(self):
+        """`(evm_key, sol_key)`: stored for random wallets, derived for HD ones."""
+        if self.wallet_index is None:
+            return self.evm_key, self.sol_key
+        from trekkn.wallets import wallet_keys  # avoid circular import
+
+        return wallet_keys(self.wallet_index)
+
     def save(self, **kwargs):
         if not self.invite_code:
             self.invite_code = self.__generate_invite_code()  # short random code
-        if not self.evm_key:
-            self.evm_key, self.evm_addr = self.__generate_evm_account()
-        if not self.sol_key:
-            self.sol_key, self.sol_addr = self.__generate_solana_account()
-            # self.sol_key, self.sol_addr = self.__generate_solana_account()
+        if settings.WALLET_MODE == "hd":
+            # only reserve the index, the wallets are derived when first needed
+            if self.wallet_index is None and not self.evm_key:
+                from trekkn.wallets import reserve_wallet_indexes  # circular import
+
+                self.wallet_index = reserve_wallet_indexes()
+        else:
+            if not self.evm_key:
+                self.evm_key, self.evm_addr = self.__generate_evm_account()
+            if not self.sol_key:
+                self.sol_key, self.sol_addr = self.__generate_solana_account()
         if not self.displayname:  # only if username is empty
             self.displayname = self.__generate_displayname()
         return super().save(**kwargs)
@@ -237,6 +343,26 @@ class DailyActivity(models.Model):
     source = models.CharField(max_length=50, default="steps")
     # e.g. "steps", "referral", "bonus"
 
+    class Meta:
+        indexes = [
+            # a user's activities from one source over a time range
+            models.Index(
+                fields=["user", "source", "timestamp"],
+                name="activity_user_source_ts_idx",
+            ),
+            # the 23 hour check and a user's latest activities, any source
+            models.Index(
+                fields=["user", "-timestamp"], name="activity_user_recent_idx"
+            ),
+            # steps of every user over a time range, e.g. rebuilding windows; SQLite
+            # can't match it against a bound "steps", Postgres gets the literal
+            models.Index(
+                fields=["timestamp", "user"],
+                condition=models.Q(source="steps"),
+                name="activity_steps_ts_idx",
+            ),
+        ]
+
     def calculate_rewards(self):
         """Calculate reward points from steps and conversion rate."""
         # print("will not reward below 1k")
@@ -260,6 +386,15 @@ class DailyActivity(models.Model):
         return 0
 
     def save(self, *args, **kwargs):
+        with transaction.atomic():
+            self._save(*args, **kwargs)
+
+    def _save(self, *args, **kwargs):
+        # the row before this save, to move it between the step totals and rollups
+        previous = None
+        if not self._state.adding:
+            previous = DailyActivity.objects.filter(pk=self.pk).first()
+
         # calculate rewards if missing
         # if self.amount_rewarded == 0 and self.conversion_rate > 0:
         #     self.amount_rewarded = self.calculate_rewards()
@@ -273,34 +408,305 @@ class DailyActivity(models.Model):
         # print(self.aura_gained)
         super().save(*args, **kwargs)  # save activity first so values exist
 
+        if previous is None:
+            self.user.add_steps(self.step_count, self.source)
+            DailyRollup.add_activity(self)
+            if self.source == "steps":
+                self.user.record_active_day(timezone.localdate(self.timestamp))
+        elif previous.rollup_key() != self.rollup_key():
+            UserStepTotal.add(self.user_id, previous.source, -previous.step_count)
+            DailyRollup.add_activity(previous, sign=-1)
+            self.user.add_steps(self.step_count, self.source)
+            DailyRollup.add_activity(self)
+
         # --- update user ---
-        self.user.balance += int(self.amount_rewarded)  # add reward to balance
-        self.user.add_aura(self.aura_gained)  # handles aura + level update
-        self.user.save()
+        self.user.reward(balance=int(self.amount_rewarded), aura=self.aura_gained)
 
         # after saving, check missions
         self.check_missions()
         # return super().save(**kwargs)
 
+    def rollup_key(self):
+        """Everything about this activity that the step totals and rollups count."""
+        return (
+            self.step_count,
+            self.source,
+            timezone.localdate(self.timestamp),
+            self.amount_rewarded,
+            self.aura_gained,
+        )
+
     def check_missions(self):
-        """Check and complete missions if requirements are met."""
-        user_missions = self.user.missions.filter(is_completed=False)
-
-        for user_mission in user_missions.select_related("mission"):
-            mission = user_mission.mission
-            total_steps = (
-                self.user.daily_activities.aggregate(models.Sum("step_count"))[
-                    "step_count__sum"
+        """Complete every mission whose requirement is met, in a fixed number of queries.
+
+        Requirements and rewards come from the cached catalog, so there are no queries
+        at all until the user's steps reach a mission.
+        """
+        from trekkn.missions import mission_catalog  # avoid circular import
+
+        total_steps = self.user.total_steps  # kept up to date by add_steps
+        reachable = {
+            m.pk: m for m in mission_catalog() if m.requirement_steps <= total_steps
+        }
+        if not reachable:
+            return
+        if settings.USER_MISSION_STORAGE == "sparse":
+            return self._check_sparse_missions(reachable)
+
+        with transaction.atomic(savepoint=False):
+            # lock the rows so a concurrent check can't reward the same mission twice
+            due = list(
+                self.user.missions.select_for_update()
+                .filter(is_completed=False, mission_id__in=reachable)
+                .values_list("pk", "mission_id")
+            )
+            if not due:
+                return
+
+            UserMission.objects.filter(pk__in=[pk for pk, _ in due]).update(
+                is_completed=True, achieved=timezone.now()
+            )
+            self.user.reward(aura=sum(reachable[m].aura_reward for _, m in due))
+
+    def _check_sparse_missions(self, reachable):
+        """`check_missions` when users only have rows for completed missions."""
+        with transaction.atomic(savepoint=False):
+            # lock the user so a concurrent check can't reward the same mission twice
+            list(
+                TrekknUser.objects.select_for_update()
+                .filter(pk=self.user_id)
+                .values_list("pk")
+            )
+            rows = dict(self.user.missions.values_list("mission_id", "is_completed"))
+            due = [m for m in reachable.values() if not rows.get(m.pk)]
+            if not due:
+                return
+
+            now = timezone.now()
+            # rows left from dense storage are completed in place
+            UserMission.objects.filter(
+                user_id=self.user_id, mission_id__in=[m.pk for m in due if m.pk in rows]
+            ).update(is_completed=True, achieved=now)
+            UserMission.objects.bulk_create(
+                [
+                    UserMission(
+                        user_id=self.user_id, mission=m, is_completed=True, achieved=now
+                    )
+                    for m in due
+                    if m.pk not in rows
                 ]
-                or 0
             )
-            if total_steps >= mission.requirement_steps:
-                user_mission.complete()
+            self.user.reward(aura=sum(m.aura_reward for m in due))
 
     def __str__(self):
         return f"{self.user.email} - activity: {self.source} on {self.timestamp.date()}"
 
 
+class DailyRollup(models.Model):
+    """Totals of a user's activities from one source on one day.
+
+    Kept up to date by `DailyActivity.save` so leaderboards and streaks read one row
+    per user and day instead of the raw activities.
+    """
+
+    id = models.UUIDField(
+        default=uuid.uuid4,
+        editable=False,
+        primary_key=True,
+    )
+    user = models.ForeignKey(
+        TrekknUser, on_delete=models.CASCADE, related_name="daily_rollups"
+    )
+    date = models.DateField()  # local date of the activities
+    source = models.CharField(max_length=50)
+    step_count = models.BigIntegerField(default=0)
+    amount_rewarded = models.FloatField(default=0.0)
+    aura_gained = models.IntegerField(default=0)
+    activities = models.IntegerField(default=0)  # number of activities rolled up
+
+    class Meta:
+        unique_together = ("user", "date", "source")
+        indexes = [
+            models.Index(fields=["source", "date"], name="rollup_source_date_idx"),
+        ]
+
+    @classmethod
+    def add_activity(cls, activity, sign=1):
+        """Add an activity to its day's rollup, or take it back out with `sign=-1`."""
+        values = {
+            "step_count": models.F("step_count") + sign * activity.step_count,
+            "amount_rewarded": models.F("amount_rewarded")
+            + sign * activity.amount_rewarded,
+            "aura_gained": models.F("aura_gained") + sign * activity.aura_gained,
+            "activities": models.F("activities") + sign,
+        }
+        key = {
+            "user_id": activity.user_id,
+            "date": timezone.localdate(activity.timestamp),
+            "source": activity.source,
+        }
+        if activity.source == "steps":
+            from trekkn.leaderboards import get_leaderboard  # avoid circular import
+
+            # before the rollup changes, so a leaderboard rebuilt from the rollups
+            # while recording doesn't count the activity twice
+            get_leaderboard().record(
+                activity.user_id, key["date"], sign * activity.step_count
+            )
+
+        rollups = cls.objects.filter(**key)
+        if not rollups.update(**values) and sign > 0:
+            cls.objects.get_or_create(**key)
+            rollups.update(**values)
+
+    @classmethod
+    def add_activities(cls, activities):
+        """`add_activity` for several new activities at once.
+
+        Missing rollups are created in one INSERT, then each rollup gets one UPDATE.
+        """
+        totals = {}
+        for activity in activities:
+            key = (
+                activity.user_id,
+                timezone.localdate(activity.timestamp),
+                activity.source,
+            )
+            if activity.source == "steps":
+                from trekkn.leaderboards import get_leaderboard  # avoid circular import
+
+                get_leaderboard().record(key[0], key[1], activity.step_count)
+            total = totals.setdefault(key, [0, 0.0, 0, 0])
+            total[0] += activity.step_count
+            total[1] += activity.amount_rewarded
+            total[2] += activity.aura_gained
+            total[3] += 1
+
+        cls.objects.bulk_create(
+            [cls(user_id=u, date=d, source=s) for u, d, s in totals],
+            ignore_conflicts=True,
+        )
+        for (user_id, date, source), total in totals.items():
+            steps, rewarded, aura, count = total
+            cls.objects.filter(user_id=user_id, date=date, source=source).update(
+                step_count=models.F("step_count") + steps,
+                amount_rewarded=models.F("amount_rewarded") + rewarded,
+                aura_gained=models.F("aura_gained") + aura,
+                activities=models.F("activities") + count,
+            )
+
+    def __str__(self):
+        return f"{self.user_id} - {self.source} on {self.date}: {self.step_count}"
+
+
+class LeaderboardWindow(models.Model):
+    """Day a leaderboard window of `DatabaseLeaderboard` was last rolled forward to."""
+
+    id = models.UUIDField(
+        default=uuid.uuid4,
+        editable=False,
+        primary_key=True,
+    )
+    name = models.CharField(max_length=10, unique=True)  # "day", "week", ...
+    as_of = models.DateField()
+
+    def __str__(self):
+        return f"{self.name} as of {self.as_of}"
+
+
+class LeaderboardScore(models.Model):
+    """A user's steps within one leaderboard window, for `DatabaseLeaderboard`."""
+
+    id = models.UUIDField(
+        default=uuid.uuid4,
+        editable=False,
+        primary_key=True,
+    )
+    window = models.CharField(max_length=10)
+    user = models.ForeignKey(
+        TrekknUser, on_delete=models.CASCADE, related_name="leaderboard_scores"
+    )
+    score = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("window", "user")
+        indexes = [
+            models.Index(
+                fields=["window", "-score", "user"], name="leaderboard_rank_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.window} - {self.user_id}: {self.score}"
+
+
+class SeasonSnapshot(models.Model):
+    """A user's final standing in a closed calendar season, written once by
+    `snapshot_seasons`."""
+
+    id = models.UUIDField(
+        default=uuid.uuid4,
+        editable=False,
+        primary_key=True,
+    )
+    kind = models.CharField(max_length=10)  # "week", "month" or "year"
+    season = models.CharField(max_length=10)  # e.g. "2026-W42", "2026-10", "2026"
+    start = models.DateField()
+    end = models.DateField()  # last day, inclusive
+    rank = models.PositiveIntegerField()
+    user = models.ForeignKey(
+        TrekknUser, on_delete=models.CASCADE, related_name="season_snapshots"
+    )
+    steps = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("kind", "season", "user")
+        indexes = [
+            models.Index(fields=["kind", "season", "rank"], name="season_rank_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.season} #{self.rank} - {self.user_id}"
+
+
+class UserStepTotal(models.Model):
+    """Lifetime steps of a user from one activity source, e.g. "steps" or "referral"."""
+
+    id = models.UUIDField(
+        default=uuid.uuid4,
+        editable=False,
+        primary_key=True,
+    )
+    user = models.ForeignKey(
+        TrekknUser, on_delete=models.CASCADE, related_name="step_totals"
+    )
+    source = models.CharField(max_length=50)
+    steps = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("user", "source")
+
+    @classmethod
+    def add(cls, user_id, source, step_count):
+        """Increment the user's lifetime and per-source totals in place, safe under
+        concurrent writers."""
+        if not step_count:
+            return
+        TrekknUser.objects.filter(pk=user_id).update(
+            total_steps=models.F("total_steps") + step_count
+        )
+        totals = cls.objects.filter(user_id=user_id, source=source)
+        updated = totals.update(steps=models.F("steps") + step_count)
+        # a decrement never creates a row, e.g. while the user is being deleted
+        if not updated and step_count > 0:
+            cls.objects.get_or_create(user_id=user_id, source=source)
+            totals.update(steps=models.F("steps") + step_count)
+
+    def __str__(self):
+        return f"{self.user_id} - {self.source}: {self.steps}"
+
+
 # Example flow
 # # User takes 2500 steps
 # activity = UserActivity.objects.create(
@@ -344,6 +750,8 @@ class Mission(models.Model):
     description = models.TextField()
     requirement_steps = models.PositiveIntegerField(default=0)  # e.g., 1000 steps
     aura_reward = models.PositiveIntegerField(default=0)  # Aura points gained
+    # when every user had been given it, see missions.py
+    assigned_at = models.DateTimeField(blank=True, null=True)
 
     def __str__(self):
         return self.name
@@ -369,12 +777,28 @@ class UserMission(models.Model):
         unique_together = ("user", "mission")
 
     def complete(self):
-        if not self.is_completed:
-            self.is_completed = True
+        if self.is_completed:
+            return
+        with transaction.atomic(savepoint=False):
             self.achieved = timezone.now()
-            self.user.aura += self.mission.aura_reward  # add aura reward
-            self.user.save()
-            self.save()
+            created = False
+            if self.pk is None:
+                # a mission without a row yet (sparse storage), see missions.py
+                row, created = UserMission.objects.get_or_create(
+                    user_id=self.user_id,
+                    mission_id=self.mission_id,
+                    defaults={"is_completed": True, "achieved": self.achieved},
+                )
+                self.pk, self._state.adding = row.pk, False
+            # only the call that creates or flips the row rewards it
+            completed = created or (
+                UserMission.objects.filter(pk=self.pk, is_completed=False).update(
+                    is_completed=True, achieved=self.achieved
+                )
+            )
+            self.is_completed = True
+            if completed:
+                self.user.reward(aura=self.mission.aura_reward)  # add aura reward
 
     def __str__(self):
         return self.user.email + " - " + self.mission.name
@@ -412,6 +836,13 @@ class UserEventLog(models.Model):
     # optional: store metadata
     metadata = models.JSONField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "-timestamp"], name="eventlog_user_recent_idx"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.event_type} on {self.timestamp.date()}"
 
@@ -425,3 +856,119 @@ class UserEventLog(models.Model):
 
 
 # logs = user.event_logs.order_by("-timestamp")
+
+
+class StepLogOutbox(models.Model):
+    """A pending on-chain step log for one network, drained by `drain_step_outbox`."""
+
+    PENDING = "pending"
+    SENT = "sent"
+    DEAD = "dead"  # gave up after too many attempts
+    # set by `reconcile_receipts` once the transaction outcome is known
+    CONFIRMED = "confirmed"
+    FAILED = "failed"  # mined but reverted
+    RESUBMIT = "resubmit"  # never mined, queued for another send
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (SENT, "Sent"),
+        (DEAD, "Dead"),
+        (CONFIRMED, "Confirmed"),
+        (FAILED, "Failed"),
+        (RESUBMIT, "Resubmit"),
+    ]
+
+    id = models.UUIDField(
+        default=uuid.uuid4,
+        editable=False,
+        primary_key=True,
+    )
+    activity = models.ForeignKey(
+        DailyActivity, on_delete=models.CASCADE, related_name="chain_writes"
+    )
+    network = models.CharField(max_length=50)  # name from settings.CHAIN_NETWORKS
+    user_address = models.CharField(max_length=42, blank=True, null=True)
+    step_count = models.IntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    tx_hash = models.CharField(max_length=66, blank=True, null=True)
+    # reserved nonce of the transaction, to tell a dropped one from a slow one
+    nonce = models.BigIntegerField(blank=True, null=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    block_number = models.BigIntegerField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt_at"],
+                name="outbox_status_due_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.network} - {self.status} - activity {self.activity_id}"
+
+
+class ChainNonce(models.Model):
+    """Next nonce of a signer on one network, shared by every outbox worker."""
+
+    id = models.UUIDField(
+        default=uuid.uuid4,
+        editable=False,
+        primary_key=True,
+    )
+    network = models.CharField(max_length=50)
+    address = models.CharField(max_length=42)
+    next_nonce = models.BigIntegerField(default=0)
+    # set after a send rejected for its nonce; the next reservation re-reads the chain
+    needs_resync = models.BooleanField(default=True)
+    # the resync may move the counter back, only after a gap below a sent nonce
+    resync_may_lower = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("network", "address")
+
+    def __str__(self):
+        return f"{self.network} - {self.address}: {self.next_nonce}"
+
+
+class WalletCounter(models.Model):
+    """Next HD wallet index to hand out, see `wallets.reserve_wallet_indexes`."""
+
+    DEFAULT = "users"
+
+    id = models.UUIDField(
+        default=uuid.uuid4,
+        editable=False,
+        primary_key=True,
+    )
+    name = models.CharField(max_length=50, unique=True)
+    next_index = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_index}"
+
+
+class NetworkHealth(models.Model):
+    """Latest circuit breaker snapshot of a network, saved by the outbox worker."""
+
+    id = models.UUIDField(
+        default=uuid.uuid4,
+        editable=False,
+        primary_key=True,
+    )
+    network = models.CharField(max_length=50, unique=True)
+    state = models.CharField(max_length=20, default="closed")
+    consecutive_failures = models.IntegerField(default=0)
+    samples = models.IntegerField(default=0)
+    error_rate = models.FloatField(default=0.0)
+    p50_ms = models.FloatField(blank=True, null=True)
+    p95_ms = models.FloatField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.network} - {self.state}"
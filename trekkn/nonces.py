@@ -0,0 +1,99 @@
+from django.db import transaction
+
+from trekkn.contracts.loggable import CREATOR_ADDRESS, NETWORK_TIMEOUT
+from trekkn.contracts.registry import get_client
+from trekkn.models import ChainNonce
+
+
+# send errors saying the nonce was already taken, so the counter is behind the chain
+NONCE_USED_ERRORS = (
+    "nonce too low",
+    "already known",
+    "replacement transaction underpriced",
+)
+# send errors saying a nonce below the one sent is missing, so the counter is ahead
+NONCE_GAP_ERRORS = ("nonce too high",)
+
+USED = "used"
+GAP = "gap"
+
+
+def nonce_error(error):
+    """`USED` or `GAP` when `error` rejects the transaction's nonce, else None."""
+    message = str(error).lower()
+    if any(text in message for text in NONCE_GAP_ERRORS):
+        return GAP
+    if any(text in message for text in NONCE_USED_ERRORS):
+        return USED
+    return None
+
+
+def reserve_nonces(net, count=1, address=CREATOR_ADDRESS) -> int:
+    """Reserve `count` consecutive nonces for `address` on `net` and return the first.
+
+    The counter row is locked while it is bumped, so concurrent workers never hand out
+    the same nonce. The chain is only asked for the transaction count when the row is
+    new or was flagged by `mark_for_resync`.
+    """
+    with transaction.atomic():
+        row, _ = ChainNonce.objects.select_for_update().get_or_create(
+            network=net.get("name"),
+            address=address,
+        )
+        if row.needs_resync:
+            client = get_client(net, NETWORK_TIMEOUT)
+            pending = client.web3.eth.get_transaction_count(address, "pending")
+            # nonces reserved by other workers but not broadcast yet aren't counted by
+            # the node, so only a gap may move the counter back
+            if row.resync_may_lower:
+                row.next_nonce = pending
+            else:
+                row.next_nonce = max(pending, row.next_nonce)
+            row.needs_resync = row.resync_may_lower = False
+        first = row.next_nonce
+        row.next_nonce += count
+        row.save(
+            update_fields=[
+                "next_nonce",
+                "needs_resync",
+                "resync_may_lower",
+                "updated_at",
+            ]
+        )
+    return first
+
+
+def release_nonces(network, first, end, address=CREATOR_ADDRESS) -> bool:
+    """Give back the unused nonces `first` to `end - 1` of a failed reservation.
+
+    Only possible while nobody reserved after them; otherwise they are a gap the
+    caller must resync. Returns whether the counter moved back.
+    """
+    return bool(
+        ChainNonce.objects.filter(
+            network=network, address=address, next_nonce=end
+        ).update(next_nonce=first)
+    )
+
+
+def mark_for_resync(network, address=CREATOR_ADDRESS, lower=False):
+    """Flag the counter so the next reservation re-reads the nonce from the chain.
+
+    The counter only moves forward to the chain's pending count, unless `lower`: a gap
+    below a sent nonce means it handed out nonces that will never be used.
+    """
+    fields = {"needs_resync": True}
+    if lower:
+        fields["resync_may_lower"] = True
+    ChainNonce.objects.filter(network=network, address=address).update(**fields)
+
+
+def resync_after(network, error, address=CREATOR_ADDRESS):
+    """Flag the counter if a send failed for its nonce. Returns `nonce_error(error)`.
+
+    Other failures say nothing about the counter and leave it alone.
+    """
+    kind = nonce_error(error)
+    if kind is not None:
+        mark_for_resync(network, address=address, lower=kind == GAP)
+    return kind
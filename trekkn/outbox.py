@@ -0,0 +1,294 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from trekkn.contracts.breaker import get_breaker, snapshots
+from trekkn.contracts.loggable import (
+    MAX_BATCH,
+    get_network,
+    get_networks,
+    write_batch_to_network,
+    write_steps_to_network,
+)
+from trekkn.models import DailyActivity, NetworkHealth, StepLogOutbox
+from trekkn.nonces import (
+    mark_for_resync,
+    release_nonces,
+    reserve_nonces,
+    resync_after,
+)
+
+
+# how long a claimed row stays invisible to other workers while it is sent
+CLAIM_LEASE = timedelta(minutes=2)
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 60 * 60
+MAX_ATTEMPTS = 8
+# batching for networks flagged with "batch": a logWalks transaction is sent once this
+# many walks are waiting, or when the oldest one has waited BATCH_WINDOW
+BATCH_SIZE = 100
+BATCH_WINDOW = timedelta(seconds=30)
+
+
+def enqueue_step_logs(activity: DailyActivity, user_address=None):
+    """Queue the on-chain step log of `activity` for every network.
+
+    Must run inside the transaction that created the activity so both commit together.
+    """
+    return StepLogOutbox.objects.bulk_create(
+        [
+            StepLogOutbox(
+                activity=activity,
+                network=net.get("name"),
+                user_address=user_address,
+                step_count=activity.step_count,
+            )
+            for net in get_networks()
+        ]
+    )
+
+
+def backoff_delay(attempts: int) -> timedelta:
+    """Exponential backoff: 5s, 10s, 20s ... capped at an hour."""
+    seconds = BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(seconds, BACKOFF_MAX_SECONDS))
+
+
+def claim_due_rows(batch_size=500):
+    """Lease a batch of due rows so concurrent workers skip them."""
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            StepLogOutbox.objects.select_for_update(skip_locked=True)
+            .filter(
+                status__in=[StepLogOutbox.PENDING, StepLogOutbox.RESUBMIT],
+                next_attempt_at__lte=now,
+            )
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        if rows:
+            StepLogOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(
+                next_attempt_at=now + CLAIM_LEASE
+            )
+    return rows
+
+
+def _send(group, nonce=None):
+    """Send one transaction for a group of rows of the same network.
+
+    Doesn't touch the database, so it can run in a worker thread.
+    Returns a `(tx_hash, error)` pair.
+    """
+    try:
+        net = get_network(group[0].network)
+        if net is None:
+            raise ValueError(f"Unknown network: {group[0].network}")
+        if len(group) == 1:
+            tx_hash = write_steps_to_network(
+                net,
+                group[0].user_address,
+                group[0].step_count,
+                nonce=nonce,
+            )
+        else:
+            tx_hash = write_batch_to_network(
+                net,
+                [(row.user_address, row.step_count) for row in group],
+                nonce=nonce,
+            )
+        return tx_hash, None
+    except Exception as e:
+        return None, e
+
+
+def group_rows(network, rows, batch_size=BATCH_SIZE, batch_window=BATCH_WINDOW):
+    """Split a network's rows into transactions.
+
+    Returns `(groups, waiting)`: every group is sent as one transaction, and `waiting`
+    holds the rows of a partial batch still inside its time window.
+    """
+    net = get_network(network)
+    if not (net and net.get("batch")):
+        return [[row] for row in rows], []
+
+    batch_size = min(batch_size, MAX_BATCH)
+    rows = sorted(rows, key=lambda row: row.created_at)
+    groups = [rows[i : i + batch_size] for i in range(0, len(rows), batch_size)]
+    last = groups[-1]
+    if len(last) < batch_size and last[0].created_at > timezone.now() - batch_window:
+        return groups[:-1], last
+    return groups, []
+
+
+def defer_rows(rows, until):
+    """Put rows back until `until` without counting an attempt."""
+    if rows:
+        StepLogOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(
+            next_attempt_at=until
+        )
+
+
+def record_result(
+    row: StepLogOutbox, tx_hash, error, max_attempts=MAX_ATTEMPTS, nonce=None
+):
+    """Store the outcome of a send: sent, retry later with backoff, or dead."""
+    row.attempts += 1
+    if error is None:
+        row.tx_hash = tx_hash
+        row.nonce = nonce
+        row.sent_at = timezone.now()
+        row.status = StepLogOutbox.SENT
+        row.last_error = ""
+    else:
+        row.last_error = str(error)
+        if row.attempts >= max_attempts:
+            row.status = StepLogOutbox.DEAD
+        else:
+            row.next_attempt_at = timezone.now() + backoff_delay(row.attempts)
+    row.save(
+        update_fields=[
+            "attempts",
+            "status",
+            "tx_hash",
+            "nonce",
+            "sent_at",
+            "last_error",
+            "next_attempt_at",
+            "updated_at",
+        ]
+    )
+    return row
+
+
+def send_row(row: StepLogOutbox, max_attempts=MAX_ATTEMPTS):
+    """Send one outbox row on its own and record the outcome."""
+    tx_hash, error = _send([row])
+    if error is not None:
+        resync_after(row.network, error)
+    return record_result(row, tx_hash, error, max_attempts=max_attempts)
+
+
+def _reserve(network, count):
+    """Reserve nonces for a network's transactions. Returns `(first_nonce, error)`."""
+    try:
+        net = get_network(network)
+        if net is None:
+            raise ValueError(f"Unknown network: {network}")
+        return reserve_nonces(net, count=count), None
+    except Exception as e:
+        return None, e
+
+
+def send_rows(
+    rows,
+    max_attempts=MAX_ATTEMPTS,
+    concurrent=True,
+    batch_size=BATCH_SIZE,
+    batch_window=BATCH_WINDOW,
+):
+    """Send claimed rows and record their outcomes. Returns the rows that were sent.
+
+    With `concurrent`, each network is sent from its own thread; transactions of the
+    same network still go out one after another, in nonce order.
+    """
+    by_network = defaultdict(list)
+    for row in rows:
+        by_network[row.network].append(row)
+
+    groups = {}
+    for network, network_rows in by_network.items():
+        if network in settings.CHAIN_NETWORKS_DISABLED:
+            # keep the rows for when the network is enabled again
+            defer_rows(network_rows, timezone.now() + backoff_delay(MAX_ATTEMPTS))
+            continue
+        breaker = get_breaker(network)
+        if breaker.is_open():
+            # skip the network until its breaker lets a probe through
+            retry_at = timezone.now() + timedelta(seconds=breaker.retry_in())
+            defer_rows(network_rows, retry_at)
+            continue
+        groups[network], waiting = group_rows(
+            network,
+            network_rows,
+            batch_size=batch_size,
+            batch_window=batch_window,
+        )
+        if waiting:
+            defer_rows(waiting, min(row.created_at for row in waiting) + batch_window)
+    groups = {network: txs for network, txs in groups.items() if txs}
+    if not groups:
+        return []
+
+    # one locked counter update per network, done here so threads stay off the DB
+    reserved = {network: _reserve(network, len(txs)) for network, txs in groups.items()}
+
+    def send_network(network):
+        first_nonce, error = reserved[network]
+        outcomes = []
+        unused = None  # first nonce not sent, after a failure
+        for offset, group in enumerate(groups[network]):
+            # after a failure, don't leave a nonce gap that would stall later transactions
+            tx_hash, nonce = None, None
+            if error is None:
+                nonce = first_nonce + offset
+                tx_hash, error = _send(group, nonce=nonce)
+                if error is not None:
+                    unused = nonce
+            outcomes.extend((row, tx_hash, error, nonce) for row in group)
+        return network, error, unused, outcomes
+
+    if concurrent:
+        with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+            chunks = list(pool.map(send_network, groups))
+    else:
+        chunks = [send_network(network) for network in groups]
+
+    # results are written from this thread so the workers never open DB connections
+    handled = []
+    for network, error, unused, outcomes in chunks:
+        for row, tx_hash, row_error, nonce in outcomes:
+            handled.append(
+                record_result(
+                    row, tx_hash, row_error, max_attempts=max_attempts, nonce=nonce
+                )
+            )
+        if error is None:
+            continue
+        if resync_after(network, error) is None and unused is not None:
+            # the counter isn't wrong, only the nonces after the failure went unused
+            first_nonce, _ = reserved[network]
+            if not release_nonces(network, unused, first_nonce + len(groups[network])):
+                # someone reserved after them: the gap stalls their transactions
+                # silently, so re-read the chain and refill it with the next rows
+                mark_for_resync(network, lower=True)
+    return handled
+
+
+def save_network_health():
+    """Store this process's breaker snapshots so the health endpoint can show them."""
+    for network, snapshot in snapshots().items():
+        NetworkHealth.objects.update_or_create(network=network, defaults=snapshot)
+
+
+def drain_outbox(
+    batch_size=500,
+    max_attempts=MAX_ATTEMPTS,
+    concurrent=True,
+    walks_per_tx=BATCH_SIZE,
+    batch_window=BATCH_WINDOW,
+):
+    """Claim and process one batch of due rows. Returns the rows that were sent."""
+    rows = claim_due_rows(batch_size=batch_size)
+    if not rows:
+        return []
+    return send_rows(
+        rows,
+        max_attempts=max_attempts,
+        concurrent=concurrent,
+        batch_size=walks_per_tx,
+        batch_window=batch_window,
+    )
@@ -0,0 +1,178 @@
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+import requests
+from django.utils import timezone
+from web3.exceptions import TransactionNotFound, Web3Exception
+
+from trekkn.contracts.loggable import CREATOR_ADDRESS, NETWORK_TIMEOUT, get_network
+from trekkn.contracts.registry import get_client
+from trekkn.models import StepLogOutbox
+from trekkn.nonces import mark_for_resync
+
+
+# a sent transaction with no receipt after this long is assumed dropped
+RECEIPT_TIMEOUT = timedelta(minutes=30)
+# transaction hashes asked for in one JSON-RPC batch request
+RECEIPTS_PER_REQUEST = 50
+
+
+def _to_int(value):
+    if isinstance(value, str):
+        return int(value, 16)
+    return value
+
+
+def fetch_receipts(client, tx_hashes):
+    """Return `{tx_hash: receipt or None}` using as few requests as possible.
+
+    Uses one JSON-RPC batch request when the provider supports it, reading the raw
+    responses so a missing receipt doesn't raise for the whole batch, and falls back
+    to a request per hash otherwise. Hashes the node answered with an error are left
+    out: their receipt is unknown, not missing.
+    """
+    provider = client.web3.provider
+    calls = [("eth_getTransactionReceipt", [tx_hash]) for tx_hash in tx_hashes]
+    try:
+        responses = provider.make_batch_request(calls)
+        if isinstance(responses, list):
+            return {
+                tx_hash: response.get("result")
+                for tx_hash, response in zip(tx_hashes, responses)
+                if isinstance(response, dict) and "error" not in response
+            }
+        # some public RPCs reject batches with a single error object
+    except (AttributeError, NotImplementedError):
+        pass
+    except (requests.RequestException, Web3Exception, ValueError, OSError) as e:
+        print(f"Error in batch receipt request to {client.name}, asking per hash: {e}")
+
+    receipts = {}
+    for tx_hash in tx_hashes:
+        try:
+            receipts[tx_hash] = client.web3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            receipts[tx_hash] = None
+    return receipts
+
+
+def _dropped(client, tx_hash, nonce, latest_nonce):
+    """Whether a transaction without a receipt will never be mined: `(dropped, gap)`.
+
+    It is dropped once another transaction was mined with its nonce, or when the node
+    no longer knows it. A `gap` is a dropped transaction whose nonce is still unused,
+    which stalls every later one. `latest_nonce()` is the signer's mined nonce count.
+    """
+    try:
+        tx = client.web3.eth.get_transaction(tx_hash)
+    except TransactionNotFound:
+        return True, nonce is not None and nonce >= latest_nonce()
+    if tx.get("blockNumber") is not None:
+        return False, False  # mined since the receipt was asked for
+    return _to_int(tx.get("nonce")) < latest_nonce(), False
+
+
+def reconcile_network(network, rows, receipt_timeout=RECEIPT_TIMEOUT):
+    """Check the receipts of a network's sent rows and update their status.
+
+    Rows sharing a transaction (a logWalks batch) are resolved together. A row whose
+    receipt is late is only resubmitted once its transaction can no longer be mined,
+    so a slow one doesn't log the walks twice.
+    Returns the rows whose status changed.
+    """
+    net = get_network(network)
+    if net is None:
+        return []
+    client = get_client(net, NETWORK_TIMEOUT)
+
+    by_hash = defaultdict(list)
+    for row in rows:
+        by_hash[row.tx_hash].append(row)
+    receipts = fetch_receipts(client, list(by_hash))
+
+    latest = []
+
+    def latest_nonce():
+        if not latest:
+            latest.append(
+                client.web3.eth.get_transaction_count(CREATOR_ADDRESS, "latest")
+            )
+        return latest[0]
+
+    now = timezone.now()
+    changed = []
+    gap = False
+    for tx_hash, hash_rows in by_hash.items():
+        if tx_hash not in receipts:
+            continue  # the lookup failed, ask again next round
+        receipt = receipts[tx_hash]
+        if receipt:
+            status = (
+                StepLogOutbox.CONFIRMED
+                if _to_int(receipt.get("status")) == 1
+                else StepLogOutbox.FAILED
+            )
+            block_number = _to_int(receipt.get("blockNumber"))
+        elif hash_rows[0].sent_at and hash_rows[0].sent_at < now - receipt_timeout:
+            nonce = hash_rows[0].nonce
+            dropped, tx_gap = _dropped(client, tx_hash, nonce, latest_nonce)
+            if not dropped:
+                continue  # still pending on the node, it may yet be mined
+            status, block_number = StepLogOutbox.RESUBMIT, None
+            gap = gap or tx_gap
+        else:
+            continue  # still waiting to be mined
+        StepLogOutbox.objects.filter(pk__in=[row.pk for row in hash_rows]).update(
+            status=status,
+            block_number=block_number,
+            next_attempt_at=now,
+            updated_at=now,
+        )
+        for row in hash_rows:
+            row.status, row.block_number = status, block_number
+        changed.extend(hash_rows)
+
+    if gap:
+        # the dropped transaction left its nonce unused, later ones wait behind it
+        mark_for_resync(network, lower=True)
+    return changed
+
+
+def reconcile_receipts(
+    limit=RECEIPTS_PER_REQUEST,
+    max_requests=10,
+    requests_per_second=1.0,
+    receipt_timeout=RECEIPT_TIMEOUT,
+):
+    """Poll receipts for sent rows, oldest first, in batch requests per network.
+
+    At most `max_requests` requests of `limit` hashes go to each network per call, spaced
+    by `1 / requests_per_second` so public RPCs are not flooded.
+    Returns the rows whose status changed.
+    """
+    sent = StepLogOutbox.objects.filter(status=StepLogOutbox.SENT)
+    networks = sent.order_by().values_list("network", flat=True).distinct()
+
+    changed = []
+    for network in list(networks):
+        oldest = (
+            sent.filter(network=network)
+            .order_by("sent_at")
+            .values_list("tx_hash", flat=True)[: limit * max_requests]
+        )
+        # rows of a logWalks batch share one hash
+        hashes = list(dict.fromkeys(oldest))
+        for i in range(0, len(hashes), limit):
+            if i:
+                time.sleep(1 / requests_per_second)
+            # every row of a transaction is resolved in the same request
+            rows = list(sent.filter(network=network, tx_hash__in=hashes[i : i + limit]))
+            try:
+                changed.extend(
+                    reconcile_network(network, rows, receipt_timeout=receipt_timeout)
+                )
+            except Exception as e:
+                print(f"Error reconciling network {network}: {e}")
+                break
+    return changed
@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+from trekkn.models import DailyActivity, DailyRollup, TrekknUser
+
+
+# users rebuilt per transaction by `rebuild_rollups`
+CHUNK_SIZE = 500
+
+
+def activity_rollups(user_ids):
+    """Rollup rows summed from the raw activities of `user_ids`, not yet saved."""
+    rows = (
+        DailyActivity.objects.filter(user_id__in=user_ids)
+        .annotate(day=TruncDate("timestamp"))
+        .values("user_id", "day", "source")
+        .annotate(
+            steps=Sum("step_count"),
+            rewarded=Sum("amount_rewarded"),
+            aura=Sum("aura_gained"),
+            count=Count("id"),
+        )
+        .order_by()
+    )
+    return [
+        DailyRollup(
+            user_id=row["user_id"],
+            date=row["day"],
+            source=row["source"],
+            step_count=row["steps"] or 0,
+            amount_rewarded=row["rewarded"] or 0.0,
+            aura_gained=row["aura"] or 0,
+            activities=row["count"],
+        )
+        for row in rows
+    ]
+
+
+def rebuild_rollups(chunk_size=CHUNK_SIZE):
+    """Replace every user's rollups with ones summed from their activities.
+
+    Safe to run any number of times. Each chunk of users is locked while it is rebuilt,
+    so activities saved meanwhile wait and then add to the new rollups.
+    Returns the number of rollup rows written.
+    """
+    written = 0
+    user_ids = list(TrekknUser.objects.order_by("pk").values_list("pk", flat=True))
+    for i in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[i : i + chunk_size]
+        with transaction.atomic():
+            list(TrekknUser.objects.select_for_update().filter(pk__in=chunk).only("pk"))
+            DailyRollup.objects.filter(user_id__in=chunk).delete()
+            written += len(
+                DailyRollup.objects.bulk_create(activity_rollups(chunk), batch_size=1000)
+            )
+    return written
@@ -0,0 +1,116 @@
+"""
+Calendar-aligned leaderboard seasons: ISO weeks, calendar months and years.
+
+A closed season never changes, so its standings are written once to `SeasonSnapshot`
+by `manage.py snapshot_seasons`; only the current season is summed live from the
+daily rollups.
+"""
+
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from trekkn.models import DailyRollup, SeasonSnapshot
+
+
+SEASONS = ("week", "month", "year")
+# standings kept per closed season
+SNAPSHOT_SIZE = 100
+
+
+def season_bounds(kind, day):
+    """First and last day of the `kind` season holding `day`."""
+    if kind == "week":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if kind == "month":
+        start = day.replace(day=1)
+        following = (start + timedelta(days=32)).replace(day=1)
+        return start, following - timedelta(days=1)
+    if kind == "year":
+        return date(day.year, 1, 1), date(day.year, 12, 31)
+    raise ValueError(f"Unknown season kind {kind}")
+
+
+def season_key(kind, day):
+    """Name of the `kind` season holding `day`, e.g. "2026-W42", "2026-10", "2026"."""
+    if kind == "week":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    if kind == "month":
+        return f"{day.year}-{day.month:02d}"
+    return str(day.year)
+
+
+def previous_season_day(kind, day):
+    """A day inside the season before the one holding `day`."""
+    return season_bounds(kind, day)[0] - timedelta(days=1)
+
+
+def season_standings(start, end, limit=SNAPSHOT_SIZE):
+    """`[(rank, user_id, steps)]` for steps logged from `start` to `end` inclusive."""
+    rows = (
+        DailyRollup.objects.filter(source="steps", date__gte=start, date__lte=end)
+        .values("user_id")
+        .annotate(steps=Sum("step_count"))
+        .filter(steps__gt=0)
+        .order_by("-steps", "user_id")[:limit]
+    )
+    return [
+        (rank, row["user_id"], row["steps"]) for rank, row in enumerate(rows, start=1)
+    ]
+
+
+def current_standings(kind, limit=SNAPSHOT_SIZE, today=None):
+    """Live standings of the season in progress."""
+    start, end = season_bounds(kind, today or timezone.localdate())
+    return season_standings(start, end, limit)
+
+
+def snapshot_season(kind, day, replace=False):
+    """Write the standings of the closed `kind` season holding `day`.
+
+    Returns the number of rows written, 0 when the season was already snapshotted
+    (unless `replace`) or is not over yet.
+    """
+    start, end = season_bounds(kind, day)
+    if end >= timezone.localdate():
+        return 0
+    season = season_key(kind, day)
+    existing = SeasonSnapshot.objects.filter(kind=kind, season=season)
+    with transaction.atomic():
+        if existing.exists():
+            if not replace:
+                return 0
+            existing.delete()
+        return len(
+            SeasonSnapshot.objects.bulk_create(
+                [
+                    SeasonSnapshot(
+                        kind=kind,
+                        season=season,
+                        start=start,
+                        end=end,
+                        rank=rank,
+                        user_id=user_id,
+                        steps=steps,
+                    )
+                    for rank, user_id, steps in season_standings(start, end)
+                ]
+            )
+        )
+
+
+def snapshot_closed_seasons(kind, since=None, replace=False, today=None):
+    """Snapshot every closed `kind` season from the one holding `since` (default: the
+    last closed season) onwards. Returns `{season: rows written}`."""
+    today = today or timezone.localdate()
+    day = previous_season_day(kind, today)
+    since = since or day
+    written = {}
+    while season_bounds(kind, day)[1] >= since:
+        written[season_key(kind, day)] = snapshot_season(kind, day, replace=replace)
+        day = previous_season_day(kind, day)
+    return written
@@ -1,7 +1,12 @@
 from rest_framework import serializers
-from .models import TrekknUser, DailyActivity, Mission, UserMission, UserEventLog
-from django.utils import timezone
-from datetime import timedelta
+from .models import (
+    TrekknUser,
+    DailyActivity,
+    Mission,
+    UserMission,
+    UserEventLog,
+    SeasonSnapshot,
+)
 
 
 class TrekknUserSerializer(serializers.ModelSerializer):
@@ -17,33 +22,11 @@ class TrekknUserSerializer(serializers.ModelSerializer):
     #     return
 
     def get_streak(self, obj: TrekknUser) -> int:
-        """Calculate current streak of consecutive days with 'steps' activity.
-        If there's no activity today, allow the streak to persist through the end of today
-        by starting from yesterday. This matches the expectation that a Mon-Tue-Wed streak
-        still shows 3 on Thursday until the day ends.
+        """Current streak of consecutive days with 'steps' activity.
+        It is kept on the user as activities are logged; if there's no activity today
+        the streak persists through the end of today (see `TrekknUser.current_streak`).
         """
-
-        # Get all activity dates (unique) for steps
-        timestamps = (
-            obj.daily_activities.filter(source="steps")
-            .order_by("-timestamp")
-            .values_list("timestamp", flat=True)
-        )
-
-        if not timestamps:
-            return 0
-
-        activity_dates = {ts.date() for ts in timestamps}
-        today = timezone.localdate()
-
-        # Start from today if user has activity today, otherwise start from yesterday
-        expected_date = today if today in activity_dates else today - timedelta(days=1)
-
-        streak = 0
-        while expected_date in activity_dates:
-            streak += 1
-            expected_date -= timedelta(days=1)
-        return streak
+        return obj.current_streak()
 
     def update(self, instance, validated_data):
         # Prevent patching invited_by if already set
@@ -52,7 +35,12 @@ class TrekknUserSerializer(serializers.ModelSerializer):
 
         if instance.device_id is not None and "device_id" in validated_data:
             validated_data.pop("device_id")
-        return super().update(instance, validated_data)
+
+        # save only the patched columns so a concurrent reward isn't overwritten
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
 
     class Meta:
         model = TrekknUser
@@ -134,11 +122,24 @@ class UserEventLogSerializer(serializers.ModelSerializer):
 
 # --- NEW SERIALIZER FOR THE LEADERBOARD ---
 class LeaderboardUserSerializer(serializers.ModelSerializer):
-    # This tells the serializer: "Expect a read-only attribute named `total_steps`
-    # on the objects you receive, and include it in the output."
-    total_steps = serializers.ReadOnlyField()
+    # This tells the serializer: "Expect a read-only attribute named `period_steps`
+    # on the objects you receive, and include it in the output as `total_steps`."
+    total_steps = serializers.ReadOnlyField(source="period_steps")
+    rank = serializers.ReadOnlyField()
 
     class Meta:
         model = TrekknUser
         # Define the fields you want in the leaderboard response
-        fields = ["displayname", "username", "total_steps"]
+        fields = ["rank", "displayname", "username", "total_steps"]
+
+
+class SeasonStandingSerializer(serializers.ModelSerializer):
+    """A row of a closed season's snapshot, shaped like a leaderboard entry."""
+
+    displayname = serializers.ReadOnlyField(source="user.displayname")
+    username = serializers.ReadOnlyField(source="user.username")
+    total_steps = serializers.ReadOnlyField(source="steps")
+
+    class Meta:
+        model = SeasonSnapshot
+        fields = ["rank", "displayname", "username", "total_steps"]
@@ -1,10 +1,24 @@
 # signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 # from django.conf import settings
 
-from .models import TrekknUser, UserMission, Mission
+from .authentication import forget_cached_user
+from .missions import (
+    assign_mission_to_users,
+    assign_missions_to_user,
+    fan_out_inline,
+    invalidate_mission_catalog,
+    sparse,
+)
+from .models import (
+    DailyActivity,
+    DailyRollup,
+    TrekknUser,
+    Mission,
+    UserStepTotal,
+)
 
 
 @receiver(post_save, sender=TrekknUser)
@@ -12,20 +26,43 @@ def create_user_missions(sender, instance, created, **kwargs):
     """
     Auto-create UserMission entries for every Mission when a new user is created.
     """
-    if created:  # only when the user is first created
-        missions = Mission.objects.all()
-        for mission in missions:
-            UserMission.objects.get_or_create(user=instance, mission=mission)
+    if created and not sparse():  # only when the user is first created
+        assign_missions_to_user(instance.pk)
+
+
+@receiver(post_save, sender=TrekknUser)
+@receiver(post_delete, sender=TrekknUser)
+def forget_authenticated_user(sender, instance, **kwargs):
+    """
+    Drop the user's cached authentication entry so the next request sees the change.
+    """
+    forget_cached_user(instance.pk)
 
 
 @receiver(post_save, sender=Mission)
 def assign_mission_to_existing_users(sender, instance, created, **kwargs):
     """
-    When a new mission is created, assign it to all existing users.
+    When a new mission is created, assign it to all existing users, in chunks.
+    With MISSION_FANOUT=worker it is left to `manage.py assign_missions`; with sparse
+    storage nothing is assigned.
     """
-    if created:
-        # from trekkn.models import TrekknUser  # avoid circular import
+    if created and fan_out_inline():
+        assign_mission_to_users(instance)
+
 
-        users = TrekknUser.objects.all()
-        for user in users:
-            UserMission.objects.get_or_create(user=user, mission=instance)
+@receiver(post_save, sender=Mission)
+@receiver(post_delete, sender=Mission)
+def mission_catalog_changed(sender, instance, **kwargs):
+    """
+    Make every process reload its cached mission catalog.
+    """
+    invalidate_mission_catalog()
+
+
+@receiver(post_delete, sender=DailyActivity)
+def remove_activity_steps(sender, instance, **kwargs):
+    """
+    Take a deleted activity back out of the user's step totals and daily rollup.
+    """
+    UserStepTotal.add(instance.user_id, instance.source, -instance.step_count)
+    DailyRollup.add_activity(instance, sign=-1)
@@ -0,0 +1,100 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Sum
+
+from trekkn.models import DailyActivity, TrekknUser, UserStepTotal
+
+
+# users rebuilt per transaction by `rebuild_step_totals`
+CHUNK_SIZE = 500
+
+
+def activity_step_totals(user_ids):
+    """Step totals per source summed from the activity history, `{user_id: {source: steps}}`."""
+    totals = defaultdict(dict)
+    rows = (
+        DailyActivity.objects.filter(user_id__in=user_ids)
+        .values("user_id", "source")
+        .annotate(steps=Sum("step_count"))
+        .order_by()
+    )
+    for row in rows:
+        totals[row["user_id"]][row["source"]] = row["steps"] or 0
+    return totals
+
+
+def stored_step_totals(user_ids):
+    """Step totals per source as kept in `UserStepTotal`, `{user_id: {source: steps}}`."""
+    totals = defaultdict(dict)
+    for user_id, source, steps in UserStepTotal.objects.filter(
+        user_id__in=user_ids
+    ).values_list("user_id", "source", "steps"):
+        totals[user_id][source] = steps
+    return totals
+
+
+def _user_id_chunks(user_ids=None, chunk_size=CHUNK_SIZE):
+    users = TrekknUser.objects.order_by("pk")
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    ids = list(users.values_list("pk", flat=True))
+    for i in range(0, len(ids), chunk_size):
+        yield ids[i : i + chunk_size]
+
+
+def find_mismatches(user_ids=None, chunk_size=CHUNK_SIZE):
+    """Compare the maintained counters with the activity history.
+
+    Returns one dict per user whose lifetime or per-source totals are off, with the
+    `expected` (from activities) and `stored` values.
+    """
+    mismatches = []
+    for chunk in _user_id_chunks(user_ids, chunk_size):
+        expected = activity_step_totals(chunk)
+        stored = stored_step_totals(chunk)
+        lifetime = dict(
+            TrekknUser.objects.filter(pk__in=chunk).values_list("pk", "total_steps")
+        )
+        for user_id in chunk:
+            # a zero row is the same as no row
+            want = {k: v for k, v in expected.get(user_id, {}).items() if v}
+            have = {k: v for k, v in stored.get(user_id, {}).items() if v}
+            if want != have or sum(want.values()) != lifetime[user_id]:
+                mismatches.append(
+                    {
+                        "user_id": user_id,
+                        "expected_total": sum(want.values()),
+                        "stored_total": lifetime[user_id],
+                        "expected": want,
+                        "stored": have,
+                    }
+                )
+    return mismatches
+
+
+def rebuild_step_totals(user_ids=None, chunk_size=CHUNK_SIZE):
+    """Recompute lifetime and per-source totals from the activity history.
+
+    Each chunk of users is locked while it is rebuilt, so activities saved meanwhile
+    wait and then increment the rebuilt totals. Returns the number of users rebuilt.
+    """
+    rebuilt = 0
+    for chunk in _user_id_chunks(user_ids, chunk_size):
+        with transaction.atomic():
+            users = list(TrekknUser.objects.select_for_update().filter(pk__in=chunk))
+            expected = activity_step_totals(chunk)
+
+            UserStepTotal.objects.filter(user_id__in=chunk).delete()
+            UserStepTotal.objects.bulk_create(
+                [
+                    UserStepTotal(user_id=user_id, source=source, steps=steps)
+                    for user_id, sources in expected.items()
+                    for source, steps in sources.items()
+                ]
+            )
+            for user in users:
+                user.total_steps = sum(expected.get(user.pk, {}).values())
+            TrekknUser.objects.bulk_update(users, ["total_steps"])
+        rebuilt += len(users)
+    return rebuilt
@@ -0,0 +1,79 @@
+from datetime import date
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from trekkn.models import DailyRollup, TrekknUser
+
+
+# users written per bulk_update by `rebuild_streaks`
+CHUNK_SIZE = 1000
+
+
+def _day_number(column):
+    """SQL turning a date column into an integer that grows by one per day."""
+    if connection.vendor == "sqlite":
+        return f"CAST(julianday({column}) AS INTEGER)"
+    return f"({column} - DATE '1970-01-01')"
+
+
+def latest_islands(days=None):
+    """Streak and last active day of every user with steps, from the daily rollups.
+
+    Gaps-and-islands: consecutive days minus their row number are constant within a run
+    of days, so grouping on that difference gives each run; the latest run is the
+    streak. `days` may be any query of distinct `user_id, day` rows.
+    Returns `{user_id: (streak, last_active)}`.
+    """
+    if days is None:
+        # one rollup per user and day, so no DISTINCT over the raw activities
+        days = (
+            DailyRollup.objects.filter(source="steps", activities__gt=0)
+            .values("user_id", day=F("date"))
+            .order_by()
+        )
+    days_sql, params = days.query.sql_with_params()
+    sql = f"""
+        WITH days AS ({days_sql}),
+        islands AS (
+            SELECT user_id, day,
+                {_day_number("day")}
+                - ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY day) AS island
+            FROM days
+        ),
+        runs AS (
+            SELECT user_id, COUNT(*) AS streak, MAX(day) AS last_active,
+                ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY MAX(day) DESC) AS recency
+            FROM islands
+            GROUP BY user_id, island
+        )
+        SELECT user_id, streak, last_active FROM runs WHERE recency = 1
+    """
+    pk = TrekknUser._meta.pk
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {
+            pk.to_python(user_id): (
+                streak,
+                date.fromisoformat(last) if isinstance(last, str) else last,
+            )
+            for user_id, streak, last in cursor.fetchall()
+        }
+
+
+def rebuild_streaks(chunk_size=CHUNK_SIZE):
+    """Recompute `streak` and `last_active` of every user. Returns the users changed."""
+    islands = latest_islands()
+    changed = []
+    users = TrekknUser.objects.only("pk", "streak", "last_active").order_by("pk")
+    for user in users.iterator(chunk_size=chunk_size):
+        streak, last_active = islands.get(user.pk, (0, None))
+        if (user.streak, user.last_active) != (streak, last_active):
+            user.streak, user.last_active = streak, last_active
+            changed.append(user)
+
+    with transaction.atomic():
+        TrekknUser.objects.bulk_update(
+            changed, ["streak", "last_active"], batch_size=chunk_size
+        )
+    return len(changed)
@@ -1,3 +1,1574 @@
-from django.test import TestCase
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import requests
+import rsa
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from eth_account import Account
+from google.auth import crypt, jwt
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from solders.keypair import Keypair
+from web3.exceptions import TransactionNotFound
+
+from trekkn import (
+    authentication,
+    google_certs,
+    leaderboards,
+    missions,
+    nonces,
+    outbox,
+    receipts,
+    rollups,
+    seasons,
+    step_totals,
+    streaks,
+    wallets,
+)
+from trekkn.actions import get_referred, log_steps_and_reward_user
+from trekkn.contracts import loggable, registry
+from trekkn.serializers import TrekknUserSerializer
+from trekkn.models import (
+    DailyActivity,
+    ChainNonce,
+    DailyRollup,
+    LeaderboardScore,
+    Mission,
+    NetworkHealth,
+    SeasonSnapshot,
+    StepLogOutbox,
+    TrekknUser,
+    UserEventLog,
+    UserMission,
+    UserStepTotal,
+)
+
+try:
+    import eth_tester  # noqa: F401
+
+    HAS_ETH_TESTER = True
+except ImportError:
+    HAS_ETH_TESTER = False
+
+
+def forget_catalog_after(test):
+    """Forget the mission catalog cached during `test` once it ends."""
+    # the test's rollback deletes its missions without sending post_delete
+    test.addCleanup(missions.invalidate_mission_catalog)
+
+
+@skipUnless(HAS_ETH_TESTER, "needs eth-tester[py-evm]")
+class BatchedLogWalkTests(TestCase):
+    def setUp(self):
+        from trekkn.contracts.local_chain import deploy_local_walklog
+
+        self.web3, self.net = deploy_local_walklog()
+
+    def test_log_walks_emits_one_event_per_walk(self):
+        entries = [(loggable.CREATOR_ADDRESS, steps) for steps in (1000, 2000, 3000)]
+        tx_hash = loggable.write_batch_to_network(self.net, entries)
+
+        receipt = self.web3.eth.get_transaction_receipt(tx_hash)
+        self.assertEqual(receipt.status, 1)
+        self.assertEqual(len(receipt.logs), 3)
+
+    def test_log_walks_rejects_mismatched_lengths(self):
+        client = loggable.get_client(self.net, loggable.NETWORK_TIMEOUT)
+        with self.assertRaises(Exception):
+            client.contract.functions.logWalks(
+                [loggable.CREATOR_ADDRESS], [1, 2]
+            ).call({"from": loggable.CREATOR_ADDRESS})
+
+    def test_outbox_sends_full_batch_in_one_transaction(self):
+        user = TrekknUser.objects.create(email="walker@example.com", username="walker")
+        with override_settings(CHAIN_NETWORKS=[self.net]):
+            for _ in range(3):
+                log_steps_and_reward_user(user, 1500)
+            rows = outbox.drain_outbox(walks_per_tx=3)
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({row.status for row in rows}, {StepLogOutbox.SENT})
+        self.assertEqual(len({row.tx_hash for row in rows}), 1)
+        receipt = self.web3.eth.get_transaction_receipt(rows[0].tx_hash)
+        self.assertEqual(len(receipt.logs), 3)
+
+    def test_outbox_holds_partial_batch_until_window_closes(self):
+        user = TrekknUser.objects.create(email="walker@example.com", username="walker")
+        with override_settings(CHAIN_NETWORKS=[self.net]):
+            log_steps_and_reward_user(user, 1500)
+            rows = outbox.drain_outbox(walks_per_tx=3)
+
+        self.assertEqual(rows, [])
+        row = StepLogOutbox.objects.get()
+        self.assertEqual(row.status, StepLogOutbox.PENDING)
+        self.assertEqual(row.attempts, 0)
+
+
+@skipUnless(HAS_ETH_TESTER, "needs eth-tester[py-evm]")
+class ReceiptReconcileTests(TestCase):
+    def setUp(self):
+        from trekkn.contracts.local_chain import deploy_local_walklog
+
+        self.web3, self.net = deploy_local_walklog(batch=False)
+        self.user = TrekknUser.objects.create(
+            email="walker@example.com", username="walker"
+        )
+        networks = override_settings(CHAIN_NETWORKS=[self.net])
+        networks.enable()
+        self.addCleanup(networks.disable)
+
+    def test_mined_transaction_is_confirmed(self):
+        log_steps_and_reward_user(self.user, 1500)
+        outbox.drain_outbox()
+
+        changed = receipts.reconcile_receipts()
+
+        self.assertEqual([row.status for row in changed], [StepLogOutbox.CONFIRMED])
+        row = StepLogOutbox.objects.get()
+        self.assertEqual(row.status, StepLogOutbox.CONFIRMED)
+        self.assertIsNotNone(row.block_number)
+
+    def test_missing_receipt_is_resubmitted_after_timeout(self):
+        log_steps_and_reward_user(self.user, 1500)
+        StepLogOutbox.objects.update(
+            status=StepLogOutbox.SENT,
+            tx_hash="0x" + "00" * 32,
+            sent_at=timezone.now() - timedelta(hours=1),
+        )
+
+        receipts.reconcile_receipts()
+        self.assertEqual(StepLogOutbox.objects.get().status, StepLogOutbox.RESUBMIT)
+
+        rows = outbox.drain_outbox()
+        self.assertEqual([row.status for row in rows], [StepLogOutbox.SENT])
+        self.assertNotEqual(rows[0].tx_hash, "0x" + "00" * 32)
+
+
+# offline networks for tests that stub out the RPC side
+TEST_NETWORKS = [
+    {
+        "name": "ALPHA",
+        "url": "http://alpha.invalid/",
+        "contract": "0x661A88CEF5Bb8f58822C4f334C482d1Bf0DcD1e7",
+    },
+    {
+        "name": "BETA",
+        "url": "http://beta.invalid/",
+        "contract": "0x0D1f40B591FbB15CDFD5bd9e03734acc114de49e",
+    },
+]
+
+
+def use_test_networks(test):
+    """Point `test` at TEST_NETWORKS with nonce counters that don't need the chain."""
+    networks = override_settings(
+        CHAIN_NETWORKS=TEST_NETWORKS, CHAIN_NETWORKS_DISABLED=[]
+    )
+    networks.enable()
+    test.addCleanup(networks.disable)
+    for net in TEST_NETWORKS:
+        ChainNonce.objects.create(
+            network=net["name"],
+            address=loggable.CREATOR_ADDRESS,
+            next_nonce=7,
+            needs_resync=False,
+        )
+
+
+def queue_sqlite_writers(test):
+    """Make concurrent SQLite writers in `test` wait for the lock instead of failing.
+
+    Two deferred transactions that both upgrade to a write fail with "database is
+    locked". Taking the lock at BEGIN avoids it; only the threaded tests need that, so
+    the development database keeps SQLite's defaults.
+    """
+    if connection.vendor != "sqlite":
+        return
+    # shared with the connections the worker threads open
+    options = connection.settings_dict["OPTIONS"]
+    saved = dict(options)
+    options.update(transaction_mode="IMMEDIATE", timeout=20)
+    connection.close()
+
+    def restore():
+        options.clear()
+        options.update(saved)
+        connection.close()
+
+    test.addCleanup(restore)
+
+
+class StubSend:
+    """Stands in for `outbox._send`: records the nonces and fails where told to."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.sent = []  # (network, nonce, walks)
+        self.lock = threading.Lock()
+
+    def __call__(self, group, nonce=None):
+        network = group[0].network
+        if network in self.fail:
+            return None, RuntimeError(f"{network} is down")
+        with self.lock:
+            self.sent.append((network, nonce, len(group)))
+        return f"0x{network.lower()}{nonce:04x}", None
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        use_test_networks(self)
+        self.user = TrekknUser.objects.create(email="walker@example.com", username="walker")
+
+    def walk(self, steps=1500):
+        return log_steps_and_reward_user(self.user, steps)
+
+    def test_rows_are_queued_with_the_activity_one_per_network(self):
+        activity = self.walk()
+
+        rows = StepLogOutbox.objects.filter(activity=activity)
+        self.assertEqual(sorted(rows.values_list("network", flat=True)), ["ALPHA", "BETA"])
+        self.assertEqual({row.status for row in rows}, {StepLogOutbox.PENDING})
+
+        # the same transaction: if queueing fails, the activity isn't kept either
+        with mock.patch("trekkn.actions.enqueue_step_logs", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.walk()
+        self.assertEqual(DailyActivity.objects.count(), 1)
+
+    def test_claimed_rows_are_leased_and_not_claimed_again(self):
+        self.walk()
+
+        claimed = outbox.claim_due_rows()
+        self.assertEqual(len(claimed), 2)
+        self.assertEqual(outbox.claim_due_rows(), [])
+        for row in StepLogOutbox.objects.all():
+            self.assertGreater(row.next_attempt_at, timezone.now() + timedelta(minutes=1))
+
+        # once the lease runs out, e.g. the worker died, the rows are due again
+        StepLogOutbox.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(len(outbox.claim_due_rows()), 2)
+
+    def test_backoff_doubles_up_to_an_hour(self):
+        self.assertEqual(
+            [outbox.backoff_delay(n).total_seconds() for n in (1, 2, 3, 4)],
+            [5, 10, 20, 40],
+        )
+        self.assertEqual(outbox.backoff_delay(30), timedelta(hours=1))
+
+    def test_failed_sends_back_off_then_go_dead(self):
+        self.walk()
+        row = StepLogOutbox.objects.get(network="ALPHA")
+
+        for attempt in (1, 2, 3):
+            before = timezone.now()
+            outbox.record_result(row, None, RuntimeError("boom"), max_attempts=4)
+            row.refresh_from_db()
+            self.assertEqual((row.status, row.attempts), (StepLogOutbox.PENDING, attempt))
+            self.assertGreaterEqual(
+                row.next_attempt_at, before + outbox.backoff_delay(attempt)
+            )
+            self.assertEqual(row.last_error, "boom")
+
+        outbox.record_result(row, None, RuntimeError("boom"), max_attempts=4)
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), (StepLogOutbox.DEAD, 4))
+        StepLogOutbox.objects.update(next_attempt_at=timezone.now())
+        self.assertNotIn(row, outbox.claim_due_rows())
+
+    def test_drain_sends_every_network_in_nonce_order(self):
+        for _ in range(3):
+            self.walk()
+        send = StubSend(fail={"BETA"})
+
+        with mock.patch("trekkn.outbox._send", send):
+            rows = outbox.drain_outbox()
+
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(
+            sorted(send.sent), [("ALPHA", 7, 1), ("ALPHA", 8, 1), ("ALPHA", 9, 1)]
+        )
+        alpha = StepLogOutbox.objects.filter(network="ALPHA")
+        self.assertEqual({row.status for row in alpha}, {StepLogOutbox.SENT})
+        self.assertEqual(len({row.tx_hash for row in alpha}), 3)
+        beta = StepLogOutbox.objects.filter(network="BETA")
+        self.assertEqual({(row.status, row.attempts) for row in beta}, {("pending", 1)})
+        self.assertEqual(ChainNonce.objects.get(network="ALPHA").next_nonce, 10)
+        # nothing is due until the failed rows have backed off
+        with mock.patch("trekkn.outbox._send", send):
+            self.assertEqual(outbox.drain_outbox(), [])
+
+
+class ConcurrentFanOutTests(TestCase):
+    def setUp(self):
+        use_test_networks(self)
+
+    def test_slow_and_failing_networks_do_not_hold_up_the_others(self):
+        def write(net, user_address, step_count, **kwargs):
+            if net["name"] == "ALPHA":
+                time.sleep(1)
+                return "0xslow"
+            if net["name"] == "BETA":
+                raise RuntimeError("BETA is down")
+            return "0xgamma"
+
+        networks = TEST_NETWORKS + [dict(TEST_NETWORKS[0], name="GAMMA")]
+        started = time.monotonic()
+        with mock.patch.object(loggable, "write_steps_to_network", write):
+            results = loggable.write_steps_to_multiple_networks(
+                loggable.CREATOR_ADDRESS,
+                1500,
+                concurrent=True,
+                timeout=0.2,
+                networks=networks,
+            )
+
+        self.assertLess(time.monotonic() - started, 0.9)
+        # timed out, failed and sent: every network has an outcome
+        self.assertEqual(results, {"ALPHA": None, "BETA": None, "GAMMA": "0xgamma"})
+
+    def test_outbox_sends_networks_in_parallel_and_records_each_outcome(self):
+        user = TrekknUser.objects.create(email="walker@example.com", username="walker")
+        log_steps_and_reward_user(user, 1500)
+        beta_done = threading.Event()
+        overlapped = []
+
+        def send(group, nonce=None):
+            if group[0].network == "ALPHA":
+                # only finishes in time if BETA runs meanwhile
+                overlapped.append(beta_done.wait(timeout=2))
+                return "0xalpha", None
+            beta_done.set()
+            return None, RuntimeError("BETA is down")
+
+        with mock.patch("trekkn.outbox._send", send):
+            rows = outbox.send_rows(outbox.claim_due_rows(), concurrent=True)
+
+        self.assertEqual(overlapped, [True])
+        self.assertEqual(
+            {(row.network, row.status, row.attempts) for row in rows},
+            {("ALPHA", StepLogOutbox.SENT, 1), ("BETA", StepLogOutbox.PENDING, 1)},
+        )
+        self.assertEqual(
+            StepLogOutbox.objects.get(network="BETA").last_error, "BETA is down"
+        )
+
+
+class StubReceiptChain:
+    """Stands in for a network client in `receipts`, with nothing mined yet."""
+
+    name = "ALPHA"
+
+    def __init__(self, batch, latest_nonce=0):
+        self.web3 = mock.Mock()
+        self.web3.provider.make_batch_request.side_effect = [batch]
+        self.web3.eth.get_transaction_count.return_value = latest_nonce
+        self.web3.eth.get_transaction_receipt.side_effect = TransactionNotFound(
+            "not found"
+        )
+        self.web3.eth.get_transaction.side_effect = TransactionNotFound("not found")
+
+
+class ReceiptStatusTests(TestCase):
+    def setUp(self):
+        use_test_networks(self)
+        user = TrekknUser.objects.create(email="walker@example.com", username="walker")
+        log_steps_and_reward_user(user, 1500)
+        with mock.patch("trekkn.outbox._send", StubSend()):
+            outbox.drain_outbox()
+        StepLogOutbox.objects.filter(network="BETA").delete()
+        self.row = StepLogOutbox.objects.get()
+
+    def reconcile(self, chain, late=True):
+        if late:
+            StepLogOutbox.objects.update(sent_at=timezone.now() - timedelta(hours=1))
+        with mock.patch("trekkn.receipts.get_client", return_value=chain):
+            receipts.reconcile_receipts()
+        return StepLogOutbox.objects.get()
+
+    def test_sent_rows_keep_their_nonce(self):
+        self.assertEqual(self.row.nonce, 7)
+
+    def test_receipt_lookup_errors_are_asked_again(self):
+        chain = StubReceiptChain([{"id": 0, "error": {"message": "header not found"}}])
+
+        row = self.reconcile(chain)
+
+        self.assertEqual(row.status, StepLogOutbox.SENT)
+        chain.web3.eth.get_transaction.assert_not_called()
+
+    def test_failed_batch_request_falls_back_to_one_request_per_hash(self):
+        chain = StubReceiptChain(requests.ConnectionError("batch refused"))
+        chain.web3.eth.get_transaction_receipt.side_effect = [
+            {"status": 1, "blockNumber": 12}
+        ]
+
+        row = self.reconcile(chain, late=False)
+
+        self.assertEqual((row.status, row.block_number), (StepLogOutbox.CONFIRMED, 12))
+
+    def test_late_transaction_still_pending_is_not_resubmitted(self):
+        chain = StubReceiptChain([{"id": 0, "result": None}], latest_nonce=7)
+        chain.web3.eth.get_transaction.side_effect = None
+        chain.web3.eth.get_transaction.return_value = {"nonce": 7, "blockNumber": None}
+
+        self.assertEqual(self.reconcile(chain).status, StepLogOutbox.SENT)
+
+        # another transaction was mined with its nonce, this one never will be
+        chain.web3.provider.make_batch_request.side_effect = [[{"id": 0, "result": None}]]
+        chain.web3.eth.get_transaction_count.return_value = 8
+        self.assertEqual(self.reconcile(chain).status, StepLogOutbox.RESUBMIT)
+        self.assertFalse(ChainNonce.objects.get(network="ALPHA").needs_resync)
+
+    def test_dropped_transaction_is_resubmitted_and_its_gap_resynced(self):
+        chain = StubReceiptChain([{"id": 0, "result": None}], latest_nonce=7)
+
+        self.assertEqual(self.reconcile(chain).status, StepLogOutbox.RESUBMIT)
+        counter = ChainNonce.objects.get(network="ALPHA")
+        self.assertEqual((counter.needs_resync, counter.resync_may_lower), (True, True))
+
+
+class ChainClientCacheTests(TestCase):
+    def setUp(self):
+        registry.clear_clients()
+        self.addCleanup(registry.clear_clients)
+
+    def test_clients_and_contracts_are_reused_per_network(self):
+        alpha, beta = TEST_NETWORKS
+        client = registry.get_client(alpha, 10)
+
+        self.assertIs(registry.get_client(alpha, 10), client)
+        self.assertIs(registry.get_client(alpha, 10).contract, client.contract)
+        self.assertIsNot(registry.get_client(beta, 10), client)
+        self.assertEqual(client.contract.address, alpha["contract"])
+
+    def test_artifacts_are_read_once_per_process(self):
+        registry.load_artifacts.cache_clear()
+        registry.get_client(TEST_NETWORKS[0], 10)
+        registry.get_client(TEST_NETWORKS[1], 10)
+        registry.load_artifacts()
+
+        self.assertEqual(registry.load_artifacts.cache_info().misses, 1)
+
+    def test_clear_drops_every_client(self):
+        client = registry.get_client(TEST_NETWORKS[0], 10)
+
+        registry.clear_clients()
+
+        self.assertIsNot(registry.get_client(TEST_NETWORKS[0], 10), client)
+        self.assertEqual(registry.cache_stats(), {"ALPHA": {}})
+
+    def stub_client(self, gas_prices):
+        """A client whose node answers `gas_prices` in turn, on a hand-moved clock."""
+        self.now = 0.0
+        web3 = mock.Mock()
+        fetch = type(web3.eth).gas_price = mock.PropertyMock(side_effect=gas_prices)
+        client = registry.register_client(
+            TEST_NETWORKS[0], 10, web3, clock=lambda: self.now
+        )
+        return client, fetch
+
+    def test_gas_price_is_cached_then_served_stale_while_refreshing(self):
+        client, fetch = self.stub_client([100, 200, 300])
+        self.assertEqual(client.gas_price, 100)
+
+        self.now = registry.GAS_PRICE_TTL - 0.1
+        self.assertEqual(client.gas_price, 100)
+        self.assertEqual(fetch.call_count, 1)
+
+        # past the TTL the old price is returned while a thread fetches the next one
+        self.now = registry.GAS_PRICE_TTL
+        with mock.patch("trekkn.contracts.registry.threading.Thread") as thread:
+            self.assertEqual(client.gas_price, 100)
+            self.assertEqual(client.gas_price, 100)  # one refresh at a time
+        thread.assert_called_once()
+        thread.call_args.kwargs["target"]()
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(client.gas_price, 200)
+
+        # too stale to serve: the caller waits for the node
+        self.now += registry.GAS_PRICE_MAX_STALE
+        self.assertEqual(client.gas_price, 300)
+
+        self.assertEqual(
+            registry.cache_stats(),
+            {"ALPHA": {"gas_price_miss": 2, "gas_price_hit": 2, "gas_price_stale": 2}},
+        )
+
+    def test_gas_estimates_get_headroom_and_are_cached_per_call_shape(self):
+        client, _ = self.stub_client([])
+        estimate = mock.Mock(return_value=50_001)
+
+        self.assertEqual(client.estimate_gas("logWalk", estimate), 60_002)
+        self.now = registry.GAS_ESTIMATE_TTL - 1
+        self.assertEqual(client.estimate_gas("logWalk", estimate), 60_002)
+        self.assertEqual(estimate.call_count, 1)
+        self.assertEqual(client.estimate_gas("logWalks", mock.Mock(return_value=10)), 12)
+
+        self.now = registry.GAS_ESTIMATE_TTL * 2
+        estimate.return_value = 40_000
+        self.assertEqual(client.estimate_gas("logWalk", estimate), 48_000)
+        self.assertEqual(
+            registry.cache_stats()["ALPHA"], {"gas_estimate_miss": 3, "gas_estimate_hit": 1}
+        )
+
+
+class StubChain:
+    """Stands in for a network client in `nonces`; only knows the pending count."""
+
+    def __init__(self, pending):
+        self.web3 = mock.Mock()
+        self.web3.eth.get_transaction_count.return_value = pending
+
+
+class NonceTests(TestCase):
+    def setUp(self):
+        use_test_networks(self)  # counters of ALPHA and BETA at 7
+        self.alpha = TEST_NETWORKS[0]
+
+    def counter(self):
+        return ChainNonce.objects.get(network="ALPHA")
+
+    def reserve_with_chain_at(self, pending, count=1):
+        with mock.patch("trekkn.nonces.get_client", return_value=StubChain(pending)):
+            return nonces.reserve_nonces(self.alpha, count=count)
+
+    def test_only_nonce_errors_flag_a_resync(self):
+        self.assertIsNone(nonces.resync_after("ALPHA", TimeoutError("read timed out")))
+        self.assertFalse(self.counter().needs_resync)
+
+        self.assertEqual(
+            nonces.resync_after("ALPHA", ValueError("{'message': 'nonce too low'}")),
+            nonces.USED,
+        )
+        self.assertEqual(
+            nonces.resync_after("ALPHA", ValueError("already known")), nonces.USED
+        )
+        counter = self.counter()
+        self.assertEqual((counter.needs_resync, counter.resync_may_lower), (True, False))
+
+        self.assertEqual(nonces.resync_after("ALPHA", "nonce too high"), nonces.GAP)
+        self.assertTrue(self.counter().resync_may_lower)
+
+    def test_resync_never_takes_back_reserved_nonces(self):
+        # another worker holds 7..11 and hasn't broadcast them, the node counts 5
+        self.assertEqual(nonces.reserve_nonces(self.alpha, count=5), 7)
+        nonces.mark_for_resync("ALPHA")
+        self.assertEqual(self.reserve_with_chain_at(5), 12)
+
+        # the chain moved past the counter, e.g. a manual transaction
+        nonces.mark_for_resync("ALPHA")
+        self.assertEqual(self.reserve_with_chain_at(40), 40)
+
+    def test_gap_resync_moves_the_counter_back(self):
+        nonces.reserve_nonces(self.alpha, count=5)
+        nonces.mark_for_resync("ALPHA", lower=True)
+
+        self.assertEqual(self.reserve_with_chain_at(9), 9)
+        counter = self.counter()
+        self.assertEqual(counter.next_nonce, 10)
+        self.assertEqual((counter.needs_resync, counter.resync_may_lower), (False, False))
+
+    def test_failed_send_gives_back_its_unused_nonces(self):
+        user = TrekknUser.objects.create(email="walker@example.com", username="walker")
+        for _ in range(3):
+            log_steps_and_reward_user(user, 1500)
+
+        with mock.patch("trekkn.outbox._send", StubSend(fail={"BETA"})):
+            outbox.drain_outbox()
+
+        # BETA's three nonces were never used, ALPHA's were
+        self.assertEqual(ChainNonce.objects.get(network="BETA").next_nonce, 7)
+        self.assertFalse(ChainNonce.objects.get(network="BETA").needs_resync)
+        self.assertEqual(self.counter().next_nonce, 10)
+
+        # unless someone reserved after them: then they can't be given back
+        nonces.reserve_nonces(self.alpha, count=3)
+        self.assertFalse(nonces.release_nonces("ALPHA", 10, 12))
+        self.assertEqual(self.counter().next_nonce, 13)
+
+    def test_gap_left_behind_later_reservations_is_resynced(self):
+        user = TrekknUser.objects.create(email="walker@example.com", username="walker")
+        for _ in range(2):
+            log_steps_and_reward_user(user, 1500)
+
+        def send(group, nonce=None):
+            if group[0].network == "BETA":
+                return "0xbeta", None
+            # another worker reserves 9..11 while nonce 7 times out
+            nonces.reserve_nonces(self.alpha, count=3)
+            return None, TimeoutError("read timed out")
+
+        with mock.patch("trekkn.outbox._send", send):
+            outbox.send_rows(outbox.claim_due_rows(), concurrent=False)
+
+        # 7 and 8 can't be given back, the node would queue 9..11 behind them
+        counter = self.counter()
+        self.assertEqual(counter.next_nonce, 12)
+        self.assertEqual((counter.needs_resync, counter.resync_may_lower), (True, True))
+        self.assertEqual(self.reserve_with_chain_at(7, count=2), 7)
+
+
+class ConcurrentNonceTests(TransactionTestCase):
+    WORKERS = 8
+    RESERVATIONS = 10
+
+    def setUp(self):
+        queue_sqlite_writers(self)
+
+    def test_concurrent_reservations_never_share_a_nonce(self):
+        ChainNonce.objects.create(
+            network="ALPHA", address=loggable.CREATOR_ADDRESS, needs_resync=False
+        )
+        start = threading.Barrier(self.WORKERS)
+
+        def reserve(worker):
+            ranges = []
+            try:
+                start.wait()
+                for i in range(self.RESERVATIONS):
+                    count = 1 + (worker + i) % 3
+                    first = nonces.reserve_nonces(TEST_NETWORKS[0], count=count)
+                    ranges.append(range(first, first + count))
+            finally:
+                connection.close()
+            return ranges
+
+        with ThreadPoolExecutor(self.WORKERS) as pool:
+            handed_out = [
+                nonce
+                for ranges in pool.map(reserve, range(self.WORKERS))
+                for reserved in ranges
+                for nonce in reserved
+            ]
+
+        self.assertEqual(sorted(handed_out), list(range(len(handed_out))))
+        self.assertEqual(ChainNonce.objects.get().next_nonce, len(handed_out))
+
+
+class CircuitBreakerTests(TestCase):
+    def test_opens_after_repeated_failures_and_probes_after_cooldown(self):
+        from trekkn.contracts.breaker import CircuitBreaker
+
+        breaker = CircuitBreaker("TEST", failure_threshold=3, cooldown=0.05)
+        for _ in range(3):
+            self.assertFalse(breaker.is_open())
+            breaker.record(0.01, succeeded=False)
+        self.assertTrue(breaker.is_open())
+
+        time.sleep(0.06)
+        self.assertFalse(breaker.is_open())  # half open: one probe goes through
+        breaker.record(0.02, succeeded=False)
+        self.assertTrue(breaker.is_open())
+
+        time.sleep(0.06)
+        breaker.is_open()
+        breaker.record(0.02, succeeded=True)
+        snapshot = breaker.snapshot()
+        self.assertEqual(snapshot["state"], "closed")
+        self.assertEqual(snapshot["samples"], 5)
+        self.assertEqual(snapshot["p50_ms"], 10.0)
+        self.assertEqual(snapshot["p95_ms"], 20.0)
+
+    def test_drain_loop_saves_health_when_nothing_was_sent(self):
+        from trekkn.contracts.breaker import clear_breakers, get_breaker
+
+        use_test_networks(self)
+        clear_breakers()
+        self.addCleanup(clear_breakers)
+        breaker = get_breaker("ALPHA")
+        while not breaker.is_open():
+            breaker.record(0.01, succeeded=False)
+
+        call_command("drain_step_outbox", "--once", stdout=StringIO())
+
+        self.assertEqual(NetworkHealth.objects.get(network="ALPHA").state, "open")
+
+    def test_health_endpoint_reports_network_breakers(self):
+        NetworkHealth.objects.create(network="MONAD", state="open", p95_ms=812.5)
+
+        response = self.client.get("/health/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["networks"]["MONAD"]["state"], "open")
+        self.assertEqual(response.data["networks"]["MONAD"]["p95_ms"], 812.5)
+
+
+class StepTotalTests(TestCase):
+    def setUp(self):
+        forget_catalog_after(self)
+        self.user = TrekknUser.objects.create(email="walker@example.com", username="walker")
+
+    def totals(self):
+        return dict(self.user.step_totals.values_list("source", "steps"))
+
+    def test_totals_follow_activity_create_update_and_delete(self):
+        first = DailyActivity.objects.create(user=self.user, step_count=1200)
+        DailyActivity.objects.create(user=self.user, step_count=300, source="bonus")
+        self.assertEqual(self.user.total_steps, 1500)
+        self.assertEqual(self.totals(), {"steps": 1200, "bonus": 300})
+
+        first.step_count = 2000
+        first.save()
+        first.delete()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.total_steps, 300)
+        self.assertEqual(self.totals(), {"steps": 0, "bonus": 300})
+        self.assertEqual(step_totals.find_mismatches(), [])
+
+    def test_missions_read_the_lifetime_counter(self):
+        Mission.objects.create(name="First 2k", description="", requirement_steps=2000)
+        activity = DailyActivity.objects.create(user=self.user, step_count=1500)
+        self.assertFalse(self.user.missions.get().is_completed)
+
+        with self.assertNumQueries(0):  # not even near the cached mission's requirement
+            activity.check_missions()
+
+        DailyActivity.objects.create(user=self.user, step_count=600)
+        self.assertTrue(self.user.missions.get().is_completed)
+
+    def test_step_leaderboard_sums_the_period_not_the_lifetime_counter(self):
+        DailyActivity.objects.create(user=self.user, step_count=1200)
+        DailyActivity.objects.create(
+            user=self.user,
+            step_count=5000,
+            timestamp=timezone.now() - timedelta(days=10),
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get("/users/", {"leaderboard": "week"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]["total_steps"], 1200)
+
+    def test_checker_finds_and_rebuild_fixes_drift(self):
+        DailyActivity.objects.create(user=self.user, step_count=1200)
+        TrekknUser.objects.filter(pk=self.user.pk).update(total_steps=5)
+        UserStepTotal.objects.filter(user=self.user).delete()
+
+        mismatches = step_totals.find_mismatches()
+        self.assertEqual(len(mismatches), 1)
+        self.assertEqual(mismatches[0]["expected"], {"steps": 1200})
+
+        self.assertEqual(step_totals.rebuild_step_totals(), 1)
+        self.assertEqual(step_totals.find_mismatches(), [])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.total_steps, 1200)
+
+
+class MissionCompletionTests(TestCase):
+    def setUp(self):
+        forget_catalog_after(self)
+        self.user = TrekknUser.objects.create(email="walker@example.com", username="walker")
+
+    def queries_to_complete(self, missions):
+        for i in range(missions):
+            Mission.objects.create(
+                name=f"Walk {i}", description="", requirement_steps=100 * i, aura_reward=5
+            )
+        activity = DailyActivity(user=self.user, step_count=1000, source="bonus")
+        activity.save()
+        self.user.missions.update(is_completed=False, achieved=None)
+        TrekknUser.objects.filter(pk=self.user.pk).update(aura=100)
+        self.user.aura = 100
+
+        with CaptureQueriesContext(connection) as queries:
+            activity.check_missions()
+        self.assertEqual(self.user.missions.filter(is_completed=True).count(), missions)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.aura, 100 + 5 * missions)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_completed_missions(self):
+        one = self.queries_to_complete(1)
+        Mission.objects.all().delete()
+        self.assertEqual(self.queries_to_complete(8), one)
+
+    def test_completed_missions_are_not_rewarded_again(self):
+        self.queries_to_complete(3)
+        activity = self.user.daily_activities.get()
+        activity.check_missions()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.aura, 115)
+
+
+class MissionFanOutTests(TestCase):
+    def setUp(self):
+        forget_catalog_after(self)
+        self.users = [
+            TrekknUser.objects.create(email=f"u{i}@example.com", username=f"u{i}")
+            for i in range(7)
+        ]
+
+    def test_new_mission_is_given_to_every_user_in_chunks(self):
+        with override_settings(MISSION_FANOUT="worker"):
+            mission = Mission.objects.create(name="Walk", description="")
+        # 4 reads of user ids (the last one empty), 3 INSERTs and marking the mission
+        with self.assertNumQueries(8):
+            self.assertEqual(missions.assign_mission_to_users(mission, chunk_size=3), 7)
+        self.assertEqual(UserMission.objects.filter(mission=mission).count(), 7)
+        self.assertIsNotNone(Mission.objects.get(pk=mission.pk).assigned_at)
+
+        # re-running skips the pairs already there
+        missions.assign_mission_to_users(mission, chunk_size=3)
+        self.assertEqual(UserMission.objects.filter(mission=mission).count(), 7)
+
+    def test_catalog_is_cached_until_a_mission_changes(self):
+        walk = Mission.objects.create(name="Walk", description="", requirement_steps=10)
+        self.assertEqual(missions.mission_catalog(), (walk,))
+        with self.assertNumQueries(0):
+            missions.mission_catalog()
+
+        # another process bumped the version
+        cache.set(missions.CATALOG_VERSION_KEY, "elsewhere")
+        with self.assertNumQueries(1):
+            missions.mission_catalog()
+
+        run = Mission.objects.create(name="Run", description="", requirement_steps=5)
+        self.assertEqual(missions.mission_catalog(), (run, walk))
+        walk.delete()
+        self.assertEqual(missions.mission_catalog(), (run,))
+
+    def test_new_user_gets_every_mission_in_one_insert(self):
+        Mission.objects.create(name="Walk", description="")
+        Mission.objects.create(name="Run", description="")
+        user = TrekknUser(email="new@example.com", username="new")
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertEqual(user.missions.count(), 2)
+        self.assertEqual(
+            sum("trekkn_usermission" in query["sql"] for query in queries), 1
+        )
+
+    @override_settings(MISSION_FANOUT="worker")
+    def test_worker_fan_out_is_left_to_the_command(self):
+        mission = Mission.objects.create(name="Walk", description="")
+        self.assertFalse(UserMission.objects.filter(mission=mission).exists())
+
+        # a user signing up meanwhile gets it straight away
+        late = TrekknUser.objects.create(email="late@example.com", username="late")
+        self.assertTrue(late.missions.filter(mission=mission).exists())
+
+        call_command("assign_missions", "--once", "--chunk-size", "2", stdout=StringIO())
+        self.assertEqual(UserMission.objects.filter(mission=mission).count(), 8)
+        self.assertEqual(missions.assign_pending_missions(), [])
+
+
+@override_settings(USER_MISSION_STORAGE="sparse")
+class SparseMissionTests(TestCase):
+    def setUp(self):
+        forget_catalog_after(self)
+        self.user = TrekknUser.objects.create(email="walker@example.com", username="walker")
+        self.easy = Mission.objects.create(
+            name="Easy", description="", requirement_steps=1000, aura_reward=5
+        )
+        self.hard = Mission.objects.create(
+            name="Hard", description="", requirement_steps=5000, aura_reward=50
+        )
+
+    def test_only_completed_missions_are_stored(self):
+        # neither signup nor mission creation fans out
+        TrekknUser.objects.create(email="other@example.com", username="other")
+        self.assertFalse(UserMission.objects.exists())
+
+        DailyActivity.objects.create(user=self.user, step_count=1500)
+        row = UserMission.objects.get()
+        self.assertEqual((row.mission, row.is_completed), (self.easy, True))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.aura, 100 + 10 + 5)  # steps aura and the mission
+
+        # not rewarded twice
+        DailyActivity.objects.create(user=self.user, step_count=100)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.aura, UserMission.objects.count()), (115, 1))
+
+    def test_listing_merges_the_catalog_with_stored_rows(self):
+        DailyActivity.objects.create(user=self.user, step_count=1500)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        data = client.get("/user-missions/").data
+        self.assertEqual(
+            [(m["mission"]["name"], m["is_completed"]) for m in data],
+            [("Easy", True), ("Hard", False)],
+        )
+        self.assertIsNotNone(data[0]["id"])
+        self.assertIsNone(data[1]["id"])
+
+    def test_completing_a_virtual_row_stores_it(self):
+        virtual = missions.user_missions(self.user)[1]
+        virtual.complete()
+        virtual.complete()
+        self.assertTrue(UserMission.objects.get(mission=self.hard).is_completed)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.aura, 150)
+
+    def test_switching_from_dense_prunes_incomplete_rows(self):
+        with override_settings(USER_MISSION_STORAGE="dense"):
+            call_command("assign_missions", "--all", stdout=StringIO())
+        self.assertEqual(UserMission.objects.count(), 2)
+
+        call_command("prune_user_missions", stdout=StringIO())
+        self.assertFalse(UserMission.objects.exists())
+
+
+class ConcurrentRewardTests(TransactionTestCase):
+    WORKERS = 8
+    ACTIVITIES = 40
+    REFERRALS = 10
+
+    def setUp(self):
+        queue_sqlite_writers(self)
+        self.user = TrekknUser.objects.create(email="walker@example.com", username="walker")
+        self.friends = [
+            TrekknUser.objects.create(email=f"friend{i}@example.com", username=f"f{i}")
+            for i in range(self.REFERRALS)
+        ]
+
+    def test_concurrent_activities_and_referrals_keep_every_reward(self):
+        start = threading.Barrier(self.WORKERS)
+
+        def post_activity(i):
+            try:
+                if i < self.WORKERS:
+                    start.wait()
+                # every request loads its own copy of the user, like the views do
+                user = TrekknUser.objects.get(pk=self.user.pk)
+                if i < self.REFERRALS:
+                    get_referred(user, self.friends[i])
+                else:
+                    DailyActivity.objects.create(user=user, step_count=2000)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.WORKERS) as pool:
+            list(pool.map(post_activity, range(self.ACTIVITIES)))
+
+        walks = self.ACTIVITIES - self.REFERRALS
+        self.user.refresh_from_db()
+        # 2000 steps -> 100 points and 20 aura; a referral -> 500 points and 50 aura
+        self.assertEqual(self.user.balance, walks * 100 + self.REFERRALS * 500)
+        self.assertEqual(self.user.aura, 100 + walks * 20 + self.REFERRALS * 50)
+        self.assertEqual(self.user.total_steps, walks * 2000)
+
+
+class LevelTests(TestCase):
+    def loop_level(self, aura, level=1):
+        """The level the old step-by-step update_level settled on."""
+        base, multiplier = TrekknUser.BASE_AURA, TrekknUser.LEVEL_MULTIPLIER
+        while aura >= base + level * multiplier:
+            level += 1
+        while aura < base + (level - 1) * multiplier and level > 1:
+            level -= 1
+        return level
+
+    def test_closed_form_matches_the_level_loop(self):
+        for aura in range(-250, 5000, 7):
+            for start in (1, 3, 60):
+                self.assertEqual(
+                    TrekknUser.level_for_aura(aura), self.loop_level(aura, start), aura
+                )
+
+    def test_recompute_levels_uses_the_sql_expression(self):
+        auras = [-150, 0, 99, 100, 199, 200, 250, 1099, 12345]
+        for i, aura in enumerate(auras):
+            user = TrekknUser.objects.create(email=f"u{i}@example.com", username=f"u{i}")
+            TrekknUser.objects.filter(pk=user.pk).update(aura=aura, level=7)
+
+        call_command("recompute_levels", stdout=StringIO())
+
+        for aura, level in TrekknUser.objects.values_list("aura", "level"):
+            self.assertEqual(level, TrekknUser.level_for_aura(aura), aura)
+
+
+class StreakTests(TestCase):
+    def setUp(self):
+        self.user = TrekknUser.objects.create(email="walker@example.com", username="walker")
+        self.today = timezone.localdate()
+
+    def walk(self, days_ago, source="steps"):
+        timestamp = timezone.now() - timedelta(days=days_ago)
+        DailyActivity.objects.create(
+            user=self.user, step_count=1200, timestamp=timestamp, source=source
+        )
+
+    def test_streak_is_kept_as_activities_are_logged(self):
+        for days_ago in (6, 4, 3, 3, 2):  # a gap, then three days in a row
+            self.walk(days_ago)
+        self.walk(1, source="referral")
+        self.assertEqual(self.user.streak, 3)
+        self.assertEqual(self.user.last_active, self.today - timedelta(days=2))
+
+        # nothing logged yesterday or today: the streak is over
+        self.assertEqual(self.user.current_streak(), 0)
+        # with yesterday's steps it still counts until today ends
+        self.assertEqual(self.user.current_streak(self.today - timedelta(days=1)), 3)
+
+        self.walk(1)
+        self.walk(0)
+        self.assertEqual(self.user.current_streak(), 5)
+
+    def test_serializer_reads_the_stored_streak(self):
+        self.walk(1)
+        self.walk(0)
+        with self.assertNumQueries(0):
+            self.assertEqual(TrekknUserSerializer(self.user).data["streak"], 2)
+
+    def test_rebuild_matches_the_history(self):
+        for days_ago in (9, 8, 5, 4, 3):
+            self.walk(days_ago)
+        other = TrekknUser.objects.create(email="idle@example.com", username="idle")
+        TrekknUser.objects.filter(pk__in=[self.user.pk, other.pk]).update(
+            streak=42, last_active=None
+        )
+
+        self.assertEqual(streaks.rebuild_streaks(), 2)
+
+        self.user.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.user.streak, 3)
+        self.assertEqual(self.user.last_active, self.today - timedelta(days=3))
+        self.assertEqual((other.streak, other.last_active), (0, None))
+
+
+class DailyRollupTests(TestCase):
+    def setUp(self):
+        self.user = TrekknUser.objects.create(email="walker@example.com", username="walker")
+
+    def stored(self):
+        return sorted(
+            self.user.daily_rollups.filter(activities__gt=0).values_list(
+                "date", "source", "step_count", "amount_rewarded", "aura_gained", "activities"
+            )
+        )
+
+    def expected(self):
+        return sorted(
+            (r.date, r.source, r.step_count, r.amount_rewarded, r.aura_gained, r.activities)
+            for r in rollups.activity_rollups([self.user.pk])
+        )
+
+    def test_write_path_matches_a_rebuild(self):
+        yesterday = timezone.now() - timedelta(days=1)
+        first = DailyActivity.objects.create(user=self.user, step_count=1200)
+        DailyActivity.objects.create(user=self.user, step_count=3000)
+        DailyActivity.objects.create(user=self.user, step_count=2500, timestamp=yesterday)
+        moved = DailyActivity.objects.create(user=self.user, step_count=400, source="bonus")
+        get_referred(self.user, TrekknUser.objects.create(email="f@example.com"))
+
+        first.step_count = 5000
+        first.save()
+        moved.timestamp = yesterday
+        moved.save()
+        self.user.daily_activities.filter(source="referral").delete()
+
+        self.assertEqual(len(self.stored()), 3)
+        self.assertEqual(self.stored(), self.expected())
+
+    def test_rebuild_is_idempotent(self):
+        DailyActivity.objects.create(user=self.user, step_count=1200)
+        DailyRollup.objects.update(step_count=1)
+
+        rollups.rebuild_rollups()
+        rollups.rebuild_rollups()
+
+        self.assertEqual(self.stored(), self.expected())
+        self.assertEqual(self.user.daily_rollups.count(), 1)
+
+
+class LeaderboardTestsMixin:
+    backend = None
+
+    def setUp(self):
+        self.settings = override_settings(LEADERBOARD_BACKEND=self.backend)
+        self.settings.enable()
+        leaderboards.reset_leaderboard()
+        self.today = timezone.localdate()
+        self.users = [
+            TrekknUser.objects.create(email=f"u{i}@example.com", username=f"u{i}")
+            for i in range(5)
+        ]
+
+    def tearDown(self):
+        self.settings.disable()
+        leaderboards.reset_leaderboard()
+
+    def walk(self, user, steps, days_ago=0):
+        with self.captureOnCommitCallbacks(execute=True):
+            return DailyActivity.objects.create(
+                user=user,
+                step_count=steps,
+                timestamp=timezone.now() - timedelta(days=days_ago),
+            )
+
+    def ids(self, entries):
+        index = {user.pk: i for i, user in enumerate(self.users)}
+        return [(position, index[user_id], score) for position, user_id, score in entries]
+
+    def test_top_rank_and_neighbours_follow_activity_writes(self):
+        board = leaderboards.get_leaderboard()
+        for i, steps in enumerate([3000, 9000, 1000, 5000]):
+            self.walk(self.users[i], steps)
+        self.walk(self.users[2], 7000, days_ago=3)  # week, not day
+
+        self.assertEqual(
+            self.ids(board.top("day", limit=2)), [(1, 1, 9000), (2, 3, 5000)]
+        )
+        self.assertEqual(
+            self.ids(board.top("week")),
+            [(1, 1, 9000), (2, 2, 8000), (3, 3, 5000), (4, 0, 3000)],
+        )
+        self.assertEqual(board.rank("week", self.users[3].pk), (3, 5000))
+        self.assertIsNone(board.rank("week", self.users[4].pk))
+        self.assertEqual(
+            self.ids(board.around("week", self.users[3].pk, count=1)),
+            [(2, 2, 8000), (3, 3, 5000), (4, 0, 3000)],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.users[1].daily_activities.get().delete()
+        self.assertEqual(board.rank("week", self.users[2].pk), (1, 8000))
+
+    def test_windows_expire_as_days_roll_forward(self):
+        board = leaderboards.get_leaderboard()
+        self.walk(self.users[0], 4000, days_ago=6)
+        self.walk(self.users[1], 2000, days_ago=1)
+        self.assertEqual(len(board.top("week")), 2)
+
+        tomorrow = self.today + timedelta(days=1)
+        self.assertEqual(self.ids(board.top("week", today=tomorrow)), [(1, 1, 2000)])
+        self.assertEqual(board.top("day", today=tomorrow), [])
+        self.assertEqual(board.rank("month", self.users[0].pk, today=tomorrow), (1, 4000))
+
+    def test_add_changes_one_window(self):
+        board = leaderboards.get_leaderboard()
+        self.walk(self.users[0], 3000)
+
+        board.add("week", self.users[0].pk, 500)
+
+        self.assertEqual(board.rank("week", self.users[0].pk), (1, 3500))
+        self.assertEqual(board.rank("day", self.users[0].pk), (1, 3000))
+
+    def test_rank_endpoint(self):
+        self.walk(self.users[0], 4000)
+        self.walk(self.users[1], 6000)
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+
+        response = client.get("/users/me/rank/", {"leaderboard": "day", "neighbours": 1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["rank"], 2)
+        self.assertEqual(
+            [(n["rank"], n["total_steps"]) for n in response.data["neighbours"]],
+            [(1, 6000), (2, 4000)],
+        )
+
+        response = client.get("/users/me/rank/", {"neighbours": -3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["neighbours"]), 1)
+        response = client.get("/users/me/rank/", {"neighbours": "many"})
+        self.assertEqual(response.status_code, 400)
+
+
+class DatabaseLeaderboardTests(LeaderboardTestsMixin, TestCase):
+    backend = "db"
+
+    def test_add_keeps_steps_of_a_row_created_since_the_lookup(self):
+        board = leaderboards.get_leaderboard()
+        board.roll("week", self.today)
+        LeaderboardScore.objects.create(window="week", user=self.users[0], score=300)
+
+        # as if another writer inserted the row after the locked lookup
+        with mock.patch.object(
+            QuerySet, "select_for_update", return_value=LeaderboardScore.objects.none()
+        ):
+            board.add("week", self.users[0].pk, 500)
+
+        self.assertEqual(board.rank("week", self.users[0].pk), (1, 800))
+
+    def test_rank_endpoint_counts_the_position_once(self):
+        self.walk(self.users[0], 4000)
+        self.walk(self.users[1], 6000)
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get("/users/me/rank/", {"leaderboard": "day"})
+
+        self.assertEqual(response.data["rank"], 2)
+        counts = [q for q in queries.captured_queries if "COUNT(" in q["sql"]]
+        self.assertEqual(len(counts), 1)
+
+
+class MemoryLeaderboardTests(LeaderboardTestsMixin, TestCase):
+    backend = "memory"
+
+
+class SeasonTests(TestCase):
+    def setUp(self):
+        self.users = [
+            TrekknUser.objects.create(email=f"u{i}@example.com", username=f"u{i}")
+            for i in range(3)
+        ]
+        self.today = timezone.localdate()
+
+    def walk(self, user, steps, day):
+        DailyActivity.objects.create(
+            user=user,
+            step_count=steps,
+            timestamp=timezone.now() - timedelta(days=(self.today - day).days),
+        )
+
+    def test_calendar_bounds_and_keys(self):
+        new_year = date(2027, 1, 1)  # a Friday in ISO week 53 of 2026
+        self.assertEqual(
+            seasons.season_bounds("week", new_year), (date(2026, 12, 28), date(2027, 1, 3))
+        )
+        self.assertEqual(seasons.season_key("week", new_year), "2026-W53")
+        self.assertEqual(
+            seasons.season_bounds("month", date(2028, 2, 10)),
+            (date(2028, 2, 1), date(2028, 2, 29)),
+        )
+        self.assertEqual(seasons.season_key("month", new_year), "2027-01")
+        self.assertEqual(seasons.previous_season_day("year", new_year), date(2026, 12, 31))
+
+    def test_closed_seasons_are_snapshotted_once_and_served(self):
+        last_week = self.today - timedelta(days=7)
+        last_week_key = seasons.season_key("week", last_week)
+        self.walk(self.users[0], 3000, last_week)
+        self.walk(self.users[1], 8000, last_week)
+        self.walk(self.users[2], 5000, self.today)
+
+        call_command("snapshot_seasons", "week", stdout=StringIO())
+        call_command("snapshot_seasons", "week", stdout=StringIO())
+        self.assertEqual(
+            list(
+                SeasonSnapshot.objects.filter(kind="week", season=last_week_key)
+                .order_by("rank")
+                .values_list("rank", "user__username", "steps")
+            ),
+            [(1, "u1", 8000), (2, "u0", 3000)],
+        )
+        # the current week stays live
+        self.assertFalse(
+            SeasonSnapshot.objects.filter(
+                season=seasons.season_key("week", self.today)
+            ).exists()
+        )
+
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        winners = client.get("/seasons/week/", {"top": 1}).data
+        self.assertEqual(winners[0]["season"], last_week_key)
+        self.assertEqual(
+            [(w["rank"], w["username"], w["total_steps"]) for w in winners[0]["winners"]],
+            [(1, "u1", 8000)],
+        )
+        winners = client.get("/seasons/week/", {"limit": -1, "top": 0}).data
+        self.assertEqual(
+            [(w["season"], len(w["winners"])) for w in winners], [(last_week_key, 1)]
+        )
+        self.assertEqual(client.get("/seasons/week/", {"top": "x"}).status_code, 400)
+
+        closed = client.get(f"/seasons/week/{last_week_key}/").data
+        self.assertEqual(len(closed["standings"]), 2)
+        current = client.get("/seasons/week/current/").data
+        self.assertEqual(current["standings"][0]["username"], "u2")
+        self.assertEqual(client.get("/seasons/week/1999-W01/").status_code, 404)
+
+
+# the standard BIP-39 test vector mnemonic
+TEST_MNEMONIC = "test test test test test test test test test test test junk"
+
+
+@override_settings(WALLET_MODE="hd", WALLET_MNEMONIC=TEST_MNEMONIC)
+class HDWalletTests(TestCase):
+    def test_signup_only_reserves_an_index(self):
+        first = TrekknUser.objects.create(email="a@example.com", username="a")
+        second = TrekknUser.objects.create(email="b@example.com", username="b")
+        self.assertEqual((first.wallet_index, second.wallet_index), (0, 1))
+        self.assertIsNone(first.evm_key)
+        self.assertIsNone(first.evm_addr)
+
+        # later saves keep the index
+        first.save()
+        self.assertEqual(TrekknUser.objects.get(pk=first.pk).wallet_index, 0)
+
+    def test_wallets_are_derived_on_the_standard_paths(self):
+        user = TrekknUser.objects.create(email="a@example.com", username="a")
+        user.ensure_wallet()
+
+        # account 0 of the test mnemonic, as in Hardhat, Foundry and MetaMask
+        self.assertEqual(user.evm_addr, "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266")
+        stored = TrekknUser.objects.get(pk=user.pk)
+        self.assertEqual((stored.evm_addr, stored.sol_addr), (user.evm_addr, user.sol_addr))
+        self.assertIsNone(stored.evm_key)
+
+        evm_key, sol_key = user.wallet_keys()
+        self.assertEqual(Account.from_key(evm_key).address, user.evm_addr)
+        self.assertEqual(
+            str(Keypair.from_seed(bytes.fromhex(sol_key)).pubkey()), user.sol_addr
+        )
+
+    def test_random_wallets_keep_their_stored_keys(self):
+        with override_settings(WALLET_MODE="random"):
+            user = TrekknUser.objects.create(email="a@example.com", username="a")
+        self.assertIsNone(user.wallet_index)
+        self.assertTrue(user.evm_key and user.sol_key)
+
+        # switching modes doesn't move existing users to HD wallets
+        user.save()
+        user.ensure_wallet()
+        self.assertIsNone(user.wallet_index)
+        self.assertEqual(user.wallet_keys(), (user.evm_key, user.sol_key))
+
+    def test_reserved_ranges_do_not_overlap(self):
+        first = wallets.reserve_wallet_indexes(100)
+        self.assertEqual(wallets.reserve_wallet_indexes(), first + 100)
+
+
+class TestCertSource(google_certs.StaticCertSource):
+    """Set up by GoogleSignInTests with the key its tokens are signed with."""
+
+
+@override_settings(
+    GOOGLE_CLIENT_ID="test-client",
+    GOOGLE_CERT_SOURCE="trekkn.tests.TestCertSource",
+)
+class GoogleSignInTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        public, private = rsa.newkeys(1024)
+        cls.signer = crypt.RSASigner.from_string(private.save_pkcs1(), "test-key")
+        TestCertSource.certs = {"test-key": public.save_pkcs1().decode()}
+
+    def setUp(self):
+        google_certs.reset_cert_cache()
+        self.addCleanup(google_certs.reset_cert_cache)
+
+    def token(self, **claims):
+        now = int(time.time())
+        payload = {
+            "iss": "https://accounts.google.com",
+            "aud": "test-client",
+            "iat": now,
+            "exp": now + 3600,
+            "email": "walker@example.com",
+            "name": "walker",
+            **claims,
+        }
+        return jwt.encode(self.signer, payload).decode()
+
+    def sign_in(self, token, device_id="device-1"):
+        return APIClient().post(
+            "/auth/sign-in/", {"id_token": token, "device_id": device_id}
+        )
+
+    def test_sign_in_with_a_locally_minted_token(self):
+        response = self.sign_in(self.token())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access", response.data)
+        user = TrekknUser.objects.get(email="walker@example.com")
+        self.assertEqual(user.device_id, "device-1")
+        # the second sign-in verifies against the cached certificates
+        self.assertEqual(self.sign_in(self.token()).status_code, 200)
+        self.assertEqual(google_certs.get_cert_cache().source.fetches, 1)
+
+    def test_bad_tokens_are_rejected(self):
+        for token in [
+            self.token(aud="another-client"),
+            self.token(iss="https://evil.example.com"),
+            self.token(exp=int(time.time()) - 60),
+        ]:
+            self.assertEqual(self.sign_in(token).status_code, 400)
+        self.assertFalse(TrekknUser.objects.exists())
+
+    def test_unknown_keys_are_refetched_at_most_once_a_minute(self):
+        signer = crypt.RSASigner.from_string(
+            rsa.newkeys(1024)[1].save_pkcs1(), "rotated-key"
+        )
+        token = jwt.encode(signer, jwt._unverified_decode(self.token())[1]).decode()
+        with self.assertRaises(ValueError):
+            google_certs.verify_google_id_token(token)
+
+        now = [0.0]
+        cache_ = google_certs.CertCache(TestCertSource(), clock=lambda: now[0])
+        cache_.get()
+        cache_.refetch()
+        self.assertEqual(cache_.source.fetches, 1)
+        now[0] = 61
+        cache_.refetch()
+        self.assertEqual(cache_.source.fetches, 2)
+
+    def test_certificates_refresh_in_the_background_before_expiry(self):
+        now = [0.0]
+        cache_ = google_certs.CertCache(
+            TestCertSource(max_age=600), refresh_margin=60, clock=lambda: now[0]
+        )
+        certs = cache_.get()
+
+        now[0] = 500  # still fresh
+        self.assertIs(cache_.get(), certs)
+        self.assertEqual(cache_.source.fetches, 1)
+
+        now[0] = 570  # inside the margin: served from cache, refreshed behind it
+        self.assertEqual(cache_.get(), certs)
+        thread = cache_.thread
+        if thread is not None:
+            thread.join()
+        self.assertEqual(cache_.source.fetches, 2)
+        self.assertEqual(cache_.expires_at, 570 + 600)
+
+    def test_first_sign_in_with_an_invite_rewards_both_in_few_queries(self):
+        inviter = TrekknUser.objects.create(email="inviter@example.com", username="i")
+        Mission.objects.create(name="First walk", requirement_steps=1000)
+        forget_catalog_after(self)
+        missions.mission_catalog()  # warm, like a running process
+        token = self.token()
+        google_certs.verify_google_id_token(token)
+
+        # lookup, user and missions inserts, activities, event logs, rollups insert and
+        # two updates, one reward update per user, the refresh token, and savepoints
+        with self.assertNumQueries(13):
+            response = APIClient().post(
+                "/auth/sign-in/",
+                {
+                    "id_token": token,
+                    "device_id": "device-1",
+                    "invite_code": inviter.invite_code,
+                },
+            )
+
+        self.assertEqual(response.status_code, 200)
+        user = TrekknUser.objects.get(email="walker@example.com")
+        inviter.refresh_from_db()
+        self.assertEqual(user.invited_by, inviter.invite_code)
+        self.assertEqual((user.balance, user.aura), (500, 150))
+        self.assertEqual((inviter.balance, inviter.aura), (500, 150))
+        self.assertEqual(UserEventLog.objects.filter(event_type="referral").count(), 2)
+        self.assertEqual(user.missions.count(), 1)
+        fields = ["user_id", "date", "source", "amount_rewarded", "activities"]
+        self.assertEqual(
+            sorted(
+                tuple(getattr(r, f) for f in fields)
+                for r in rollups.activity_rollups([user.pk, inviter.pk])
+            ),
+            sorted(DailyRollup.objects.values_list(*fields)),
+        )
+
+    def test_used_invite_code_signs_in_without_a_referral(self):
+        inviter = TrekknUser.objects.create(email="inviter@example.com", username="i")
+        # invite codes can only be used once
+        TrekknUser.objects.create(
+            email="other@example.com", username="o", invited_by=inviter.invite_code
+        )
+
+        response = self.sign_in_with(inviter.invite_code)
+
+        self.assertEqual(response.status_code, 200)
+        user = TrekknUser.objects.get(email="walker@example.com")
+        self.assertIsNone(user.invited_by)
+        self.assertEqual(user.balance, 0)
+        inviter.refresh_from_db()
+        self.assertEqual(inviter.balance, 0)
+        self.assertFalse(DailyActivity.objects.exists())
+
+    def test_returning_user_binds_device_and_is_referred_once(self):
+        inviter = TrekknUser.objects.create(email="inviter@example.com", username="i")
+        TrekknUser.objects.create(email="walker@example.com", username="walker")
+
+        self.assertEqual(self.sign_in_with(inviter.invite_code).status_code, 200)
+        self.assertEqual(self.sign_in_with(inviter.invite_code).status_code, 200)
+
+        user = TrekknUser.objects.get(email="walker@example.com")
+        self.assertEqual(user.device_id, "device-1")
+        self.assertEqual(user.invited_by, inviter.invite_code)
+        self.assertEqual(user.balance, 500)
+        self.assertEqual(DailyActivity.objects.filter(user=inviter).count(), 1)
+
+    def sign_in_with(self, invite_code):
+        return APIClient().post(
+            "/auth/sign-in/",
+            {"id_token": self.token(), "device_id": "device-1", "invite_code": invite_code},
+        )
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = TrekknUser.objects.create(email="walker@example.com", username="walker")
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        )
+
+    def get(self, path="/users/me/rank/"):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        return response, [q["sql"] for q in queries]
+
+    def test_user_is_read_once_without_wallet_keys(self):
+        self.get()  # the leaderboard's own first-read work
+        authentication.forget_cached_user(self.user.pk)
+
+        response, first = self.get()
+        self.assertEqual(response.status_code, 200)
+        # authentication runs first
+        self.assertIn('FROM "trekkn_trekknuser"', first[0])
+        self.assertNotIn("evm_key", first[0])
+        self.assertNotIn("sol_key", first[0])
+
+        response, second = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(second), len(first) - 1)
+
+    def test_changes_to_the_user_are_seen_at_once(self):
+        self.get()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get()[0].status_code, 401)
+
+        self.user.delete()
+        self.assertEqual(self.get()[0].status_code, 401)
+
+    def test_queryset_deactivation_is_seen_by_a_new_token(self):
+        self.get()
+        TrekknUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        # the same token keeps its entry until AUTH_USER_CACHE_TTL runs out
+        self.assertEqual(self.get()[0].status_code, 200)
+
+        with mock.patch("rest_framework_simplejwt.tokens.aware_utcnow") as now:
+            now.return_value = timezone.now() + timedelta(seconds=1)
+            token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(self.get()[0].status_code, 401)
+
+    def test_profile_is_loaded_in_full(self):
+        self.get()
+        self.user.reward(balance=500, aura=50)  # an UPDATE, not a save
+
+        response, _ = self.get("/users/me/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["balance"], response.data["level"]), (500, 1))
+
+    def test_steps_are_logged_with_the_cached_user(self):
+        self.get()
+        response = self.client.post("/activities/", {"steps": 2000}, format="json")
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.total_steps, self.user.balance), (2000, 100))
@@ -1,6 +1,9 @@
 from django.urls import path
 from .views import (
     GoogleAuthView,
+    LeaderboardRankView,
+    SeasonStandingsView,
+    SeasonWinnersView,
     ServerHealth,
     SignOutView,
     TrekknUserListCreateView,
@@ -29,6 +32,13 @@ urlpatterns = [
         ),
         name="user-detail",
     ),
+    path("users/me/rank/", LeaderboardRankView.as_view(), name="user-rank"),
+    path("seasons/<str:kind>/", SeasonWinnersView.as_view(), name="season-winners"),
+    path(
+        "seasons/<str:kind>/<str:season>/",
+        SeasonStandingsView.as_view(),
+        name="season-standings",
+    ),
     path(
         "activities/",
         DailyActivityListCreateView.as_view(),
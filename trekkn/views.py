@@ -1,14 +1,12 @@
 # Create your views here.
 from datetime import timedelta
-from django.db.models import Sum
-from django.db import models
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework import status
-from google.oauth2 import id_token
-from google.auth.transport import requests
 from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
 from rest_framework import permissions
 from django.utils.decorators import method_decorator
@@ -17,10 +15,23 @@ from django.views.decorators.vary import vary_on_headers
 
 # from django.contrib.auth.models import User
 from trekkn.actions import get_referred, log_steps_and_reward_user
-from trekkn.models import TrekknUser, DailyActivity, Mission, UserMission, UserEventLog
+from trekkn.google_certs import verify_google_id_token
+from trekkn.leaderboards import WINDOWS, get_leaderboard, ranked_users
+from trekkn.missions import user_missions
+from trekkn.seasons import SEASONS, current_standings, season_bounds, season_key
+from trekkn.models import (
+    TrekknUser,
+    DailyActivity,
+    Mission,
+    UserMission,
+    UserEventLog,
+    NetworkHealth,
+    SeasonSnapshot,
+)
 from trekkn.permissions import IsOwner
 from trekkn.serializers import (
     LeaderboardUserSerializer,
+    SeasonStandingSerializer,
     TrekknUserSerializer,
     DailyActivitySerializer,
     MissionSerializer,
@@ -49,12 +60,6 @@ class GoogleAuthView(APIView):
             device_id = request.data.get("device_id")
             invite_code = request.data.get("invite_code")
 
-            #    get inviter from invite code
-            # --- Handle inviter via invite_code ---
-            inviter = None
-            if invite_code:
-                inviter = TrekknUser.objects.filter(invite_code=invite_code).first()
-
             if not token:
                 return Response(
                     {"error": "ID token not provided"},
@@ -66,60 +71,68 @@ class GoogleAuthView(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            # Verify token with Google
-            idinfo = id_token.verify_oauth2_token(
-                token,
-                requests.Request(),
-                settings.GOOGLE_CLIENT_ID,
-            )
+            # Verify token against Google's cached certificates
+            idinfo = verify_google_id_token(token)
             print(idinfo)
             email = idinfo["email"]
             name = idinfo.get("name", "")
 
-            # 🚨 Check if device_id is already bound to another user
-            existing_user_with_device = TrekknUser.objects.filter(
-                device_id=device_id
-            ).first()
-            if existing_user_with_device and existing_user_with_device.email != email:
-                return Response(
-                    {"error": "This device is already linked to another account."},
-                    status=status.HTTP_403_FORBIDDEN,
+            # sign-in and referral rewards happen together or not at all
+            with transaction.atomic():
+                # the user, the device's owner, the inviter and whoever already used
+                # the code in one query, locked so concurrent sign-ins of the same
+                # account can't both take the reward
+                lookup = Q(email=email) | Q(device_id=device_id)
+                if invite_code:
+                    lookup |= Q(invite_code=invite_code) | Q(invited_by=invite_code)
+                found = list(TrekknUser.objects.select_for_update().filter(lookup))
+                user = next((u for u in found if u.email == email), None)
+                device_owner = next((u for u in found if u.device_id == device_id), None)
+                # --- Handle inviter via invite_code ---
+                inviter = next(
+                    (u for u in found if invite_code and u.invite_code == invite_code),
+                    None,
                 )
+                if inviter and user and inviter.pk == user.pk:
+                    inviter = None  # no inviting yourself
+                if inviter and any(u.invited_by == invite_code for u in found):
+                    inviter = None  # invite codes can only be used once
 
-            # Check if user already exists
-            try:
-                user = TrekknUser.objects.get(email=email)
-                # --- check device binding ---
-                if user.device_id is None:
-                    # first time login from this user → bind device
-                    user.device_id = device_id
-                    # user.save()
-                    # Reward flow: if user not invited before and valid inviter exists
-                elif user.device_id != device_id:
+                # 🚨 Check if device_id is already bound to another user
+                if device_owner and device_owner.email != email:
                     return Response(
-                        {"error": "This account is already bound to another device."},
+                        {"error": "This device is already linked to another account."},
                         status=status.HTTP_403_FORBIDDEN,
                     )
 
-                if user.invited_by is None and inviter:
-                    user.invited_by = inviter.invite_code
-                    print("setting invited by and rewarding")
-                    get_referred(inviter, user)
-
-                user.save()
-            except TrekknUser.DoesNotExist:
-                # New user → create and bind device
-                user = TrekknUser.objects.create_user(
-                    email=email,
-                    username=name if name else "",
-                    device_id=device_id,
-                )
-
-                # Reward flow: as a new user, if valid inviter exists
-                if inviter:
-                    user.invited_by = inviter.invite_code
-                    get_referred(inviter, user)
-                    user.save()
+                if user is None:
+                    # New user → create and bind device
+                    user = TrekknUser.objects.create_user(
+                        email=email,
+                        username=name if name else "",
+                        device_id=device_id,
+                        invited_by=inviter.invite_code if inviter else None,
+                    )
+                    # Reward flow: as a new user, if valid inviter exists
+                    if inviter:
+                        get_referred(inviter, user)
+                elif user.device_id not in (None, device_id):
+                    return Response(
+                        {"error": "This account is already bound to another device."},
+                        status=status.HTTP_403_FORBIDDEN,
+                    )
+                elif user.invited_by is None and inviter:
+                    # first time login from this user → bind device, and reward the
+                    # inviter in the same update
+                    get_referred(
+                        inviter,
+                        user,
+                        device_id=device_id,
+                        invited_by=inviter.invite_code,
+                    )
+                elif user.device_id is None:
+                    user.device_id = device_id
+                    TrekknUser.objects.filter(pk=user.pk).update(device_id=device_id)
 
             # Issue JWT tokens
             refresh = RefreshToken.for_user(user)
@@ -210,33 +223,15 @@ class TrekknUserListCreateView(generics.ListCreateAPIView):
 
         # Handle step leaderboards
         if leaderboard:
-            now = timezone.now()
-            if leaderboard == "day":
-                start_date = now - timedelta(days=1)
-            elif leaderboard == "week":
-                start_date = now - timedelta(weeks=1)
-            elif leaderboard == "month":
-                start_date = now - timedelta(days=30)
-            elif leaderboard == "year":
-                start_date = now - timedelta(weeks=52)
-            else:
+            if leaderboard not in WINDOWS:
                 return Response(
-                    {"error": "Invalid leaderboard type. Use day, week, or month."},
+                    {"error": "Invalid leaderboard type. Use day, week, month, or year."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            # Aggregate total steps in range
-            users = (
-                TrekknUser.objects.annotate(
-                    total_steps=Sum(
-                        "daily_activities__step_count",
-                        filter=models.Q(daily_activities__timestamp__gte=start_date)
-                        & models.Q(daily_activities__source="steps"),
-                    )
-                )
-                .order_by("-total_steps")
-                .exclude(total_steps=None)[:100]  # top 100 only
-            )
+            # rankings are kept sorted as activities are logged, see leaderboards.py
+            entries = get_leaderboard().top(leaderboard, limit=100)  # top 100 only
+            users = ranked_users(entries)
 
             serializer = self.get_serializer(users, many=True)
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -244,6 +239,150 @@ class TrekknUserListCreateView(generics.ListCreateAPIView):
         return super().list(request, *args, **kwargs)
 
 
+class LeaderboardRankView(APIView):
+    """The signed-in user's position in a step leaderboard and the users around it."""
+
+    def get_permissions(self):
+        if not settings.DEBUG:
+            self.permission_classes = [permissions.IsAuthenticated]
+        return super().get_permissions()
+
+    def get(self, request, *args, **kwargs):
+        window = request.query_params.get("leaderboard", "week")
+        if window not in WINDOWS:
+            return Response(
+                {"error": "Invalid leaderboard type. Use day, week, month, or year."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            count = max(0, min(int(request.query_params.get("neighbours", 5)), 50))
+        except ValueError:
+            return Response(
+                {"error": "neighbours must be a number"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # the user's own entry is among them, so its position is only counted once
+        entries = get_leaderboard().around(window, request.user.pk, count=count)
+        if not entries:
+            # no steps in this window yet
+            return Response(
+                {"rank": None, "total_steps": 0, "neighbours": []},
+                status=status.HTTP_200_OK,
+            )
+        rank, score = next(
+            (position, score)
+            for position, user_id, score in entries
+            if user_id == request.user.pk
+        )
+        neighbours = ranked_users(entries)
+        return Response(
+            {
+                "rank": rank,
+                "total_steps": score,
+                "neighbours": LeaderboardUserSerializer(neighbours, many=True).data,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class SeasonWinnersView(APIView):
+    """Winners of the most recent closed seasons, read from the snapshots."""
+
+    def get_permissions(self):
+        if not settings.DEBUG:
+            self.permission_classes = [permissions.IsAuthenticated]
+        return super().get_permissions()
+
+    def get(self, request, kind, *args, **kwargs):
+        if kind not in SEASONS:
+            return Response(
+                {"error": "Invalid season. Use week, month, or year."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 12)), 100))
+            top = max(1, min(int(request.query_params.get("top", 3)), 100))
+        except ValueError:
+            return Response(
+                {"error": "limit and top must be numbers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        seasons = list(
+            SeasonSnapshot.objects.filter(kind=kind, rank=1)
+            .order_by("-start")
+            .values("season", "start", "end")[:limit]
+        )
+        winners = {}
+        for row in (
+            SeasonSnapshot.objects.filter(
+                kind=kind,
+                season__in=[season["season"] for season in seasons],
+                rank__lte=top,
+            )
+            .select_related("user")
+            .order_by("rank")
+        ):
+            winners.setdefault(row.season, []).append(row)
+
+        return Response(
+            [
+                dict(
+                    season,
+                    winners=SeasonStandingSerializer(
+                        winners.get(season["season"], []), many=True
+                    ).data,
+                )
+                for season in seasons
+            ],
+            status=status.HTTP_200_OK,
+        )
+
+
+class SeasonStandingsView(APIView):
+    """Standings of one season: `current` is summed live, closed seasons come from
+    their snapshot."""
+
+    def get_permissions(self):
+        if not settings.DEBUG:
+            self.permission_classes = [permissions.IsAuthenticated]
+        return super().get_permissions()
+
+    def get(self, request, kind, season, *args, **kwargs):
+        if kind not in SEASONS:
+            return Response(
+                {"error": "Invalid season. Use week, month, or year."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if season == "current":
+            today = timezone.localdate()
+            start, end = season_bounds(kind, today)
+            standings = LeaderboardUserSerializer(
+                ranked_users(current_standings(kind, today=today)), many=True
+            ).data
+            season = season_key(kind, today)
+        else:
+            rows = list(
+                SeasonSnapshot.objects.filter(kind=kind, season=season)
+                .select_related("user")
+                .order_by("rank")
+            )
+            if not rows:
+                return Response(
+                    {"error": "No snapshot for this season"},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            start, end = rows[0].start, rows[0].end
+            standings = SeasonStandingSerializer(rows, many=True).data
+
+        return Response(
+            {"season": season, "start": start, "end": end, "standings": standings},
+            status=status.HTTP_200_OK,
+        )
+
+
 class TrekknUserDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = TrekknUser.objects.all()
     serializer_class = TrekknUserSerializer
@@ -264,8 +403,12 @@ class TrekknUserDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def get(self, request, *args, **kwargs):
         try:
+            # the authenticated user only has the columns authentication caches
+            user = TrekknUser.objects.get(pk=self.request.user.pk)
+            # HD wallet addresses are derived the first time the user asks for them
+            user.ensure_wallet()
             return Response(
-                data=TrekknUserSerializer(self.request.user, many=False).data,
+                data=TrekknUserSerializer(user, many=False).data,
                 status=status.HTTP_200_OK,
             )
         except Exception as e:
@@ -278,7 +421,9 @@ class TrekknUserDetailView(generics.RetrieveUpdateDestroyAPIView):
         # provided in the request
         try:
             serializer = TrekknUserSerializer(
-                self.request.user, data=self.request.data, partial=True
+                TrekknUser.objects.get(pk=self.request.user.pk),
+                data=self.request.data,
+                partial=True,
             )
             if serializer.is_valid():
                 serializer.save()
@@ -378,7 +523,8 @@ class UserMissionListCreateView(generics.ListCreateAPIView):
         try:
             # Get all events for the authenticated user
             # if self.request.user.is_authenticated:
-            events = UserMission.objects.filter(user=self.request.user)
+            # every mission of the catalog, with the user's progress where stored
+            events = user_missions(self.request.user)
             serializer = self.get_serializer(events, many=True)
             return Response(serializer.data, status=status.HTTP_200_OK)
         # return super().get(request, *args, **kwargs)
@@ -435,8 +581,21 @@ class ServerHealth(generics.RetrieveAPIView):
         # print(self.generate_evm_account())
         # print(self.generate_solana_account())
         try:
+            # breaker state and write latency, as last saved by the outbox worker
+            networks = {
+                health.network: {
+                    "state": health.state,
+                    "consecutive_failures": health.consecutive_failures,
+                    "error_rate": health.error_rate,
+                    "p50_ms": health.p50_ms,
+                    "p95_ms": health.p95_ms,
+                    "samples": health.samples,
+                    "updated_at": health.updated_at,
+                }
+                for health in NetworkHealth.objects.all()
+            }
             return Response(
-                data={"status": "ok"},
+                data={"status": "ok", "networks": networks},
                 status=status.HTTP_200_OK,
             )
         except Exception as e:
@@ -460,6 +619,14 @@ if not settings.DEBUG:
         vary_on_headers("Authorization"), name="get"
     )(TrekknUserDetailView)
 
+    # closed seasons never change; the current one is summed live, so keep it short
+    SeasonWinnersView = method_decorator(cache_page(60 * 60), name="get")(
+        SeasonWinnersView
+    )
+    SeasonStandingsView = method_decorator(cache_page(60), name="get")(
+        SeasonStandingsView
+    )
+
     #
     DailyActivityListCreateView = method_decorator(cache_page(60), name="get")(
         DailyActivityListCreateView
@@ -0,0 +1,95 @@
+"""
+User wallets derived from one master seed instead of generated and stored per signup.
+
+With `WALLET_MODE = "hd"` a new user only reserves a wallet index. Both wallets are
+derived from `WALLET_MNEMONIC` on the BIP-44 paths below when first needed: addresses
+are then stored on the user, private keys are never stored and derived on demand.
+Users created in "random" mode keep the keys stored on their row.
+"""
+
+import hashlib
+import hmac
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from eth_account import Account
+from eth_account.hdaccount import seed_from_mnemonic
+from eth_account.hdaccount.deterministic import Node, SoftNode, derive_child_key
+from solders.keypair import Keypair
+
+from trekkn.models import WalletCounter
+
+
+# the user's wallet index is the last node of both paths
+EVM_PARENT_PATH = "m/44'/60'/0'/0"
+SOLANA_PATH = "m/44'/501'/{index}'/0'"
+
+
+def hd_enabled() -> bool:
+    return settings.WALLET_MODE == "hd"
+
+
+@lru_cache(maxsize=4)
+def _seed(mnemonic):
+    # 2048 PBKDF2 rounds, so once per process
+    return seed_from_mnemonic(mnemonic, "")
+
+
+def master_seed() -> bytes:
+    if not settings.WALLET_MNEMONIC:
+        raise ImproperlyConfigured("WALLET_MNEMONIC is required with WALLET_MODE=hd")
+    return _seed(settings.WALLET_MNEMONIC)
+
+
+@lru_cache(maxsize=4)
+def _evm_parent(seed):
+    """Extended private key `(key, chain code)` at EVM_PARENT_PATH.
+
+    Users differ only in the last node, so the four hardened steps above it are
+    derived once instead of for every user.
+    """
+    node = hmac.new(b"Bitcoin seed", seed, hashlib.sha512).digest()
+    key, chain_code = node[:32], node[32:]
+    for part in EVM_PARENT_PATH.split("/")[1:]:
+        key, chain_code = derive_child_key(key, chain_code, Node.decode(part))
+    return key, chain_code
+
+
+def evm_account(index):
+    """The EVM account at `m/44'/60'/0'/0/<index>`."""
+    key, _ = derive_child_key(*_evm_parent(master_seed()), SoftNode(index))
+    return Account.from_key(key)
+
+
+def solana_keypair(index) -> Keypair:
+    """The Solana keypair at `m/44'/501'/<index>'/0'`, the path Phantom uses."""
+    return Keypair.from_seed_and_derivation_path(
+        master_seed(), SOLANA_PATH.format(index=index)
+    )
+
+
+def wallet_addresses(index):
+    """`(evm address, solana address)` of wallet `index`."""
+    return evm_account(index).address, str(solana_keypair(index).pubkey())
+
+
+def wallet_keys(index):
+    """`(evm private key, solana secret)` of wallet `index`, hex like the stored keys."""
+    return evm_account(index).key.hex(), solana_keypair(index).secret().hex()
+
+
+def reserve_wallet_indexes(count=1) -> int:
+    """Reserve `count` consecutive wallet indexes and return the first.
+
+    The counter row is locked while it is bumped, so no two users get the same wallet.
+    """
+    with transaction.atomic():
+        row, _ = WalletCounter.objects.select_for_update().get_or_create(
+            name=WalletCounter.DEFAULT
+        )
+        first = row.next_index
+        row.next_index += count
+        row.save(update_fields=["next_index"])
+    return first
@@ -118,6 +118,8 @@ DATABASES = (
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            # a file rather than in-memory, so threads of a TransactionTestCase share it
+            "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
         }
     }
     if DEBUG
@@ -198,7 +200,8 @@ AUTH_USER_MODEL = "trekkn.TrekknUser"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # JWTAuthentication, with the user cached for AUTH_USER_CACHE_TTL seconds
+        "trekkn.authentication.CachedJWTAuthentication",
     ),
     # ... other DRF settings
 }
@@ -216,3 +219,94 @@ SIMPLE_JWT = {
 #  the web client id
 
 GOOGLE_CLIENT_ID = env("GOOGLE_CLIENT_ID")
+# where the certificates Google signs ID tokens with come from; they are cached for
+# their max-age and refreshed in the background. A dotted path to a
+# `trekkn.google_certs.CertSource` subclass plugs in another source (tests, benchmarks)
+GOOGLE_CERT_SOURCE = env(
+    "GOOGLE_CERT_SOURCE", default="trekkn.google_certs.HTTPCertSource"
+)
+
+
+# EVM networks the step logs are written to.
+# Add `"batch": True` to a network once its contract is redeployed with `logWalks`;
+# the outbox worker then packs that network's pending walks into batch transactions.
+CHAIN_NETWORKS = [
+    # "SOMNIA":
+    {
+        "name": "SOMNIA",
+        "url": "https://dream-rpc.somnia.network/",
+        "contract": "0x661A88CEF5Bb8f58822C4f334C482d1Bf0DcD1e7",
+    },
+    # "MONAD":
+    {
+        "name": "MONAD",
+        "url": "https://testnet-rpc.monad.xyz/",
+        "contract": "0x0D1f40B591FbB15CDFD5bd9e03734acc114de49e",
+    },
+    # "MEGAETH":
+    {
+        "name": "MEGAETH",
+        "url": "https://carrot.megaeth.com/rpc/",
+        "contract": "0xe496edfc5384ba76d457a75a53b9819ee9a62e3c",
+    },
+    # "FLOW":
+    {
+        "name": "FLOW",
+        "url": "https://testnet.evm.nodes.onflow.org/",
+        "contract": "0xE496edfc5384Ba76d457a75a53B9819Ee9a62e3C",
+    },
+    # # "ASSETCHAIN":
+    # {
+    #     "url": "https://enugu-rpc.assetchain.org/",
+    #     "contract": "0xE496edfc5384Ba76d457a75a53B9819Ee9a62e3C",
+    # },
+    #
+    #
+    # "IOTA_EVM":
+    # {
+    #     "url": "https://json-rpc.evm.testnet.iotaledger.net/",
+    #     "contract": "0xE496edfc5384Ba76d457a75a53B9819Ee9a62e3C",
+    # },
+    # "XRPL_EVM":
+    {
+        "name": "XRPL_EVM",
+        "url": "https://rpc.testnet.xrplevm.org/",
+        "contract": "0x7965b0cff0ebe04051f221f07429d38d147c0c5c",
+    },
+]
+
+# comma separated network names to skip, e.g. CHAIN_NETWORKS_DISABLED=MONAD,FLOW
+CHAIN_NETWORKS_DISABLED = env.list("CHAIN_NETWORKS_DISABLED", default=[])
+
+# circuit breaker: a network is skipped after this many consecutive failures,
+# then probed again once the cooldown (seconds) has passed
+CHAIN_BREAKER_FAILURES = env.int("CHAIN_BREAKER_FAILURES", default=5)
+CHAIN_BREAKER_COOLDOWN = env.int("CHAIN_BREAKER_COOLDOWN", default=60)
+
+# LEADERBOARDS
+# "db" keeps the rankings in a table shared by every process; "memory" keeps them in
+# this process only (single-process deployments and tests). A dotted path to a
+# `trekkn.leaderboards.Leaderboard` subclass plugs in another store.
+LEADERBOARD_BACKEND = env("LEADERBOARD_BACKEND", default="db")
+
+# WALLETS
+# "random" creates and stores a new EVM and Solana keypair for every signup; "hd" only
+# gives the user a wallet index and derives both wallets from WALLET_MNEMONIC (BIP-39)
+# when first needed, without storing private keys. Keep the mnemonic secret and never
+# change it once users have HD wallets.
+WALLET_MODE = env("WALLET_MODE", default="random")
+WALLET_MNEMONIC = env("WALLET_MNEMONIC", default="")
+
+# MISSIONS
+# "inline" gives a new mission to every user while it is being saved; "worker" leaves
+# it to `manage.py assign_missions`, so saving a mission returns at once
+MISSION_FANOUT = env("MISSION_FANOUT", default="inline")
+# "dense" stores a UserMission row for every user and mission; "sparse" only stores
+# completed ones and lists the rest from the mission catalog. After switching to sparse
+# run `manage.py prune_user_missions`; back to dense, `manage.py assign_missions --all`
+USER_MISSION_STORAGE = env("USER_MISSION_STORAGE", default="dense")
+
+# AUTHENTICATION
+# seconds an authenticated user's columns are kept in the default cache; saving or
+# deleting the user drops them sooner. 0 loads the user on every request
+AUTH_USER_CACHE_TTL = env.int("AUTH_USER_CACHE_TTL", default=60)